@@ -0,0 +1,823 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks dos caminhos quentes da aplicação To-Do.
+
+Cada cenário roda isolado, sem subir a aplicação Flask nem a stack de
+observabilidade, e imprime as medições de cada variante. Cenários que
+precisam do PostgreSQL usam as mesmas variáveis DB_* da aplicação.
+
+O modo `regress` executa a suíte de regressão (throughput da API, custo de
+emissão do OpenTelemetry e comandos do jogo) várias vezes, compara com um
+baseline salvo em JSON e termina com código 1 se alguma métrica piorar além
+do limite com significância estatística (teste t de Welch, IC de 95%).
+"""
+
+import inspect
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from todo_db import (
+    PooledConnection, StatementRegistry, TASK_STATEMENTS, build_search_query, db_config_from_env, encode_tasks
+)
+from todo_http import PrecompressedPage, RequestMetrics, available_encodings, compress
+
+
+# Tempo mínimo de cada medição de _cpu_per_call: amostras curtas demais
+# (~1ms) deixam o IC do teste de Welch dominado por ruído
+MIN_SAMPLE_SECONDS = 0.1
+
+
+def _measure(func, repeat):
+    """Executa func `repeat` vezes e retorna (menor tempo de CPU, pico de memória alocada)"""
+    best_cpu = float("inf")
+    for _ in range(repeat):
+        start = time.thread_time()
+        func()
+        best_cpu = min(best_cpu, time.thread_time() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best_cpu, peak
+
+
+def bench_serialization(rows=10000, repeat=5):
+    """
+    Compara a serialização antiga (dict por linha + isoformat + jsonify) com o
+    caminho de tuplas com layout fixo e timestamps já formatados pelo banco.
+    """
+    base = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    raw_rows = [
+        (i, f"Tarefa de benchmark número {i}", i % 3 == 0, base + timedelta(seconds=i), base + timedelta(seconds=i))
+        for i in range(rows)
+    ]
+    # Formato entregue pelo PostgreSQL com TASK_SELECT_LIST
+    formatted_rows = [
+        (task_id, title, completed, created.isoformat(), updated.isoformat())
+        for task_id, title, completed, created, updated in raw_rows
+    ]
+    columns = ("id", "title", "completed", "created_at", "updated_at")
+
+    def legacy():
+        # Equivalente ao RealDictCursor + conversão manual + jsonify (sort_keys=True)
+        tasks = [dict(zip(columns, row)) for row in raw_rows]
+        for task in tasks:
+            if task['created_at']:
+                task['created_at'] = task['created_at'].isoformat()
+            if task['updated_at']:
+                task['updated_at'] = task['updated_at'].isoformat()
+        return json.dumps(tasks, sort_keys=True)
+
+    def tuples():
+        return encode_tasks(formatted_rows)
+
+    assert json.loads(legacy()) == json.loads(tuples())
+
+    results = {}
+    for name, func in (("legacy", legacy), ("tuples", tuples)):
+        cpu, peak = _measure(func, repeat)
+        results[name] = {
+            "cpu_us_per_row": cpu / rows * 1e6,
+            "peak_kib": peak / 1024,
+        }
+    return results
+
+
+def bench_prepared_statements(iterations=1000, rows=200):
+    """
+    Compara statements enviados como texto com PREPARE/EXECUTE no PostgreSQL
+    configurado pelas variáveis DB_*.
+
+    Usa uma tabela temporária `tasks` (que esconde a tabela real na sessão),
+    então não altera os dados da aplicação.
+    """
+    import psycopg2
+
+    db_config = db_config_from_env()
+    connections = {
+        # Sem PooledConnection o registro cai no caminho de SQL em texto
+        "plain": psycopg2.connect(**db_config),
+        "prepared": psycopg2.connect(connection_factory=PooledConnection, **db_config),
+    }
+    registry = StatementRegistry(TASK_STATEMENTS)
+
+    results = {}
+    for mode, conn in connections.items():
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE tasks (
+                    id SERIAL PRIMARY KEY,
+                    title VARCHAR(255) NOT NULL,
+                    completed BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute(
+                "INSERT INTO tasks (title) SELECT 'Tarefa ' || n FROM generate_series(1, %s) AS n",
+                (rows,)
+            )
+        conn.commit()
+
+        timings = {name: [] for name in TASK_STATEMENTS}
+        with conn.cursor() as cur:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                registry.execute(cur, "tasks_insert", ("Tarefa de benchmark",))
+                task_id = cur.fetchone()[0]
+                timings["tasks_insert"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                registry.execute(cur, "tasks_complete", (task_id,))
+                cur.fetchone()
+                timings["tasks_complete"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                registry.execute(cur, "tasks_delete", (task_id,))
+                timings["tasks_delete"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                registry.execute(cur, "tasks_list")
+                cur.fetchall()
+                timings["tasks_list"].append(time.perf_counter() - start)
+                conn.commit()
+        conn.close()
+
+        results[mode] = {
+            f"{name}_us": statistics.mean(values) * 1e6 for name, values in timings.items()
+        }
+        results[mode]["request_mix_us"] = sum(results[mode].values())
+    return results
+
+
+def _cpu_per_call(func, calls, min_seconds=MIN_SAMPLE_SECONDS):
+    """
+    CPU por chamada de func, repetindo blocos de `calls` chamadas até passar
+    `min_seconds` de relógio.
+
+    Mede só a thread atual (thread_time): process_time somaria as threads do
+    BatchSpanProcessor, dos exportadores e do agente do Pyroscope.
+    """
+    total = 0
+    started = time.perf_counter()
+    start = time.thread_time()
+    while True:
+        for _ in range(calls):
+            func()
+        total += calls
+        if time.perf_counter() - started >= min_seconds:
+            break
+    return (time.thread_time() - start) / total
+
+
+def bench_compression(rows=1000, iterations=1000):
+    """
+    Bytes e CPU por requisição da página principal (render_template_string a
+    cada hit vs buffer pré-comprimido) e de uma listagem JSON de `rows`
+    tarefas em cada codificação.
+    """
+    import os
+
+    from flask import Flask, render_template_string
+    from werkzeug.datastructures import Accept
+
+    app = Flask(__name__)
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "index.html")) as f:
+        source = f.read()
+
+    results = {}
+    with app.app_context():
+        html = render_template_string(source).encode("utf-8")
+        results["index_render"] = {
+            "bytes": len(html),
+            "cpu_us": _cpu_per_call(lambda: render_template_string(source).encode("utf-8"), iterations) * 1e6,
+        }
+
+    page = PrecompressedPage(html)
+    for encoding in available_encodings():
+        accept = Accept([(encoding, 1)])
+        results[f"index_{encoding}"] = {
+            "bytes": len(page.variants[encoding]),
+            "cpu_us": _cpu_per_call(lambda: page.select(accept), iterations) * 1e6,
+        }
+
+    base = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    body = encode_tasks([
+        (i, f"Tarefa de benchmark número {i}", i % 3 == 0, (base + timedelta(seconds=i)).isoformat(), base.isoformat())
+        for i in range(rows)
+    ]).encode("utf-8")
+    json_iterations = max(iterations // 10, 1)
+    for encoding in available_encodings():
+        results[f"json_{encoding}"] = {
+            "bytes": len(compress(body, encoding, 5)),
+            "cpu_us": _cpu_per_call(lambda: compress(body, encoding, 5), json_iterations) * 1e6,
+        }
+    return results
+
+
+def bench_search(rows=1000000, iterations=100):
+    """
+    Busca de tarefas em uma tabela de `rows` linhas: endpoint full-text (GIN +
+    ts_rank, uma página de 20) vs abordagem do navegador (listar tudo e filtrar
+    no cliente).
+
+    Usa uma tabela temporária `tasks` com a mesma coluna gerada e índice da
+    migração de busca, então não altera os dados da aplicação.
+    """
+    import psycopg2
+
+    conn = psycopg2.connect(connection_factory=PooledConnection, **db_config_from_env())
+    registry = StatementRegistry(TASK_STATEMENTS)
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE tasks (
+                id SERIAL PRIMARY KEY,
+                title VARCHAR(255) NOT NULL,
+                completed BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                search_vector tsvector GENERATED ALWAYS AS (to_tsvector('simple', title)) STORED
+            )
+        """)
+        # Títulos com um verbo comum e um código único (md5) por tarefa
+        cur.execute("""
+            INSERT INTO tasks (title)
+            SELECT (ARRAY['Comprar', 'Pagar', 'Ligar', 'Revisar', 'Enviar'])[1 + n %% 5]
+                   || ' item ' || substr(md5(n::text), 1, 8)
+            FROM generate_series(1, %s) AS n
+        """, (rows,))
+        cur.execute("CREATE INDEX ON tasks USING GIN (search_vector)")
+        cur.execute("CREATE INDEX ON tasks (created_at DESC)")
+        cur.execute("ANALYZE tasks")
+        cur.execute("SELECT substr(md5(n::text), 1, 4) FROM generate_series(1, %s) AS n", (rows,))
+        prefixes = [row[0] for row in random.Random(42).sample(cur.fetchall(), min(iterations, rows))]
+    conn.commit()
+
+    def server_side(prefix):
+        with conn.cursor() as cur:
+            registry.execute(cur, "tasks_search", (build_search_query(prefix), 21, 0))
+            return len(cur.fetchall())
+
+    def client_side(prefix):
+        # Equivalente ao GET /api/tasks + filtro em JavaScript
+        with conn.cursor() as cur:
+            registry.execute(cur, "tasks_list")
+            body = encode_tasks(cur.fetchall())
+        return sum(1 for task in json.loads(body) if prefix in task["title"].lower())
+
+    results = {}
+    for name, func, queries in (
+        ("server_side", server_side, prefixes),
+        ("client_side", client_side, prefixes[:3]),
+    ):
+        timings = []
+        for prefix in queries:
+            start = time.perf_counter()
+            func(prefix)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        results[name] = {
+            "queries": len(timings),
+            "p50_ms": statistics.median(timings) * 1000,
+            "max_ms": timings[-1] * 1000,
+        }
+    conn.close()
+    return results
+
+
+def bench_storage(iterations=1000, rows=200):
+    """
+    Compara os backends de armazenamento (SQLite embutido e PostgreSQL) com a
+    mesma sequência de operações das rotas: criar, completar, remover e listar
+    uma tabela com `rows` tarefas.
+
+    O SQLite usa um arquivo temporário e o PostgreSQL um schema próprio
+    (todo_benchmark, removido no final); o PostgreSQL é ignorado se não estiver
+    acessível.
+    """
+    import shutil
+    import tempfile
+
+    import psycopg2
+
+    from todo_db import ConnectionPool
+    from todo_storage import PostgresTaskStorage, SQLiteTaskStorage
+
+    tmpdir = tempfile.mkdtemp(prefix="todo-bench-")
+    backends = {"sqlite": lambda: SQLiteTaskStorage(f"{tmpdir}/todo.db")}
+    db_config = db_config_from_env()
+    try:
+        conn = psycopg2.connect(**db_config)
+        with conn, conn.cursor() as cur:
+            cur.execute("DROP SCHEMA IF EXISTS todo_benchmark CASCADE; CREATE SCHEMA todo_benchmark")
+        conn.close()
+        backends["postgres"] = lambda: PostgresTaskStorage(
+            ConnectionPool(1, 1, options="-c search_path=todo_benchmark", **db_config),
+            StatementRegistry(TASK_STATEMENTS)
+        )
+    except psycopg2.OperationalError as e:
+        print(f"⚠️  PostgreSQL indisponível, comparando apenas o SQLite: {e}")
+
+    results = {}
+    try:
+        for name, factory in backends.items():
+            storage = factory()
+            storage.migrate()
+            storage.create_tasks([f"Tarefa {n}" for n in range(rows)])
+
+            timings = {operation: [] for operation in ("create", "complete", "delete", "list")}
+            for _ in range(iterations):
+                start = time.perf_counter()
+                task_id = storage.create_task("Tarefa de benchmark")[0]
+                timings["create"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                storage.complete_task(task_id)
+                timings["complete"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                storage.delete_task(task_id)
+                timings["delete"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                storage.list_tasks()
+                timings["list"].append(time.perf_counter() - start)
+            storage.close()
+
+            results[name] = {f"{operation}_us": statistics.mean(values) * 1e6 for operation, values in timings.items()}
+            results[name]["request_mix_us"] = sum(results[name].values())
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        if "postgres" in backends:
+            conn = psycopg2.connect(**db_config)
+            with conn, conn.cursor() as cur:
+                cur.execute("DROP SCHEMA IF EXISTS todo_benchmark CASCADE")
+            conn.close()
+    return results
+
+
+def bench_middleware(iterations=5000, repeat=5):
+    """
+    Custo por requisição dos hooks de métricas: middleware antigo (dicts novos a
+    cada requisição, time.time() e log formatado sempre) vs RequestMetrics, em um
+    app Flask mínimo com métricas do SDK OpenTelemetry (sem exportação).
+
+    O overhead de cada variante é descontado do mesmo app sem hooks.
+    """
+    import io
+    import logging
+
+    from flask import Flask, g, request
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+    meter = MeterProvider(metric_readers=[InMemoryMetricReader()]).get_meter("benchmark")
+    counter = meter.create_counter("http_requests_total")
+    histogram = meter.create_histogram("http_request_duration_seconds")
+
+    logger = logging.getLogger("benchmark.middleware")
+    logger.propagate = False
+    logger.addHandler(logging.StreamHandler(io.StringIO()))
+    logger.setLevel(logging.INFO)
+
+    def make_app(variant):
+        app = Flask(__name__)
+
+        @app.route("/api/tasks")
+        def tasks():
+            return "[]"
+
+        if variant == "legacy":
+            @app.before_request
+            def before_request():
+                request.start_time = time.time()
+                counter.add(1, {"method": request.method, "endpoint": request.endpoint or "unknown"})
+
+            @app.after_request
+            def after_request(response):
+                duration = time.time() - request.start_time
+                histogram.record(duration, {
+                    "method": request.method,
+                    "status_code": str(response.status_code),
+                    "endpoint": request.endpoint or "unknown"
+                })
+                logger.info(
+                    f"{request.method} {request.path} - {response.status_code} - {duration:.3f}s",
+                    extra={
+                        "method": request.method,
+                        "path": request.path,
+                        "status_code": response.status_code,
+                        "duration": duration,
+                        "user_agent": request.headers.get('User-Agent', '')
+                    }
+                )
+                return response
+
+        elif variant == "bound":
+            metrics = RequestMetrics(counter, histogram, logger)
+
+            @app.before_request
+            def before_request():
+                g.request_started_ns = metrics.start(request.method, request.endpoint)
+
+            @app.after_request
+            def after_request(response):
+                metrics.finish(g.request_started_ns, request.method, request.endpoint, response.status_code, request.path)
+                return response
+
+        client = app.test_client()
+        return lambda: client.get("/api/tasks")
+
+    timings = {}
+    for variant in ("baseline", "legacy", "bound"):
+        request_once = make_app(variant)
+        request_once()
+        timings[variant] = min(_cpu_per_call(request_once, iterations) for _ in range(repeat))
+
+    return {
+        variant: {
+            "cpu_us_per_request": timings[variant] * 1e6,
+            "overhead_us": (timings[variant] - timings["baseline"]) * 1e6,
+        }
+        for variant in ("legacy", "bound")
+    }
+
+
+def bench_api_throughput(url="http://localhost:5000", rate=50, seconds=5):
+    """
+    Carga em malha aberta (load_generator, o mesmo do simulate_traffic.py)
+    contra uma To-Do App já em execução: throughput atingido e latências.
+    """
+    import requests
+
+    from load_generator import OpenLoopRunner, TaskWorkload
+
+    requests.get(f"{url}/health", timeout=5).raise_for_status()
+    stats = OpenLoopRunner(url, rate, seconds, workload=TaskWorkload(seed=42)).run()
+    total = stats.total()
+    if total.errors:
+        raise RuntimeError(f"{total.errors} de {total.response.total} requisições falharam")
+    return {
+        "throughput_rps": total.response.total / stats.elapsed,
+        "p50_ms": total.response.percentile(50) * 1000,
+        "p99_ms": total.response.percentile(99) * 1000,
+    }
+
+
+def bench_otel_emission(iterations=1000):
+    """
+    Custo de CPU por span, medição de métrica e registro de log com o SDK do
+    OpenTelemetry configurado como em otel.py (processadores em lote), com
+    exportadores que descartam os dados em vez de enviá-los pela rede.
+    """
+    import io
+    import logging
+
+    from opentelemetry.sdk._logs import LoggerProvider, LoggingHandler
+    from opentelemetry.sdk._logs.export import BatchLogRecordProcessor, LogExporter, LogExportResult
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+    class DiscardSpans(SpanExporter):
+        def export(self, spans):
+            return SpanExportResult.SUCCESS
+
+    class DiscardLogs(LogExporter):
+        def export(self, batch):
+            return LogExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(BatchSpanProcessor(DiscardSpans()))
+    tracer = tracer_provider.get_tracer("benchmark")
+
+    meter = MeterProvider(metric_readers=[InMemoryMetricReader()]).get_meter("benchmark")
+    counter = meter.create_counter("http_requests_total")
+    histogram = meter.create_histogram("http_request_duration_seconds")
+    attributes = {"method": "GET", "endpoint": "get_tasks", "status_code": "200"}
+
+    logger_provider = LoggerProvider()
+    logger_provider.add_log_record_processor(
+        BatchLogRecordProcessor(DiscardLogs(), max_queue_size=5, max_export_batch_size=1)
+    )
+    logger = logging.getLogger("benchmark.otel")
+    logger.propagate = False
+    handler = LoggingHandler(level=logging.NOTSET, logger_provider=logger_provider)
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    def span():
+        with tracer.start_as_current_span("benchmark", attributes=attributes):
+            pass
+
+    try:
+        return {
+            "span_us": _cpu_per_call(span, iterations) * 1e6,
+            "counter_us": _cpu_per_call(lambda: counter.add(1, attributes), iterations) * 1e6,
+            "histogram_us": _cpu_per_call(lambda: histogram.record(0.01, attributes), iterations) * 1e6,
+            "log_us": _cpu_per_call(lambda: logger.info("Tarefa criada", extra=attributes), iterations) * 1e6,
+        }
+    finally:
+        logger.removeHandler(handler)
+        tracer_provider.shutdown()
+        logger_provider.shutdown()
+
+
+# Percurso pelo jogo a partir do início, sem depender do calor da forja (cada
+# volta recomeça em "start": a cidade não tem caminho de volta)
+GAME_COMMANDS = (
+    "go to forest", "go east", "go towards light", "exit the cave", "go to town", "quest giver",
+    "accept quest", "go to town", "chapel", "pray", "look at sword", "go to town", "blacksmith",
+    "request sword", "check sword", "go to town", "list actions", "look around",
+)
+
+
+def bench_game_commands(iterations=1000):
+    """
+    Comandos por segundo do AdventureGame (main.py) em um percurso fixo, digitados
+    por extenso e pelo número da ação listada (como no jogo interativo).
+    """
+    from main import AdventureGame
+
+    # Partida headless: a telemetria do jogo é compartilhada pelo processo
+    game = AdventureGame("benchmark")
+
+    # O mesmo percurso pelos números das ações listadas a cada passo
+    game.here()
+    numbered = []
+    for command in GAME_COMMANDS:
+        actions = game.current_actions
+        numbered.append(str(actions.index(command) + 1) if command in actions else command)
+        game.process_command(command)
+
+    def walk():
+        game.current_location = "start"
+        for command in GAME_COMMANDS:
+            game.process_command(command)
+
+    def walk_numbered():
+        game.current_location = "start"
+        game.here()
+        for player_input in numbered:
+            game.process_command(game.resolve_command(player_input))
+
+    calls = max(iterations // len(GAME_COMMANDS), 1)
+    try:
+        per_command = _cpu_per_call(walk, calls) / len(GAME_COMMANDS)
+        per_numbered = _cpu_per_call(walk_numbered, calls) / len(GAME_COMMANDS)
+    finally:
+        game.game_active = False
+        game.telemetry.unregister(game)
+    return {
+        "commands_per_s": 1 / per_command,
+        "us_per_command": per_command * 1e6,
+        "numbered_commands_per_s": 1 / per_numbered,
+    }
+
+
+SCENARIOS = {
+    "compression": bench_compression,
+    "middleware": bench_middleware,
+    "serialization": bench_serialization,
+    "prepared": bench_prepared_statements,
+    "search": bench_search,
+    "storage": bench_storage,
+}
+
+
+REGRESSION_SUITE = {
+    "api_throughput": bench_api_throughput,
+    "otel_emission": bench_otel_emission,
+    "game_commands": bench_game_commands,
+}
+
+# Versão do formato dos arquivos de baseline
+BASELINE_FORMAT = 1
+
+# Métricas em que maior é melhor; nas demais (tempos), menor é melhor
+HIGHER_IS_BETTER_SUFFIXES = ("_rps", "_per_s")
+
+# Quantil 0,975 da distribuição t de Student por graus de liberdade (IC de 95%)
+T_975 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+    11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093,
+    20: 2.086, 25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980,
+}
+
+
+def t_critical(df):
+    """Valor crítico bicaudal de 95%, arredondando os graus de liberdade para baixo (conservador)"""
+    eligible = [key for key in T_975 if key <= df]
+    return T_975[max(eligible)] if eligible else T_975[1]
+
+
+def confidence_interval(samples):
+    """(média, meia-largura do IC de 95%)"""
+    mean = statistics.mean(samples)
+    if len(samples) < 2:
+        return mean, float("inf")
+    return mean, t_critical(len(samples) - 1) * statistics.stdev(samples) / math.sqrt(len(samples))
+
+
+def welch_difference(base, new):
+    """
+    Diferença das médias (new - base) e meia-largura do seu IC de 95% pelo teste
+    t de Welch, que não supõe variâncias iguais entre as execuções.
+    """
+    diff = statistics.mean(new) - statistics.mean(base)
+    if len(base) < 2 or len(new) < 2:
+        return diff, float("inf")
+    base_var = statistics.variance(base) / len(base)
+    new_var = statistics.variance(new) / len(new)
+    se = math.sqrt(base_var + new_var)
+    if se == 0:
+        return diff, 0.0
+    df = se ** 4 / (base_var ** 2 / (len(base) - 1) + new_var ** 2 / (len(new) - 1))
+    return diff, t_critical(df) * se
+
+
+def compare_metric(name, base, new, threshold):
+    """
+    Compara as amostras de uma métrica com o baseline.
+
+    :return: (variação relativa no sentido "pior", veredito) com veredito
+        'regression', 'improvement' ou 'unchanged'; só há regressão/melhoria se
+        a variação passa do limite e o IC da diferença não contém zero
+    """
+    diff, half_width = welch_difference(base, new)
+    base_mean = statistics.mean(base)
+    worse = -diff if name.endswith(HIGHER_IS_BETTER_SUFFIXES) else diff
+    change = worse / base_mean if base_mean else 0.0
+    significant = abs(diff) > half_width
+    if significant and change > threshold:
+        return change, "regression"
+    if significant and change < -threshold:
+        return change, "improvement"
+    return change, "unchanged"
+
+
+def run_suite(names, repeat, options):
+    """
+    Executa cada cenário uma vez para aquecimento e `repeat` vezes medindo.
+
+    :return: {cenário: {métrica: [amostras]}}; cenários indisponíveis (app
+        fora do ar, dependência ausente) são ignorados com um aviso
+    """
+    results = {}
+    for name in names:
+        scenario = REGRESSION_SUITE[name]
+        kwargs = {key: value for key, value in options.items() if key in inspect.signature(scenario).parameters}
+        try:
+            scenario(**kwargs)
+        except Exception as e:
+            print(f"⚠️  Cenário {name} ignorado: {type(e).__name__}: {e}")
+            continue
+        samples = {}
+        for _ in range(repeat):
+            for metric, value in scenario(**kwargs).items():
+                samples.setdefault(metric, []).append(value)
+        results[name] = samples
+        print(f"   ✅ {name}: {repeat} repetições")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_baseline(path, results, options):
+    """Grava as amostras como baseline (formato versionado, com commit e ambiente)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "format": BASELINE_FORMAT,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.node(),
+            "options": options,
+            "scenarios": results,
+        }, f, indent=2)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("format") != BASELINE_FORMAT:
+        raise ValueError(f"Formato de baseline {baseline.get('format')} não suportado (esperado {BASELINE_FORMAT})")
+    return baseline
+
+
+def print_comparison(baseline, results, threshold):
+    """Imprime a comparação com o baseline e retorna o número de regressões"""
+    icons = {"regression": "❌", "improvement": "🚀", "unchanged": "✅"}
+    regressions = 0
+    print(f"\n📊 Comparação com o baseline {baseline.get('commit') or ''} ({baseline['created_at']})")
+    print(f"   {'métrica':<32} {'baseline':>12} {'atual':>24} {'variação':>9}")
+    for scenario, metrics in results.items():
+        base_metrics = baseline["scenarios"].get(scenario)
+        for metric, samples in metrics.items():
+            mean, half_width = confidence_interval(samples)
+            label = f"{scenario}.{metric}"
+            if not base_metrics or metric not in base_metrics:
+                print(f"   {label:<32} {'—':>12} {mean:>12.3f} ± {half_width:<9.3f}")
+                continue
+            base = base_metrics[metric]
+            change, verdict = compare_metric(metric, base, samples, threshold)
+            regressions += verdict == "regression"
+            print(
+                f"   {label:<32} {statistics.mean(base):>12.3f} {mean:>12.3f} ± {half_width:<9.3f}"
+                f" {change:>+8.1%} {icons[verdict]}"
+            )
+    return regressions
+
+
+def regress(args):
+    """Modo `regress`: executa a suíte e compara com (ou grava) o baseline"""
+    names = args.only.split(",") if args.only else list(REGRESSION_SUITE)
+    unknown = set(names) - set(REGRESSION_SUITE)
+    if unknown:
+        sys.exit(f"Cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    options = {"url": args.url, "rate": args.rate, "seconds": args.seconds, "iterations": args.iterations}
+    results = run_suite(names, args.repeat, options)
+
+    if args.save:
+        save_baseline(args.baseline, results, options)
+        print(f"💾 Baseline salvo em {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"⚠️  Sem baseline em {args.baseline}; use --save para gravar esta execução")
+        return 0
+
+    regressions = print_comparison(load_baseline(args.baseline), results, args.threshold / 100)
+    if regressions:
+        print(f"\n❌ {regressions} métricas pioraram mais de {args.threshold}%")
+        return 1
+    print("\n✅ Nenhuma regressão")
+    return 0
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Microbenchmarks da To-Do App")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS) + ["regress"],
+                        help="Cenário a executar, ou `regress` para a suíte de regressão")
+    parser.add_argument("--rows", type=int, help="Número de linhas na tabela/resposta")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetições por variante")
+    parser.add_argument("--iterations", type=int, default=1000, help="Iterações por variante (prepared, compression, search, storage, middleware)")
+    regression = parser.add_argument_group("suíte de regressão (regress)")
+    regression.add_argument("--baseline", default="benchmarks/baseline.json", help="Arquivo JSON do baseline")
+    regression.add_argument("--save", action="store_true", help="Grava esta execução como o novo baseline")
+    regression.add_argument("--threshold", type=float, default=5.0, help="Piora tolerada, em %%")
+    regression.add_argument("--only", help="Cenários separados por vírgula (padrão: todos)")
+    regression.add_argument("--url", default="http://localhost:5000", help="URL da To-Do App (api_throughput)")
+    regression.add_argument("--rate", type=float, default=50, help="Requisições por segundo (api_throughput)")
+    regression.add_argument("--seconds", type=float, default=5, help="Duração de cada repetição (api_throughput)")
+
+    args = parser.parse_args()
+
+    if args.scenario == "regress":
+        print(f"📏 Suíte de regressão ({args.repeat} repetições por cenário)")
+        print("=" * 50)
+        sys.exit(regress(args))
+
+    print(f"📏 Benchmark: {args.scenario}")
+    print("=" * 50)
+
+    # Cada cenário recebe apenas os argumentos que declara
+    scenario = SCENARIOS[args.scenario]
+    options = {
+        name: getattr(args, name)
+        for name in inspect.signature(scenario).parameters
+        if getattr(args, name, None) is not None
+    }
+    results = scenario(**options)
+    for name, values in results.items():
+        formatted = ", ".join(f"{key}={value:.3f}" for key, value in values.items())
+        print(f"   {name:>16}: {formatted}")
+
+
+if __name__ == "__main__":
+    main()
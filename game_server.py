@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Servidor multi-sessão do Adventure Game (main.py) em um protocolo de linhas
+sobre TCP, com asyncio.
+
+Cada conexão é uma partida: a primeira linha é o nome do aventureiro e as
+seguintes são comandos (texto ou número da ação listada), respondidos com o
+texto do jogo e o prompt "> ". Como no jogo interativo, cada sessão tem um span
+de jornada com o nome do aventureiro e um span `action: <comando>` por jogada,
+e todas compartilham a GameTelemetry do processo.
+
+- Sessões ociosas por mais de `idle_timeout` são encerradas; o estado vai para
+  um cache limitado de snapshots e o cliente recebe um código de retomada: a
+  partida continua se o mesmo aventureiro voltar e informar o código. Nomes de
+  sessões ativas ou guardadas não podem ser usados por outra conexão.
+- Com `max_sessions` partidas ativas, uma nova conexão espera até
+  `admission_timeout` por uma vaga e, se não houver, recebe "busy" e é fechada.
+
+Uso: python game_server.py --port 7000 e, para jogar, nc localhost 7000
+"""
+import argparse
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+
+from main import AdventureGame, GameTelemetry
+
+# Tamanho máximo de uma linha do cliente (nome ou comando)
+MAX_LINE_BYTES = 1024
+
+
+class GameServer:
+    """
+    Hospeda partidas do AdventureGame, uma por conexão TCP.
+
+    :param max_sessions: partidas ativas ao mesmo tempo (backpressure acima disso)
+    :param idle_timeout: segundos sem comando até a sessão ser encerrada
+    :param admission_timeout: espera máxima por uma vaga quando o servidor está cheio
+    :param max_evicted: snapshots de sessões ociosas guardados para retomada (LRU)
+    """
+    def __init__(self, host="0.0.0.0", port=7000, max_sessions=1000, idle_timeout=300.0,
+                 admission_timeout=5.0, max_evicted=10000, telemetry=None):
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.admission_timeout = admission_timeout
+        self.max_evicted = max_evicted
+        self.telemetry = telemetry or GameTelemetry.shared()
+        self.sessions = 0
+        self.active_names = set()
+        self.evicted = OrderedDict()  # nome -> (código de retomada, snapshot)
+        self._slots = asyncio.Semaphore(max_sessions)
+        self._server = None
+
+        meter = self.telemetry.meter
+        self.active_sessions = meter.create_up_down_counter(
+            name="game_sessions_active",
+            description="Game sessions currently connected"
+        )
+        self.session_outcomes = meter.create_counter(
+            name="game_sessions_total",
+            description="Finished game sessions by reason (ended, quit, disconnected, evicted, rejected, name_taken, invalid)"
+        )
+        self.session_duration = meter.create_histogram(
+            name="game_session_duration_seconds",
+            description="Game session duration",
+            unit="s"
+        )
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self.handle_client, self.host, self.port, limit=MAX_LINE_BYTES
+        )
+        return self._server
+
+    async def serve_forever(self):
+        server = self._server or await self.start()
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def handle_client(self, reader, writer):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.admission_timeout)
+        except asyncio.TimeoutError:
+            self.session_outcomes.add(1, {"reason": "rejected"})
+            logging.warning(f"Game server busy: {self.sessions} active sessions, connection rejected")
+            writer.write(b"Server busy, try again later.\n")
+            await self._close_writer(writer)
+            return
+
+        self.sessions += 1
+        self.active_sessions.add(1)
+        try:
+            await self._run_session(reader, writer)
+        except (ConnectionError, ValueError):
+            # Cliente caiu ou mandou um comando maior que MAX_LINE_BYTES durante a partida
+            # (contabilizada como "disconnected" pelo finally de _run_session)
+            pass
+        finally:
+            self.sessions -= 1
+            self.active_sessions.add(-1)
+            self._slots.release()
+            await self._close_writer(writer)
+
+    async def _readline(self, reader):
+        """Próxima linha do cliente, sem o fim de linha; None se a conexão fechou"""
+        line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+        if not line:
+            return None
+        return line.decode("utf-8", "replace").strip()
+
+    async def _drain(self, writer):
+        """Espera o cliente consumir a saída; um cliente que não lê por `idle_timeout` levanta TimeoutError"""
+        await asyncio.wait_for(writer.drain(), self.idle_timeout)
+
+    async def _run_session(self, reader, writer):
+        writer.write(b"Enter your name, brave adventurer: ")
+        try:
+            await self._drain(writer)
+            name = await self._readline(reader)
+        except asyncio.TimeoutError:
+            self.session_outcomes.add(1, {"reason": "evicted"})
+            return
+        except ValueError:
+            # Linha maior que MAX_LINE_BYTES
+            self.session_outcomes.add(1, {"reason": "invalid"})
+            return
+        if not name:
+            self.session_outcomes.add(1, {"reason": "disconnected"})
+            return
+
+        snapshot = None
+        if name in self.active_names:
+            writer.write(b"That adventurer is already playing. Choose another name.\n")
+            self.session_outcomes.add(1, {"reason": "name_taken"})
+            return
+        if name in self.evicted:
+            # Só quem recebeu o código na desconexão retoma a partida guardada
+            writer.write(b"Resume code: ")
+            try:
+                await self._drain(writer)
+                code = await self._readline(reader)
+            except asyncio.TimeoutError:
+                self.session_outcomes.add(1, {"reason": "evicted"})
+                return
+            except ValueError:
+                self.session_outcomes.add(1, {"reason": "invalid"})
+                return
+            if name in self.active_names or name not in self.evicted:
+                # Outra conexão retomou (ou reiniciou) a partida enquanto esperávamos o código
+                writer.write(b"That adventurer is already playing. Choose another name.\n")
+                self.session_outcomes.add(1, {"reason": "name_taken"})
+                return
+            token, snapshot = self.evicted[name]
+            if not code or not secrets.compare_digest(code, token):
+                writer.write(b"Wrong resume code. Choose another name.\n")
+                self.session_outcomes.add(1, {"reason": "name_taken"})
+                return
+            del self.evicted[name]
+
+        if snapshot is not None:
+            game = AdventureGame.restore(snapshot, telemetry=self.telemetry)
+            greeting = f"Welcome back, {name}!"
+        else:
+            game = AdventureGame(name, telemetry=self.telemetry)
+            greeting = "Welcome to your text adventure! Type 'quit' to exit."
+        self.active_names.add(name)
+        logging.info(f"{greeting} ({name} connected to the game server)")
+
+        started = time.monotonic()
+        journey_span = self.telemetry.tracer.start_span(
+            name, attributes={"adventurer": name, "game.resumed": snapshot is not None}
+        )
+        reason = "disconnected"
+        try:
+            writer.write(f"{greeting}\n{game.here()}\n> ".encode("utf-8"))
+            while game.game_active:
+                try:
+                    # Cliente que não lê as respostas (drain preso) conta como ocioso
+                    await self._drain(writer)
+                    player_input = await self._readline(reader)
+                except asyncio.TimeoutError:
+                    reason = "evicted"
+                    token = self._evict(game)
+                    journey_span.add_event("Session evicted", {"idle_timeout_s": self.idle_timeout})
+                    writer.write(
+                        f"\nIdle for too long, session closed. Reconnect as {name} with resume code {token} "
+                        "to continue.\n".encode("utf-8")
+                    )
+                    # Sem esperar o drain: o cliente pode ser justamente o que parou de ler
+                    break
+                if player_input is None:
+                    break
+                if not player_input:
+                    writer.write(b"> ")
+                    continue
+                # Os spans de ação são filhos da jornada desta sessão
+                with trace.use_span(journey_span, end_on_exit=False):
+                    command, response = game.play_turn(player_input, journey_span)
+                writer.write(f"{response}\n".encode("utf-8"))
+                if game.game_active:
+                    writer.write(b"> ")
+                else:
+                    reason = "quit" if command.lower() in ("quit", "exit") else "ended"
+                    journey_span.set_status(Status(StatusCode.OK))
+                    writer.write(b"Thank you for playing!\n")
+                    logging.info(f"{name}'s adventure has ended.")
+            if reason in ("quit", "ended"):
+                try:
+                    await self._drain(writer)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.active_names.discard(name)
+            game.game_active = False
+            self.telemetry.unregister(game)
+            journey_span.set_attribute("game.end_reason", reason)
+            journey_span.end()
+            self.session_outcomes.add(1, {"reason": reason})
+            self.session_duration.record(time.monotonic() - started, {"reason": reason})
+
+    def _evict(self, game):
+        """
+        Guarda o snapshot da sessão ociosa para retomada, descartando os mais
+        antigos, e retorna o código que o cliente precisa para retomá-la.
+        """
+        token = secrets.token_hex(4)
+        self.evicted[game.adventurer_name] = (token, game.snapshot())
+        self.evicted.move_to_end(game.adventurer_name)
+        while len(self.evicted) > self.max_evicted:
+            self.evicted.popitem(last=False)
+        return token
+
+    async def _close_writer(self, writer):
+        try:
+            writer.close()
+            # Com o buffer cheio de um cliente que não lê, o fechamento nunca terminaria
+            await asyncio.wait_for(writer.wait_closed(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            writer.transport.abort()
+        except ConnectionError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor multi-sessão do Adventure Game (protocolo de linhas sobre TCP)")
+    parser.add_argument("--host", default="0.0.0.0", help="Endereço de escuta")
+    parser.add_argument("--port", type=int, default=7000, help="Porta de escuta")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="Partidas ativas ao mesmo tempo")
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="Segundos sem comando até encerrar a sessão")
+    parser.add_argument("--admission-timeout", type=float, default=5.0,
+                        help="Espera máxima por uma vaga com o servidor cheio, em segundos")
+    args = parser.parse_args()
+
+    server = GameServer(
+        args.host, args.port, args.max_sessions, args.idle_timeout, args.admission_timeout
+    )
+    print(f"🎮 Adventure Game em {args.host}:{args.port} (até {args.max_sessions} sessões, "
+          f"ociosidade {args.idle_timeout:.0f}s)")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\n🛑 Servidor encerrado")
+    finally:
+        server.telemetry.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,818 @@
+"""
+Gerador de carga em malha aberta (open-loop) para a To-Do App.
+
+As requisições são disparadas em uma taxa fixa (ou em rampa) definida de
+antemão, independente de quanto o servidor demora para responder, e a latência
+é medida a partir do instante em que cada requisição *deveria* ter sido
+enviada. Assim a espera causada por um servidor lento entra na medição, em vez
+de simplesmente atrasar as próximas requisições (coordinated omission).
+
+Também reproduz gravações de tráfego real (TRAFFIC_RECORD_PATH da aplicação)
+com a mesma medição. Um único processo Python satura bem antes de uma
+aplicação com vários workers, então a carga pode ser dividida entre processos
+(run_processes) e entre máquinas (LoadAgent/run_distributed); os histogramas
+de cada parte são somados sem perda de precisão.
+
+Cada requisição também é decomposta em fases (fila do gerador, conexão, rede,
+fila de admissão, aplicação, banco e transferência) usando o header
+Server-Timing da aplicação. Com OpenTelemetry instalado, o gerador pode criar
+spans de cliente e propagar o contexto W3C (traceparent), ligando a latência
+vista pelo cliente aos spans do servidor.
+
+Usado pelo simulate_traffic.py; só depende da biblioteca padrão (o
+OpenTelemetry só é importado quando o tracing é ativado).
+"""
+import asyncio
+import json
+import math
+import multiprocessing
+import random
+import re
+import socket
+import socketserver
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit
+
+
+class LatencyHistogram:
+    """
+    Histograma de latências no estilo HdrHistogram, em microssegundos.
+
+    Os buckets são log-lineares: cada potência de 2 é dividida em
+    2**(sub_bucket_bits - 1) sub-buckets, o que dá erro relativo máximo de
+    ~0,8% com o padrão (8 bits) em qualquer ordem de grandeza. As contagens
+    ficam em um dict esparso, então histogramas de processos diferentes podem
+    ser somados sem perda (`merge`) e serializados em JSON.
+    """
+    def __init__(self, sub_bucket_bits=8):
+        self.sub_bucket_bits = sub_bucket_bits
+        self._half = 1 << (sub_bucket_bits - 1)
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.sum = 0
+
+    def _index(self, value):
+        shift = max(0, value.bit_length() - self.sub_bucket_bits)
+        return shift * self._half + (value >> shift)
+
+    def _highest_equivalent(self, index):
+        """Maior valor que cai no mesmo bucket do índice"""
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        sub_bucket = index - shift * self._half
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, seconds, count=1):
+        """Registra uma latência (em segundos)"""
+        value = max(0, int(seconds * 1e6))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.sum += value * count
+        self.max = max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+
+    def merge(self, other):
+        """Soma outro histograma (mesma resolução) a este"""
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("Histogramas com resoluções diferentes")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        return self
+
+    def percentile(self, percent):
+        """Latência (s) abaixo da qual estão `percent`% das amostras"""
+        if not self.total:
+            return 0.0
+        target = max(1, -(-self.total * percent // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max) / 1e6
+        return self.max / 1e6
+
+    def mean(self):
+        return self.sum / self.total / 1e6 if self.total else 0.0
+
+    def to_dict(self):
+        return {
+            "sub_bucket_bits": self.sub_bucket_bits,
+            "counts": {str(index): count for index, count in self.counts.items()},
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "sum": self.sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["sub_bucket_bits"])
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        histogram.sum = data["sum"]
+        return histogram
+
+
+# Fases da decomposição de latência, na ordem em que acontecem
+PHASES = ("schedule", "client_queue", "connect", "network", "server_queue", "app", "db", "transfer")
+
+
+class EndpointStats:
+    """
+    Resultados de um endpoint.
+
+    `response` mede do envio planejado até o fim da resposta (o que o usuário
+    sente, incluindo filas do gerador e do servidor); `service` mede do envio
+    efetivo até o fim da resposta. `phases` tem um histograma por fase (PHASES):
+    atraso do gerador, espera por conexão livre, conexão TCP, rede (tempo até a
+    resposta menos o tempo no servidor), fila de admissão, aplicação e banco
+    (do Server-Timing) e transferência do corpo.
+    """
+    def __init__(self):
+        self.response = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.statuses = Counter()
+        self.errors = 0
+        self.phases = {}
+
+    def record_phases(self, phases):
+        for name, seconds in phases.items():
+            histogram = self.phases.get(name)
+            if histogram is None:
+                histogram = self.phases[name] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def record(self, response_time, service_time, status):
+        self.response.record(response_time)
+        self.service.record(service_time)
+        self.statuses[str(status)] += 1
+        if not isinstance(status, int) or status >= 500:
+            self.errors += 1
+
+    def merge(self, other):
+        self.response.merge(other.response)
+        self.service.merge(other.service)
+        self.statuses.update(other.statuses)
+        self.errors += other.errors
+        for name, histogram in other.phases.items():
+            self.phases.setdefault(name, LatencyHistogram()).merge(histogram)
+        return self
+
+    def to_dict(self):
+        return {
+            "response": self.response.to_dict(),
+            "service": self.service.to_dict(),
+            "statuses": dict(self.statuses),
+            "errors": self.errors,
+            "phases": {name: histogram.to_dict() for name, histogram in self.phases.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.response = LatencyHistogram.from_dict(data["response"])
+        stats.service = LatencyHistogram.from_dict(data["service"])
+        stats.statuses = Counter(data["statuses"])
+        stats.errors = data["errors"]
+        stats.phases = {name: LatencyHistogram.from_dict(value) for name, value in data.get("phases", {}).items()}
+        return stats
+
+
+class LoadStats:
+    """Resultados de uma execução: estatísticas por endpoint e contadores do gerador"""
+    def __init__(self):
+        self.endpoints = {}
+        self.elapsed = 0.0
+        # Requisições enviadas mais de 10ms depois do planejado (gerador saturado)
+        self.late_starts = 0
+        # Requisições descartadas por exceder o limite de requisições em voo
+        self.dropped = 0
+
+    def endpoint(self, name):
+        stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints[name] = EndpointStats()
+        return stats
+
+    def total(self):
+        """Estatísticas somadas de todos os endpoints"""
+        total = EndpointStats()
+        for stats in self.endpoints.values():
+            total.merge(stats)
+        return total
+
+    def merge(self, other):
+        for name, stats in other.endpoints.items():
+            self.endpoint(name).merge(stats)
+        # Processos rodam em paralelo: a duração é a do mais longo
+        self.elapsed = max(self.elapsed, other.elapsed)
+        self.late_starts += other.late_starts
+        self.dropped += other.dropped
+        return self
+
+    def to_dict(self):
+        return {
+            "endpoints": {name: stats.to_dict() for name, stats in self.endpoints.items()},
+            "elapsed": self.elapsed,
+            "late_starts": self.late_starts,
+            "dropped": self.dropped,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.endpoints = {name: EndpointStats.from_dict(value) for name, value in data["endpoints"].items()}
+        stats.elapsed = data["elapsed"]
+        stats.late_starts = data["late_starts"]
+        stats.dropped = data["dropped"]
+        return stats
+
+    def summary(self):
+        """Resumo por endpoint: throughput, taxa de erro e percentis (ms)"""
+        rows = {}
+        for name, stats in sorted(self.endpoints.items()) + [("TOTAL", self.total())]:
+            count = stats.response.total
+            rows[name] = {
+                "requests": count,
+                "throughput_rps": count / self.elapsed if self.elapsed else 0.0,
+                "error_rate": stats.errors / count if count else 0.0,
+                "mean_ms": stats.response.mean() * 1000,
+                **{
+                    f"p{label}_ms": stats.response.percentile(percent) * 1000
+                    for label, percent in (("50", 50), ("90", 90), ("99", 99), ("99.9", 99.9))
+                },
+                "max_ms": stats.response.max / 1000,
+                "service_p99_ms": stats.service.percentile(99) * 1000,
+            }
+        return rows
+
+
+def print_report(stats):
+    """Imprime o resumo de uma execução"""
+    summary = stats.summary()
+    print(f"\n📊 Resultado ({stats.elapsed:.1f}s)")
+    print(f"   {'endpoint':<16} {'reqs':>8} {'rps':>8} {'erros':>7} "
+          f"{'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'max':>8}")
+    for name, row in summary.items():
+        print(
+            f"   {name:<16} {row['requests']:>8} {row['throughput_rps']:>8.1f} {row['error_rate']:>7.2%} "
+            f"{row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+            f"{row['p99.9_ms']:>8.1f} {row['max_ms']:>8.1f}"
+        )
+    print("   (latências em ms, medidas a partir do envio planejado)")
+    if stats.late_starts or stats.dropped:
+        print(f"   ⚠️ Gerador saturado: {stats.late_starts} envios atrasados, {stats.dropped} descartados")
+
+    rows = [(name, endpoint.phases) for name, endpoint in sorted(stats.endpoints.items()) if endpoint.phases]
+    if rows:
+        phases = [phase for phase in PHASES if any(phase in endpoint_phases for _, endpoint_phases in rows)]
+        print("\n⏱️ Decomposição da latência (média em ms)")
+        print(f"   {'endpoint':<16} " + " ".join(f"{phase:>12}" for phase in phases))
+        for name, endpoint_phases in rows:
+            values = [endpoint_phases[phase].mean() * 1000 if phase in endpoint_phases else 0.0 for phase in phases]
+            print(f"   {name:<16} " + " ".join(f"{value:>12.2f}" for value in values))
+
+
+def parse_server_timing(header):
+    """Header Server-Timing -> {fase: segundos} (apenas métricas com dur)"""
+    phases = {}
+    for metric in header.split(","):
+        name, *params = (part.strip() for part in metric.split(";"))
+        for param in params:
+            key, _, value = param.partition("=")
+            if key == "dur" and name:
+                try:
+                    phases[name] = float(value) / 1000
+                except ValueError:
+                    pass
+    return phases
+
+
+class ClientTracing:
+    """
+    Spans de cliente do OpenTelemetry para as requisições do gerador.
+
+    Cada requisição ganha um span (kind CLIENT) cujo contexto vai no header
+    traceparent (W3C), então o span do FlaskInstrumentor no servidor vira filho
+    dele; as fases da decomposição entram como atributos do span.
+
+    :param tracer: tracer do OpenTelemetry (veja `setup_client_tracing`)
+    """
+    def __init__(self, tracer):
+        from opentelemetry import propagate, trace
+
+        self.tracer = tracer
+        self._propagate = propagate
+        self._trace = trace
+
+    def start(self, name, method, path, headers):
+        """Inicia o span e injeta o contexto em `headers`"""
+        span = self.tracer.start_span(
+            f"{method} {name}",
+            kind=self._trace.SpanKind.CLIENT,
+            attributes={"http.method": method, "http.target": path, "load.endpoint": name},
+        )
+        self._propagate.inject(headers, context=self._trace.set_span_in_context(span))
+        return span
+
+    def finish(self, span, status, phases):
+        for phase, seconds in phases.items():
+            span.set_attribute(f"latency.{phase}_ms", round(seconds * 1000, 3))
+        if isinstance(status, int):
+            span.set_attribute("http.status_code", status)
+        if not isinstance(status, int) or status >= 500:
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(status)))
+        span.end()
+
+    def flush(self):
+        provider = self._trace.get_tracer_provider()
+        if hasattr(provider, "force_flush"):
+            provider.force_flush()
+
+
+def setup_client_tracing(service_name="traffic-simulator"):
+    """Configura o OpenTelemetry como nos demais serviços (otel.py) e retorna um ClientTracing"""
+    from otel import CustomTracer
+
+    return ClientTracing(CustomTracer(service_name).get_trace().get_tracer(service_name))
+
+
+class HttpClient:
+    """
+    Cliente HTTP/1.1 mínimo sobre asyncio, com conexões keep-alive reutilizadas.
+
+    :param max_connections: conexões simultâneas (requisições além disso esperam)
+    """
+    def __init__(self, base_url, max_connections=1000, timeout=10.0):
+        url = urlsplit(base_url)
+        if url.scheme != "http":
+            raise ValueError("Apenas URLs http:// são suportadas")
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.host_header = url.netloc
+        self.timeout = timeout
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def _connect(self):
+        return await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+
+    async def _read_response(self, reader, timings):
+        head = await reader.readuntil(b"\r\n\r\n")
+        timings["first_byte"] = time.perf_counter()
+        lines = head.decode("latin-1").split("\r\n")
+        version, status = lines[0].split(" ", 2)[:2]
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        if "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            body = b"".join(chunks)
+        else:
+            body = await reader.read()
+            headers["connection"] = "close"
+
+        keep_alive = (
+            headers.get("connection", "").lower() != "close"
+            and (version == "HTTP/1.1" or headers.get("connection", "").lower() == "keep-alive")
+        )
+        return int(status), headers, body, keep_alive
+
+    async def request(self, method, path, body=None, headers=None, timings=None):
+        """
+        Envia uma requisição e retorna (status, headers, corpo em bytes).
+
+        :param timings: dict opcional preenchido com os tempos (s) do cliente:
+            client_queue (espera por conexão), connect, ttfb (envio até o
+            cabeçalho da resposta) e transfer (leitura do corpo)
+        """
+        timings = {} if timings is None else timings
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host_header}", f"Content-Length: {len(payload)}"]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        raw = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload
+
+        queued = time.perf_counter()
+        async with self._slots:
+            started = time.perf_counter()
+            timings["client_queue"] = started - queued
+            reused = bool(self._idle)
+            reader, writer = self._idle.pop() if reused else await self._connect()
+            try:
+                try:
+                    sent = time.perf_counter()
+                    response = await self._exchange(reader, writer, raw, timings)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if not reused:
+                        raise
+                    # Conexão keep-alive fechada pelo servidor: repete em uma nova
+                    writer.close()
+                    reader, writer = await self._connect()
+                    sent = time.perf_counter()
+                    response = await self._exchange(reader, writer, raw, timings)
+            except BaseException:
+                writer.close()
+                raise
+            done = time.perf_counter()
+            timings["connect"] = sent - started
+            timings["ttfb"] = timings["first_byte"] - sent
+            timings["transfer"] = done - timings.pop("first_byte")
+
+            status, response_headers, response_body, keep_alive = response
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, response_headers, response_body
+
+    async def _exchange(self, reader, writer, raw, timings):
+        writer.write(raw)
+        return await asyncio.wait_for(self._read_response(reader, timings), self.timeout)
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class TaskWorkload:
+    """
+    Mistura de requisições da To-Do App: cada chamada de `next_request` sorteia
+    um endpoint pelos pesos e retorna (nome, método, caminho, corpo).
+
+    Ids de tarefas criadas são guardados para as operações de completar e remover.
+    """
+    DEFAULT_WEIGHTS = {"list": 50, "create": 25, "complete": 10, "delete": 5, "search": 10}
+    SAMPLE_TITLES = (
+        "Implementar dashboard de métricas",
+        "Configurar alertas do Prometheus",
+        "Revisar logs de erro da aplicação",
+        "Otimizar consultas no banco de dados",
+        "Atualizar dependências do projeto",
+    )
+
+    def __init__(self, weights=None, seed=None):
+        weights = weights or self.DEFAULT_WEIGHTS
+        self.names = list(weights)
+        self.weights = [weights[name] for name in self.names]
+        self.random = random.Random(seed)
+        self.task_ids = deque(maxlen=10000)
+
+    def next_request(self):
+        name = self.random.choices(self.names, self.weights)[0]
+        if name in ("complete", "delete") and not self.task_ids:
+            name = "list"
+        if name == "list":
+            return name, "GET", "/api/tasks", None
+        if name == "search":
+            term = self.random.choice(self.SAMPLE_TITLES).split()[0][:4]
+            return name, "GET", f"/api/tasks/search?q={term}", None
+        if name == "create":
+            return name, "POST", "/api/tasks", {"title": self.random.choice(self.SAMPLE_TITLES)}
+        task_id = self.task_ids.popleft() if name == "delete" else self.random.choice(self.task_ids)
+        if name == "complete":
+            return name, "POST", f"/api/tasks/{task_id}/complete", None
+        return name, "DELETE", f"/api/tasks/{task_id}", None
+
+    def observe(self, request, status, body):
+        """Aprende com a resposta (ids das tarefas criadas)"""
+        if request[0] == "create" and status == 201:
+            self.task_ids.append(json.loads(body)["id"])
+
+
+def load_recording(path):
+    """Lê uma gravação JSONL (TRAFFIC_RECORD_PATH) ordenada pelo horário de chegada"""
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries
+
+
+class ReplayWorkload:
+    """
+    Reproduz uma gravação de tráfego.
+
+    Os ids das tarefas no banco de destino não são os da gravação: cada criação
+    reproduzida associa o id gravado (created_id) ao id novo, e os caminhos
+    /api/tasks/<id> seguintes são reescritos. Se uma operação chega antes da
+    resposta da criação correspondente (replay muito acelerado), o id gravado é
+    usado como está.
+    """
+    TASK_PATH = re.compile(r"^/api/tasks/(\d+)(/.*)?$")
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.id_map = {}
+        # Respostas com status diferente do gravado
+        self.status_mismatches = 0
+
+    def schedule(self, speed=1.0):
+        """(instante planejado, fábrica da requisição), preservando os intervalos gravados"""
+        if not self.entries:
+            return
+        start = self.entries[0]["ts"]
+        for entry in self.entries:
+            yield (entry["ts"] - start) / speed, partial(self.request_for, entry)
+
+    def request_for(self, entry):
+        path = entry["path"]
+        match = self.TASK_PATH.match(path)
+        if match:
+            task_id = self.id_map.get(int(match.group(1)), match.group(1))
+            path = f"/api/tasks/{task_id}{match.group(2) or ''}"
+        return entry["endpoint"], entry["method"], path, entry.get("body"), entry
+
+    def observe(self, request, status, body):
+        entry = request[4]
+        if status != entry["status"]:
+            self.status_mismatches += 1
+        if entry.get("created_id") is not None and status == 201:
+            self.id_map[entry["created_id"]] = json.loads(body)["id"]
+
+
+def arrival_times(rate, duration, ramp_to=None):
+    """
+    Instantes planejados (s desde o início) das requisições.
+
+    Com `ramp_to` a taxa cresce linearmente de `rate` até `ramp_to` ao longo de `duration`.
+    """
+    end_rate = rate if ramp_to is None else ramp_to
+    t = 0.0
+    while t < duration:
+        yield t
+        current = rate + (end_rate - rate) * (t / duration)
+        t += 1.0 / max(current, 1e-6)
+
+
+class OpenLoopRunner:
+    """
+    Executa uma carga em malha aberta e coleta LoadStats.
+
+    :param max_inflight: limite de requisições em voo; acima dele a requisição
+        é descartada e contada em `dropped` (sinal de que o gerador ou o
+        servidor não acompanham a taxa)
+    :param tracing: ClientTracing opcional (spans de cliente + traceparent)
+    """
+    # Atraso no envio a partir do qual o gerador é considerado saturado
+    LATE_START_THRESHOLD = 0.010
+
+    def __init__(self, base_url, rate, duration, ramp_to=None, workload=None,
+                 connections=1000, max_inflight=10000, timeout=10.0, tracing=None):
+        self.base_url = base_url
+        self.rate = rate
+        self.duration = duration
+        self.ramp_to = ramp_to
+        self.workload = workload or TaskWorkload()
+        self.connections = connections
+        self.max_inflight = max_inflight
+        self.timeout = timeout
+        self.tracing = tracing
+        self.stats = LoadStats()
+
+    def schedule(self):
+        """(instante planejado, fábrica da requisição) de cada requisição"""
+        for offset in arrival_times(self.rate, self.duration, self.ramp_to):
+            yield offset, self.workload.next_request
+
+    async def _issue(self, client, intended, make_request):
+        # A requisição é montada no envio, com o que já se aprendeu das respostas
+        request = make_request()
+        name, method, path, body = request[:4]
+        sent = time.perf_counter()
+        if sent - intended > self.LATE_START_THRESHOLD:
+            self.stats.late_starts += 1
+        headers = {}
+        span = self.tracing.start(name, method, path, headers) if self.tracing is not None else None
+        timings = {}
+        try:
+            status, response_headers, response_body = await client.request(method, path, body, headers, timings)
+            self.workload.observe(request, status, response_body)
+        except Exception as e:
+            status = type(e).__name__
+            response_headers = {}
+        done = time.perf_counter()
+
+        phases = {"schedule": sent - intended}
+        if "ttfb" in timings:
+            phases.update(
+                client_queue=timings["client_queue"], connect=timings["connect"], transfer=timings["transfer"]
+            )
+            server = parse_server_timing(response_headers.get("server-timing", ""))
+            if "total" in server:
+                phases["network"] = max(timings["ttfb"] - server["total"], 0.0)
+                for phase, metric in (("server_queue", "queue"), ("app", "app"), ("db", "db")):
+                    if metric in server:
+                        phases[phase] = server[metric]
+        if span is not None:
+            self.tracing.finish(span, status, phases)
+
+        stats = self.stats.endpoint(name)
+        stats.record(done - intended, done - sent, status)
+        stats.record_phases(phases)
+
+    async def run_async(self):
+        client = HttpClient(self.base_url, max_connections=self.connections, timeout=self.timeout)
+        inflight = set()
+        start = time.perf_counter()
+        try:
+            for offset, make_request in self.schedule():
+                intended = start + offset
+                # Mesmo atrasado, cede o loop para as respostas serem processadas
+                await asyncio.sleep(max(0.0, intended - time.perf_counter()))
+                if len(inflight) >= self.max_inflight:
+                    self.stats.dropped += 1
+                    continue
+                task = asyncio.create_task(self._issue(client, intended, make_request))
+                inflight.add(task)
+                task.add_done_callback(inflight.discard)
+            if inflight:
+                await asyncio.wait(inflight)
+        finally:
+            await client.close()
+            if self.tracing is not None:
+                self.tracing.flush()
+        self.stats.elapsed = time.perf_counter() - start
+        return self.stats
+
+    def run(self):
+        return asyncio.run(self.run_async())
+
+
+class ReplayRunner(OpenLoopRunner):
+    """
+    Reproduz uma gravação em malha aberta, `speed` vezes mais rápido que o
+    original (1x, 10x, 100x...), mantendo os intervalos entre chegadas e,
+    portanto, a concorrência relativa do tráfego gravado.
+    """
+    def __init__(self, base_url, entries, speed=1.0, connections=1000, max_inflight=10000, timeout=10.0,
+                 tracing=None):
+        duration = (entries[-1]["ts"] - entries[0]["ts"]) / speed if entries else 0.0
+        super().__init__(
+            base_url, rate=None, duration=duration, workload=ReplayWorkload(entries),
+            connections=connections, max_inflight=max_inflight, timeout=timeout, tracing=tracing
+        )
+        self.speed = speed
+
+    def schedule(self):
+        return self.workload.schedule(self.speed)
+
+
+# Tempo para todos os processos/agentes subirem antes do início combinado
+START_DELAY = 2.0
+
+
+def split_load(config, parts):
+    """
+    Divide uma configuração de carga em `parts` fatias: taxa, conexões e limite
+    de requisições em voo são repartidos, e cada fatia recebe sua própria
+    semente para que os processos não gerem a mesma sequência.
+
+    As sementes das fatias são sorteadas a partir da semente da configuração
+    (e não `seed + índice`), então a divisão entre agentes e depois entre
+    processos não repete sementes em fatias diferentes.
+    """
+    seed = config.get("seed")
+    seeds = random.Random(seed) if seed is not None else None
+    slices = []
+    for index in range(parts):
+        part = dict(config)
+        part["rate"] = config["rate"] / parts
+        if config.get("ramp_to"):
+            part["ramp_to"] = config["ramp_to"] / parts
+        part["connections"] = math.ceil(config.get("connections", 1000) / parts)
+        part["max_inflight"] = math.ceil(config.get("max_inflight", 10000) / parts)
+        part["seed"] = None if seeds is None else seeds.getrandbits(64)
+        slices.append(part)
+    return slices
+
+
+def run_worker(config):
+    """
+    Executa uma fatia da carga no processo atual e retorna LoadStats.to_dict().
+
+    Espera até `start_at` (horário de parede) para que todas as fatias comecem
+    juntas.
+    """
+    start_at = config.get("start_at")
+    if start_at:
+        time.sleep(max(0.0, start_at - time.time()))
+    runner = OpenLoopRunner(
+        config["base_url"], config["rate"], config["duration"],
+        ramp_to=config.get("ramp_to"),
+        workload=TaskWorkload(config.get("weights"), seed=config.get("seed")),
+        connections=config.get("connections", 1000),
+        max_inflight=config.get("max_inflight", 10000),
+        timeout=config.get("timeout", 10.0),
+        tracing=setup_client_tracing() if config.get("trace") else None
+    )
+    return runner.run().to_dict()
+
+
+def merge_results(results):
+    """Soma os LoadStats.to_dict() de várias fatias em um único LoadStats"""
+    stats = LoadStats()
+    for result in results:
+        stats.merge(LoadStats.from_dict(result))
+    return stats
+
+
+def run_processes(config, processes):
+    """
+    Executa a carga em `processes` processos, cada um com seu event loop e seu
+    pool de conexões, e retorna os resultados somados.
+    """
+    config = dict(config)
+    config.setdefault("start_at", time.time() + START_DELAY)
+    if processes == 1:
+        return merge_results([run_worker(config)])
+    # spawn: processos novos, sem herdar threads e providers do OpenTelemetry do pai
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        return merge_results(pool.map(run_worker, split_load(config, processes)))
+
+
+class LoadAgent(socketserver.ThreadingTCPServer):
+    """
+    Agente de carga para execuções em várias máquinas.
+
+    Protocolo: o coordenador envia uma linha JSON com a configuração da fatia e
+    recebe uma linha JSON com {"stats": LoadStats.to_dict()} ou {"error": ...}.
+    O agente divide a fatia entre `processes` processos locais. O início é
+    combinado por horário de parede, então os relógios das máquinas devem estar
+    sincronizados (NTP).
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, processes=1):
+        super().__init__(address, _AgentHandler)
+        self.processes = processes
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            stats = run_processes(json.loads(line), self.server.processes)
+            reply = {"stats": stats.to_dict()}
+        except Exception as e:
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+def parse_address(address, default_port=7070):
+    """'host[:porta]' -> (host, porta)"""
+    host, separator, port = address.rpartition(":")
+    if not separator:
+        return address, default_port
+    return host, int(port)
+
+
+def _run_on_agent(address, config):
+    timeout = config["duration"] + START_DELAY + config.get("timeout", 10.0) + 30
+    with socket.create_connection(parse_address(address), timeout=timeout) as conn:
+        conn.sendall(json.dumps(config).encode("utf-8") + b"\n")
+        reply = json.loads(conn.makefile("rb").readline() or b"{}")
+    if "stats" not in reply:
+        raise RuntimeError(f"Agente {address}: {reply.get('error', 'sem resposta')}")
+    return reply["stats"]
+
+
+def run_distributed(config, agents):
+    """
+    Divide a carga entre agentes (LoadAgent) e retorna os resultados somados.
+
+    :param agents: endereços 'host:porta' dos agentes
+    """
+    config = dict(config, start_at=time.time() + START_DELAY + 1.0)
+    slices = split_load(config, len(agents))
+    with ThreadPoolExecutor(len(agents)) as executor:
+        return merge_results(executor.map(_run_on_agent, agents, slices))
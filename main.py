@@ -1,10 +1,19 @@
 from otel import CustomLogFW, CustomMetrics, CustomTracer, CustomPyroscope
 from opentelemetry import metrics, trace
 from opentelemetry.trace import Status, StatusCode
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+import bisect
+import heapq
+import itertools
+import random
 import threading
 import time
 import logging
+import struct
 import sys
+import weakref
 
 class Colors:
     RESET = "\033[0m"
@@ -15,32 +24,105 @@ class Colors:
     MAGENTA = "\033[35m"
     CYAN = "\033[36m"
 
-class AdventureGame:
+# A forja esquenta 1 grau por tick enquanto acesa e pega fogo ao chegar em FORGE_BURN_HEAT
+FORGE_TICK_SECONDS = 1.0
+FORGE_BURN_HEAT = 50
+
+
+class ForgeScheduler:
+    """
+    Uma única thread para as forjas de todas as partidas do processo.
+
+    O calor é calculado sob demanda a partir do instante em que a forja foi
+    acesa (ver AdventureGame.heat); o escalonador só guarda, em um heap, o
+    instante em que cada forja acesa vai pegar fogo e aplica o incêndio nesse
+    momento. Entradas de forjas resfriadas, partidas encerradas ou já coletadas
+    (referências fracas) são descartadas quando chegam ao topo do heap.
+    """
     def __init__(self):
-        service_name = "adventure"
-        # Get the adventurer's name from the user
-        self.adventurer_name = input("Enter your name, brave adventurer: ")
-        
-        # Variáveis para tracking de erros
-        self.total_errors = 0
-        self.total_attempts = 0
-        
+        self._heap = []  # (instante do incêndio, sequência, weakref da partida)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, game, deadline):
+        """Verifica a forja de `game` no instante `deadline` (time.monotonic())"""
+        with self._condition:
+            heapq.heappush(self._heap, (deadline, next(self._sequence), weakref.ref(game)))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="forge-scheduler", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def pending(self):
+        """Verificações agendadas (inclui as que serão descartadas)"""
+        with self._condition:
+            return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                deadline, _, game_ref = self._heap[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    # Acorda antes se uma forja com prazo menor for agendada
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+            game = game_ref()
+            if game is not None and game.game_active:
+                game.settle_forge()
+
+
+FORGE_SCHEDULER = ForgeScheduler()
+
+
+class GameTelemetry:
+    """
+    Providers e instrumentos do OpenTelemetry (e o Pyroscope) do jogo.
+
+    Os providers são globais ao processo e só podem ser configurados uma vez,
+    então todas as partidas do processo (o jogo interativo ou milhares de
+    partidas headless) compartilham a mesma instância, obtida com `shared()`.
+
+    Os instrumentos descrevem o conjunto das partidas registradas e são mantidos
+    de forma incremental nas transições de estado (local, espadas, forja,
+    erros): cada coleta custa O(número de séries), não O(número de partidas).
+    """
+    # Faixas de calor das forjas (forges_by_heat): fria, espada no ponto, espada derrete, incêndio
+    HEAT_RANGES = (("0-9", 0, 9), ("10-20", 10, 20), ("21-49", 21, 49), ("50", 50, 50))
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, service_name="adventure"):
         # Setup OpenTelemetry components
         logFW = CustomLogFW(service_name=service_name)
         handler = logFW.setup_logging()
         logging.getLogger().addHandler(handler)
         logging.getLogger().setLevel(logging.INFO)
 
-        metrics = CustomMetrics(service_name=service_name)
-        meter = metrics.get_meter()
-        self.meter = meter  # Store meter as instance variable for later use
+        custom_metrics = CustomMetrics(service_name=service_name)
+        meter = custom_metrics.get_meter()
+        self.meter = meter
 
         ct = CustomTracer(service_name=service_name)
+        self.custom_tracer = ct
         self.trace = ct.get_trace()
         self.tracer = self.trace.get_tracer(service_name)
         
         # Setup Pyroscope profiling
         self.profiler = CustomPyroscope(service_name=service_name)
+
+        # Agregados das partidas registradas, atualizados sob `lock`
+        self.lock = threading.RLock()
+        self._sessions = {}  # id(partida) -> weakref.finalize que a remove dos agregados
+        self.players = Counter()  # local -> aventureiros
+        self.forges_out = Counter()  # calor -> forjas apagadas com esse calor
+        self.lit_forges = []  # Ordenada: instante em que cada forja acesa estaria a 0 grau
+        self.errors = 0
+        self.attempts = 0
         
         # Create an observable gauge for the forge heat level (keep this as gauge)
         self.forge_heat_gauge = meter.create_observable_gauge(
@@ -87,123 +169,446 @@ class AdventureGame:
             callbacks=[self.observe_error_rate]
         )
 
-        self.game_active = True
-        self.current_location = "start"
-        self.is_heating_forge = False
-        self.blacksmith_burned_down = False
-        self.heat = 0  # Track heat at the blacksmith forge
-        self.sword_requested = False  # Track if the blacksmith has been asked to forge a sword
-        self.failed_sword_attempts = 0
-        self.has_sword = False # Track if the sword has been forged
-        self.has_evil_sword = False # Track if the sword has been enchanted by the evil wizard
-        self.has_holy_sword = False # Track if the sword has been enchanted by the chapel priest
-        self.quest_accepted = False # Track if the quest has been accepted
-        self.priest_alive = True
-        self.has_box = False
-        self.current_actions = []  # Add this line to store current available actions
-
-        self.start_heat_forge_thread()
-
-        self.locations = {
-            "start": {
-                "description": "You are at the beginning of your adventure. There's a path leading north towards a town, and another path leading east towards a forest.",
-                "actions": {
-                    "go to town": {"next_location": "town"},
-                    "go to forest": {"next_location": "forest"},
-                    "cheat": {"message": "You cheat and get a sword. You feel guilty", "effect": self.cheat}
-                }
-            },
-            "forest": {
-                "description": "You are in a dark forest. The trees are tall and the air is thick, you can make out a faint trail heading further east.",
-                "actions": {
-                    "go back": {"next_location": "start"},
-                    "go east": {"next_location": "cave"}
-                }
-            },
-            "cave": {
-                "description": "You enter a dark cave at the end of the trail. The air is cold and damp. You see a faint light at the end of the cave.",
-                "actions": {
-                    "go back": {"next_location": "forest"},
-                    "go towards light": {"next_location": "treasure"}
-                }
-            },
-            "treasure": {
-                "description": "You find a treasure chest at the end of the cave. Inside is a small decorative wooden box with no visible way of opening it.",
-                "actions": {
-                    "take the box": {"message": "You take the box and place it in your pocket.", "effect": self.take_box, "pre_requisite": self.box_still_in_chest},
-                    "exit the cave": {"message": "You retrace your steps and go back to where you first started your adventure", "next_location": "start"}
-                }
-            },
-            "blacksmith": {
-                "description": "You are at the blacksmith's forge. The blacksmith is busy working.",
-                "actions": {
-                    "request sword": {
-                        "message": "You ask the blacksmith to forge you a new sword.",
-                        "effect": self.request_sword,
-                        "pre_requisite": self.is_blacksmith_alive
-                    },
-                    "cool forge": {
-                        "message": "You pour water on the forge. The coals sizzle.",
-                        "effect": self.cool_forge,
-                        "pre_requisite": self.is_forge_heating
-                    },
-                    "heat forge": {
-                        "message": "You add more coal to the forge, increasing its heat.",
-                        "effect": self.heat_forge,
-                        "pre_requisite": self.is_sword_requested
-                    },
-                    "check sword": {
-                        "message": "You check if the sword is ready.",
-                        "effect": self.check_sword,
-                        "pre_requisite": self.is_sword_requested
-                    },
-                    "go to town": {"next_location": "town"}
-                },
-                "pre_requisite": self.is_blacksmith_alive
-            },
-            "town": {
-                "description": "You are in a bustling town. People are going about their business. You see a blacksmith, a mysterious man wandering the streets, a quest giver, and a chapel.",
-                "actions": {
-                    "blacksmith": {"next_location": "blacksmith", "pre_requisite": self.is_blacksmith_alive, "effect": self.enter_blacksmith},
-                    "rebuild blacksmith": {"message": "You help the town rebuild the blacksmith.", "effect": self.rebuild_blacksmith, "pre_requisite": self.is_blacksmith_dead},
-                    "mysterious man": {"next_location": "mysterious man", "pre_requisite": self.check_inventory},
-                    "wizard": {"next_location": "wizard", "pre_requisite": self.check_inventory},
-                    "quest giver": {"next_location": "quest"},
-                    "chapel": {"next_location": "chapel"}
-                }
+        self.players_gauge = meter.create_observable_gauge(
+            name="game_players",
+            description="Adventurers currently at each location",
+            callbacks=[self.observe_players]
+        )
+
+        self.forges_heating_gauge = meter.create_observable_gauge(
+            name="forges_heating",
+            description="Forges currently lit",
+            callbacks=[self.observe_forges_heating]
+        )
+
+        self.forges_by_heat_gauge = meter.create_observable_gauge(
+            name="forges_by_heat",
+            description="Forges by heat range",
+            callbacks=[self.observe_forges_by_heat]
+        )
+
+    @classmethod
+    def shared(cls):
+        """Instância única do processo, criada no primeiro uso"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def register(self, game):
+        """Inclui a partida nos agregados; ela sai em `unregister` ou quando for coletada"""
+        with self.lock:
+            if id(game) in self._sessions:
+                return
+            self._sessions[id(game)] = weakref.finalize(game, self._remove, id(game), game.state)
+            self._account(game.state, 1)
+
+    def unregister(self, game):
+        finalizer = self._sessions.get(id(game))
+        if finalizer is not None:
+            finalizer()
+
+    def _remove(self, key, state):
+        with self.lock:
+            self._sessions.pop(key, None)
+            self._account(state, -1)
+
+    def _account(self, state, sign):
+        self.players[state.location] += sign
+        self._count_forge(forge_entry(state), sign)
+        for bit, counter in ((FLAG_HAS_SWORD, self.sword_counter), (FLAG_HAS_HOLY_SWORD, self.holy_sword_counter),
+                             (FLAG_HAS_EVIL_SWORD, self.evil_sword_counter)):
+            if state.flags & bit:
+                counter.add(sign)
+        self.errors += sign * state.total_errors
+        self.attempts += sign * state.total_attempts
+
+    def _count_forge(self, entry, sign):
+        lit, value = entry
+        if not lit:
+            self.forges_out[value] += sign
+        elif sign > 0:
+            bisect.insort(self.lit_forges, value)
+        else:
+            del self.lit_forges[bisect.bisect_left(self.lit_forges, value)]
+
+    def is_registered(self, game):
+        return id(game) in self._sessions
+
+    def move_player(self, game, destination):
+        with self.lock:
+            if id(game) in self._sessions:
+                self.players[game.state.location] -= 1
+                self.players[destination] += 1
+            game.state.location = destination
+
+    def move_forge(self, game, before, after):
+        """Troca a forja da partida de `before` para `after` (ver forge_entry), chamado sob `lock`"""
+        if before != after and id(game) in self._sessions:
+            self._count_forge(before, -1)
+            self._count_forge(after, 1)
+
+    def record_attempt(self, game, failed):
+        """Conta uma operação da partida que podia falhar (error_rate)"""
+        with self.lock:
+            state = game.state
+            state.total_attempts += 1
+            state.total_errors += failed
+            if id(game) in self._sessions:
+                self.attempts += 1
+                self.errors += failed
+
+    def _lit_at_least(self, heat, now):
+        # Forjas acesas com calor >= heat: aquecendo desde antes de now - heat ticks
+        return bisect.bisect_right(self.lit_forges, now - heat * FORGE_TICK_SECONDS)
+
+    def observe_forge_heat(self, observer):
+        # A forja mais quente entre as partidas (com uma partida, o calor dela)
+        with self.lock:
+            heat = max((value for value, count in self.forges_out.items() if count > 0), default=0)
+            if self.lit_forges:
+                lit_heat = int((time.monotonic() - self.lit_forges[0]) / FORGE_TICK_SECONDS)
+                heat = max(heat, min(lit_heat, FORGE_BURN_HEAT))
+        return [metrics.Observation(value=heat, attributes={"location": "blacksmith"})]
+
+    def observe_error_rate(self, observer):
+        """
+        Calcula e observa a taxa de erro atual como porcentagem.
+        """
+        if self.attempts == 0:
+            error_rate = 0.0
+        else:
+            error_rate = (self.errors / self.attempts) * 100
+        
+        return [metrics.Observation(value=error_rate, attributes={})]
+
+    def observe_players(self, observer):
+        with self.lock:
+            players = list(self.players.items())
+        return [metrics.Observation(value=count, attributes={"location": location}) for location, count in players]
+
+    def observe_forges_heating(self, observer):
+        return [metrics.Observation(value=len(self.lit_forges), attributes={})]
+
+    def observe_forges_by_heat(self, observer):
+        now = time.monotonic()
+        observations = []
+        with self.lock:
+            for name, low, high in self.HEAT_RANGES:
+                out = sum(count for heat, count in self.forges_out.items() if low <= heat <= high)
+                # Forjas acesas além do incêndio ainda não aplicado contam como 50
+                lit = self._lit_at_least(low, now) - (self._lit_at_least(high + 1, now) if high < FORGE_BURN_HEAT else 0)
+                observations.append(metrics.Observation(value=out + lit, attributes={"heat_range": name}))
+        return observations
+
+    def flush(self):
+        """Exporta spans e métricas pendentes (fim de um lote de partidas)"""
+        self.trace.get_tracer_provider().force_flush()
+        metrics.get_meter_provider().force_flush()
+
+
+# Bits de SessionState.flags
+FLAG_GAME_ACTIVE = 1 << 0
+FLAG_BURNED_DOWN = 1 << 1  # The blacksmith burned down
+FLAG_SWORD_REQUESTED = 1 << 2  # The blacksmith has been asked to forge a sword
+FLAG_HAS_SWORD = 1 << 3  # The sword has been forged
+FLAG_HAS_EVIL_SWORD = 1 << 4  # The sword has been enchanted by the evil wizard
+FLAG_HAS_HOLY_SWORD = 1 << 5  # The sword has been enchanted by the chapel priest
+FLAG_QUEST_ACCEPTED = 1 << 6  # The quest has been accepted
+FLAG_PRIEST_ALIVE = 1 << 7
+FLAG_HAS_BOX = 1 << 8
+INITIAL_FLAGS = FLAG_GAME_ACTIVE | FLAG_PRIEST_ALIVE
+
+
+def _freeze(value):
+    """Dicionários aninhados somente leitura (o mundo é compartilhado por todas as partidas)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+
+# Mundo do jogo, imutável e compartilhado. Efeitos e pré-requisitos são nomes de
+# métodos do AdventureGame, resolvidos e validados uma vez por compile_world.
+WORLD = _freeze({
+    "start": {
+        "description": "You are at the beginning of your adventure. There's a path leading north towards a town, and another path leading east towards a forest.",
+        "actions": {
+            "go to town": {"next_location": "town"},
+            "go to forest": {"next_location": "forest"},
+            "cheat": {"message": "You cheat and get a sword. You feel guilty", "effect": "cheat"}
+        }
+    },
+    "forest": {
+        "description": "You are in a dark forest. The trees are tall and the air is thick, you can make out a faint trail heading further east.",
+        "actions": {
+            "go back": {"next_location": "start"},
+            "go east": {"next_location": "cave"}
+        }
+    },
+    "cave": {
+        "description": "You enter a dark cave at the end of the trail. The air is cold and damp. You see a faint light at the end of the cave.",
+        "actions": {
+            "go back": {"next_location": "forest"},
+            "go towards light": {"next_location": "treasure"}
+        }
+    },
+    "treasure": {
+        "description": "You find a treasure chest at the end of the cave. Inside is a small decorative wooden box with no visible way of opening it.",
+        "actions": {
+            "take the box": {"message": "You take the box and place it in your pocket.", "effect": "take_box", "pre_requisite": "box_still_in_chest"},
+            "exit the cave": {"message": "You retrace your steps and go back to where you first started your adventure", "next_location": "start"}
+        }
+    },
+    "blacksmith": {
+        "description": "You are at the blacksmith's forge. The blacksmith is busy working.",
+        "actions": {
+            "request sword": {
+                "message": "You ask the blacksmith to forge you a new sword.",
+                "effect": "request_sword",
+                "pre_requisite": "is_blacksmith_alive"
             },
-            "mysterious man": {
-                "description": "You meet a mysterious man. He offers to enhance your sword with magic.",
-                "actions": {
-                    "accept his offer": {"message": "A great choice indeed. Your sword is now enchanted with great power.", "effect": self.evil_wizard},
-                    "decline his offer": {"message": "You will not get another chance. ACCEPT MY OFFER!"},
-                    "go to town": {"next_location": "town"}
-                }
+            "cool forge": {
+                "message": "You pour water on the forge. The coals sizzle.",
+                "effect": "cool_forge",
+                "pre_requisite": "is_forge_heating"
             },
-            "wizard": {
-                "description": "You meet a wizard. He yells 'Are you here to kill me?!'",
-                "actions": {
-                    "kill him": {"message": "You attempt to kill the wizard.", "pre_requisite": self.is_quest_accepted, "effect": self.kill_wizard},
-                    "go to town": {"next_location": "town"}
-                }
+            "heat forge": {
+                "message": "You add more coal to the forge, increasing its heat.",
+                "effect": "heat_forge",
+                "pre_requisite": "is_sword_requested"
             },
-            "quest": {
-                "description": "You meet a quest giver. He offers you a quest to defeat the evil wizard.",
-                "actions": {
-                    "accept quest": {"message": "You tell the quest giver you would like to accept...", "effect": self.quest_giver},
-                    "go to town": {"next_location": "town"}
-                }
+            "check sword": {
+                "message": "You check if the sword is ready.",
+                "effect": "check_sword",
+                "pre_requisite": "is_sword_requested"
             },
-            "chapel": {
-                "description": "You enter the chapel. The priest greets you warmly.",
-                "actions": {
-                    "look at sword": {"message": "The priest looks at your sword", "effect": self.priest},
-                    "pray": {"message": "You pray for guidance."},
-                    "go to town": {"next_location": "town"}
-                }
-            }
+            "go to town": {"next_location": "town"}
+        },
+        "pre_requisite": "is_blacksmith_alive"
+    },
+    "town": {
+        "description": "You are in a bustling town. People are going about their business. You see a blacksmith, a mysterious man wandering the streets, a quest giver, and a chapel.",
+        "actions": {
+            "blacksmith": {"next_location": "blacksmith", "pre_requisite": "is_blacksmith_alive", "effect": "enter_blacksmith"},
+            "rebuild blacksmith": {"message": "You help the town rebuild the blacksmith.", "effect": "rebuild_blacksmith", "pre_requisite": "is_blacksmith_dead"},
+            "mysterious man": {"next_location": "mysterious man", "pre_requisite": "check_inventory"},
+            "wizard": {"next_location": "wizard", "pre_requisite": "check_inventory"},
+            "quest giver": {"next_location": "quest"},
+            "chapel": {"next_location": "chapel"}
         }
-    
+    },
+    "mysterious man": {
+        "description": "You meet a mysterious man. He offers to enhance your sword with magic.",
+        "actions": {
+            "accept his offer": {"message": "A great choice indeed. Your sword is now enchanted with great power.", "effect": "evil_wizard"},
+            "decline his offer": {"message": "You will not get another chance. ACCEPT MY OFFER!"},
+            "go to town": {"next_location": "town"}
+        }
+    },
+    "wizard": {
+        "description": "You meet a wizard. He yells 'Are you here to kill me?!'",
+        "actions": {
+            "kill him": {"message": "You attempt to kill the wizard.", "pre_requisite": "is_quest_accepted", "effect": "kill_wizard"},
+            "go to town": {"next_location": "town"}
+        }
+    },
+    "quest": {
+        "description": "You meet a quest giver. He offers you a quest to defeat the evil wizard.",
+        "actions": {
+            "accept quest": {"message": "You tell the quest giver you would like to accept...", "effect": "quest_giver"},
+            "go to town": {"next_location": "town"}
+        }
+    },
+    "chapel": {
+        "description": "You enter the chapel. The priest greets you warmly.",
+        "actions": {
+            "look at sword": {"message": "The priest looks at your sword", "effect": "priest"},
+            "pray": {"message": "You pray for guidance."},
+            "go to town": {"next_location": "town"}
+        }
+    }
+})
+
+# Locais na ordem do WORLD; o snapshot guarda o índice
+LOCATION_NAMES = tuple(WORLD)
+
+
+class SessionState:
+    """
+    Estado de uma partida: campos em __slots__ e os booleanos do jogo em bits
+    de `flags`, separado do WORLD compartilhado. Com algumas dezenas de bytes
+    por partida, um servidor mantém centenas de milhares de sessões em memória;
+    `to_bytes()`/`from_bytes()` servem para persistir ou migrar sessões.
+    """
+    __slots__ = (
+        "adventurer_name", "location", "flags", "heat", "heating_since",
+        "failed_sword_attempts", "total_errors", "total_attempts",
+    )
+
+    # versão, local, flags, calor, tentativas de espada, segundos de forja acesa (-1: apagada),
+    # erros, tentativas, tamanho do nome (o nome em UTF-8 vem em seguida)
+    SNAPSHOT = struct.Struct("<BBHHBdIIH")
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, adventurer_name):
+        self.adventurer_name = adventurer_name
+        # Variáveis para tracking de erros
+        self.total_errors = 0
+        self.total_attempts = 0
+        self.reset()
+
+    def reset(self):
+        """Volta ao início da aventura, mantendo o aventureiro e os contadores de erro"""
+        self.location = "start"
+        self.flags = INITIAL_FLAGS
+        self.heat = 0  # Track heat at the blacksmith forge
+        self.heating_since = None  # Instant (time.monotonic()) the forge was lit; None while it is out
+        self.failed_sword_attempts = 0
+
+    def to_bytes(self):
+        heating_since = self.heating_since
+        lit_for = -1.0 if heating_since is None else time.monotonic() - heating_since
+        name = self.adventurer_name.encode("utf-8")
+        return self.SNAPSHOT.pack(
+            self.SNAPSHOT_VERSION, LOCATION_NAMES.index(self.location), self.flags, self.heat,
+            self.failed_sword_attempts, lit_for, self.total_errors, self.total_attempts, len(name),
+        ) + name
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Estado a partir de `to_bytes()`; a forja acesa continua esquentando do ponto em que estava"""
+        (version, location, flags, heat, failed_sword_attempts, lit_for,
+         total_errors, total_attempts, name_length) = cls.SNAPSHOT.unpack_from(data)
+        if version != cls.SNAPSHOT_VERSION:
+            raise ValueError(f"Versão de snapshot não suportada: {version}")
+        offset = cls.SNAPSHOT.size
+        state = cls.__new__(cls)
+        state.adventurer_name = bytes(data[offset:offset + name_length]).decode("utf-8")
+        state.location = LOCATION_NAMES[location]
+        state.flags = flags
+        state.heat = heat
+        state.heating_since = None if lit_for < 0 else time.monotonic() - lit_for
+        state.failed_sword_attempts = failed_sword_attempts
+        state.total_errors = total_errors
+        state.total_attempts = total_attempts
+        return state
+
+
+def forge_entry(state):
+    """Forja de uma partida nos agregados: (True, instante em que estaria a 0 grau) se acesa, senão (False, calor)"""
+    if state.heating_since is None:
+        return False, state.heat
+    return True, state.heating_since - state.heat * FORGE_TICK_SECONDS
+
+
+class _Flag:
+    """
+    Atributo booleano do AdventureGame guardado em um bit de SessionState.flags.
+
+    :param counter: up/down counter da GameTelemetry ajustado quando o bit muda
+        (espadas), enquanto a partida está registrada
+    """
+    def __init__(self, bit, counter=None):
+        self.bit = bit
+        self.counter = counter
+
+    def __get__(self, game, owner=None):
+        if game is None:
+            return self
+        return bool(game.state.flags & self.bit)
+
+    def __set__(self, game, value):
+        state = game.state
+        # flags também é escrito pelo FORGE_SCHEDULER (FLAG_BURNED_DOWN) em outra thread
+        with game.telemetry.lock:
+            flags = state.flags
+            state.flags = flags | self.bit if value else flags & ~self.bit
+            if self.counter is not None and state.flags != flags and game.telemetry.is_registered(game):
+                getattr(game.telemetry, self.counter).add(1 if value else -1)
+
+
+class _Delegate:
+    """Atributo do AdventureGame que lê (e escreve) `<target>.<name>`"""
+    def __init__(self, target, name):
+        self.target = target
+        self.name = name
+
+    def __get__(self, game, owner=None):
+        if game is None:
+            return self
+        return getattr(getattr(game, self.target), self.name)
+
+    def __set__(self, game, value):
+        setattr(getattr(game, self.target), self.name, value)
+
+
+class AdventureGame:
+    __slots__ = ("state", "telemetry", "listed", "__weakref__")
+
+    adventurer_name = _Delegate("state", "adventurer_name")
+    failed_sword_attempts = _Delegate("state", "failed_sword_attempts")
+    total_errors = _Delegate("state", "total_errors")
+    total_attempts = _Delegate("state", "total_attempts")
+    game_active = _Flag(FLAG_GAME_ACTIVE)
+    sword_requested = _Flag(FLAG_SWORD_REQUESTED)
+    has_sword = _Flag(FLAG_HAS_SWORD, counter="sword_counter")
+    has_evil_sword = _Flag(FLAG_HAS_EVIL_SWORD, counter="evil_sword_counter")
+    has_holy_sword = _Flag(FLAG_HAS_HOLY_SWORD, counter="holy_sword_counter")
+    quest_accepted = _Flag(FLAG_QUEST_ACCEPTED)
+    priest_alive = _Flag(FLAG_PRIEST_ALIVE)
+    has_box = _Flag(FLAG_HAS_BOX)
+
+    # OpenTelemetry e Pyroscope compartilhados por todas as partidas do processo
+    meter = _Delegate("telemetry", "meter")
+    trace = _Delegate("telemetry", "trace")
+    tracer = _Delegate("telemetry", "tracer")
+    profiler = _Delegate("telemetry", "profiler")
+    sword_counter = _Delegate("telemetry", "sword_counter")
+    holy_sword_counter = _Delegate("telemetry", "holy_sword_counter")
+    evil_sword_counter = _Delegate("telemetry", "evil_sword_counter")
+    error_counter = _Delegate("telemetry", "error_counter")
+    error_attempts_counter = _Delegate("telemetry", "error_attempts_counter")
+
+    def __init__(self, adventurer_name=None, telemetry=None, state=None):
+        """
+        :param adventurer_name: nome do aventureiro; perguntado no terminal se omitido
+        :param state: SessionState de uma partida em andamento (ver `restore`)
+        """
+        if state is None:
+            # Get the adventurer's name from the user
+            if adventurer_name is None:
+                adventurer_name = input("Enter your name, brave adventurer: ")
+            state = SessionState(adventurer_name)
+        self.state = state
+        self.telemetry = telemetry or GameTelemetry.shared()
+        self.listed = None  # CompiledLocation whose actions were last listed (numbered choices)
+
+        self.telemetry.register(self)
+        if state.heating_since is not None:
+            self._schedule_forge()
+
+    @classmethod
+    def restore(cls, snapshot, telemetry=None):
+        """Retoma uma partida a partir de `snapshot()`"""
+        return cls(telemetry=telemetry, state=SessionState.from_bytes(snapshot))
+
+    def snapshot(self):
+        """Estado da partida em bytes (ver SessionState.to_bytes)"""
+        return self.state.to_bytes()
+
+    @property
+    def current_location(self):
+        return self.state.location
+
+    @current_location.setter
+    def current_location(self, location):
+        self.telemetry.move_player(self, location)
+
+    @property
+    def current_actions(self):
+        """Ações numeradas na última listagem (list_actions)"""
+        return self.listed.action_names if self.listed is not None else ()
+
     def take_box(self):
         if self.has_box:
             return "You already have the box."
@@ -233,73 +638,72 @@ class AdventureGame:
         self.cool_forge()
         return "You help the town rebuild the blacksmith. The blacksmith is grateful."
     
-    def start_heat_forge_thread(self):
-        def increase_heat_loop():
-            while self.game_active:
-                time.sleep(1)
-                self.increase_heat_periodically()
-        
-        thread = threading.Thread(target=increase_heat_loop)
-        thread.daemon = True
-        thread.start()
+    @property
+    def heat(self):
+        # Calculado a partir do tempo com a forja acesa, sem thread por partida
+        self.settle_forge()
+        state = self.state
+        heating_since = state.heating_since
+        if heating_since is None:
+            return state.heat
+        return state.heat + int((time.monotonic() - heating_since) / FORGE_TICK_SECONDS)
+
+    @property
+    def is_heating_forge(self):
+        self.settle_forge()
+        return self.state.heating_since is not None
 
-    def increase_heat_periodically(self):
+    @property
+    def blacksmith_burned_down(self):
+        self.settle_forge()
+        return bool(self.state.flags & FLAG_BURNED_DOWN)
+
+    @blacksmith_burned_down.setter
+    def blacksmith_burned_down(self, value):
+        with self.telemetry.lock:
+            if value:
+                self.state.flags |= FLAG_BURNED_DOWN
+            else:
+                self.state.flags &= ~FLAG_BURNED_DOWN
+
+    def settle_forge(self):
+        """Aplica o incêndio se a forja acesa já chegou a FORGE_BURN_HEAT (chamado também pelo FORGE_SCHEDULER)"""
+        state = self.state
+        heating_since = state.heating_since
+        if heating_since is None:
+            return
+        ticks = int((time.monotonic() - heating_since) / FORGE_TICK_SECONDS)
+        if state.heat + ticks < FORGE_BURN_HEAT:
+            return
         # Adicionar profiling contextual para operações da forja
         with self.profiler.tag_wrapper({"operation": "forge_heating", "adventurer": self.adventurer_name}):
-            if self.is_heating_forge:
-                self.heat += 1
-                if self.heat >= 50 and not self.blacksmith_burned_down:
-                    self.blacksmith_burned_down = True
-                    self.is_heating_forge = False
-    
-    def observe_forge_heat(self, observer):
-        return [metrics.Observation(value=self.heat, attributes={"location": "blacksmith"})]
-    
-    def observe_swords(self, observer):
-        sword_count = 0
-        if self.has_sword:
-            sword_count = 1
-        elif self.has_evil_sword or self.has_holy_sword:
-            sword_count = 0
-        # Standard observation - exemplars will be handled automatically by the SDK
-        return [metrics.Observation(value=sword_count, attributes={})]
-    
-    def observe_holy_swords(self, observer):
-        sword_count = 0
-        if self.has_holy_sword:
-            sword_count = 1
-        elif self.has_evil_sword or self.has_sword: 
-            sword_count = 0
-        # Standard observation - exemplars will be handled automatically by the SDK
-        return [metrics.Observation(value=sword_count, attributes={})]
-    
-    def observe_evil_swords(self, observer):
-        sword_count = 0
-        if self.has_evil_sword:
-            sword_count = 1
-        elif self.has_holy_sword or self.has_sword:
-            sword_count = 0
-        # Standard observation - exemplars will be handled automatically by the SDK
-        return [metrics.Observation(value=sword_count, attributes={})]
+            with self.telemetry.lock:
+                # O FORGE_SCHEDULER e a própria partida podem chegar aqui ao mesmo tempo
+                if state.heating_since is heating_since:
+                    self._set_forge(FORGE_BURN_HEAT, None)
+                    state.flags |= FLAG_BURNED_DOWN
 
-    def observe_error_rate(self, observer):
-        """
-        Calcula e observa a taxa de erro atual como porcentagem.
-        """
-        if self.total_attempts == 0:
-            error_rate = 0.0
-        else:
-            error_rate = (self.total_errors / self.total_attempts) * 100
-        
-        return [metrics.Observation(value=error_rate, attributes={"adventurer": self.adventurer_name})]
+    def _set_forge(self, heat, heating_since):
+        """Muda o calor da forja e os agregados da telemetria juntos"""
+        state = self.state
+        with self.telemetry.lock:
+            before = forge_entry(state)
+            state.heat = heat
+            state.heating_since = heating_since
+            self.telemetry.move_forge(self, before, forge_entry(state))
 
+    def _schedule_forge(self):
+        state = self.state
+        FORGE_SCHEDULER.schedule(self, state.heating_since + (FORGE_BURN_HEAT - state.heat) * FORGE_TICK_SECONDS)
+    
     def cool_forge(self):
-        self.heat = 0
-        self.is_heating_forge = False
+        self._set_forge(0, None)
         return f"You throw a bucket of water over the forge. The coals sizzle and the forge cools down completely."
 
     def heat_forge(self):
-        self.is_heating_forge = True
+        if not self.is_heating_forge:
+            self._set_forge(self.state.heat, time.monotonic())
+            self._schedule_forge()
         return f"You fire up the forge and it begins heating up. You should wait a while before checking on the sword."
 
     def request_sword(self):
@@ -331,8 +735,7 @@ class AdventureGame:
         return self.has_sword or self.has_holy_sword or self.has_evil_sword
 
     def cheat(self):
-        self.has_sword = True
-        self.sword_counter.add(1)  # Increment sword counter when cheating
+        self.has_sword = True  # The sword counter follows the flag
         return "You should continue north you cheater."
     
     def kill_wizard(self):
@@ -361,23 +764,15 @@ class AdventureGame:
             return "I have already blessed your sword child, go now and use it well."
         
         if self.has_sword and not self.has_evil_sword:
-            # Update sword state and adjust counters
-            if self.has_sword:
-                self.sword_counter.add(-1)  # Decrement regular sword
-            
+            # Update sword state (the sword counters follow the flags)
             self.has_holy_sword = True
-            self.holy_sword_counter.add(1)  # Increment holy sword
-            
             self.has_evil_sword = False
             self.has_sword = False
             
             return "The priest blesses your sword. You feel a warm glow."
         
         if self.has_evil_sword:
-            # Update sword state and adjust counters
-            self.evil_sword_counter.add(-1)  # Decrement evil sword
-            self.holy_sword_counter.add(1)   # Increment holy sword
-            
+            # Update sword state (the sword counters follow the flags)
             self.has_evil_sword = False
             self.has_holy_sword = True
             self.has_sword = False
@@ -394,9 +789,8 @@ class AdventureGame:
         if self.heat >= 10 and self.heat <= 20:
             self.sword_requested = False
             
-            # Update sword state and increment counter
+            # Update sword state (the sword counter follows the flag)
             self.has_sword = True
-            self.sword_counter.add(1)  # Increment sword counter
             
             current_span.add_event("Sword forged")
             return "The sword is ready. You take it from the blacksmith."
@@ -411,15 +805,8 @@ class AdventureGame:
     
     # Evil wizard scenario
     def evil_wizard(self):
-        # Update sword state and adjust counters
-        if self.has_sword:
-            self.sword_counter.add(-1)       # Decrement regular sword
-        if self.has_holy_sword:
-            self.holy_sword_counter.add(-1)  # Decrement holy sword if had one
-        
-        self.evil_sword_counter.add(1)       # Increment evil sword counter
-        
-        self.has_evil_sword = True  
+        # Update sword state (the sword counters follow the flags)
+        self.has_evil_sword = True
         self.has_sword = False
         self.has_holy_sword = False
 
@@ -446,52 +833,42 @@ class AdventureGame:
             return "You don't have a sword. The quest giver looks at you with disappointment."
 
     def list_actions(self):
-        actions = list(self.locations[self.current_location].get("actions", {}).keys())
-        actions.append("look around")  # Add the universal 'look around' command
-        
-        # Store the numbered actions for reference in process_command
-        self.current_actions = actions
-        
-        # Create numbered action list
-        numbered_actions = [f"{Colors.MAGENTA}{i+1}. {action}{Colors.RESET}" for i, action in enumerate(actions)]
-        return f"Available actions: {', '.join(numbered_actions)}"
+        # Store the numbered actions for reference in resolve_command
+        location = COMPILED_WORLD[self.current_location]
+        self.listed = location
+        return location.rendered_actions
 
     def process_command(self, command):
-        if command.lower() in ["quit", "exit"]:
+        key = command.lower()
+        if key in ("quit", "exit"):
             self.game_active = False
             return "You have ended your adventure."
         
-        if command.lower() in ['look around', 'here']:
+        if key in ("look around", "here"):
             return self.here()
-        elif command.lower() == "list actions":
+        elif key == "list actions":
             return self.list_actions()
         
-        actions = self.locations[self.current_location].get("actions", {})
-        if command.lower() in actions:
-            action = actions[command.lower()]
-            if "pre_requisite" in action and not action["pre_requisite"]():
-                return "You can't do that right now."
-            if "next_location" in action:
-                self.current_location = action["next_location"]
-                if "effect" in action:
-                    action["effect"]()
-                return self.here()
-            elif "message" in action:
-                if "pre_requisite" in action and not action["pre_requisite"]():
-                    return "You can't do that right now."
-                else:
-                    if "effect" in action:
-                        return f"{Colors.GREEN}{action["message"]}\n{action["effect"]()}{Colors.RESET}\n{self.list_actions()}"
-                    else:
-                        return f"{Colors.GREEN}{action["message"]}{Colors.RESET}\n{self.list_actions()}"
-            else:
-                return "You can't do that right now."
-        else:
+        action = COMPILED_WORLD[self.current_location].actions.get(key)
+        if action is None:
             return "I don't understand that command."
+        if action.pre_requisite is not None and not action.pre_requisite(self):
+            return "You can't do that right now."
+        if action.next_location is not None:
+            self.current_location = action.next_location
+            if action.effect is not None:
+                action.effect(self)
+            return self.here()
+        if action.effect is not None:
+            # The effect may move the adventurer, so the actions are listed afterwards
+            return f"{Colors.GREEN}{action.message}\n{action.effect(self)}{Colors.RESET}\n{self.list_actions()}"
+        self.list_actions()
+        return action.rendered
 
     def here(self):
-        output = f"{Colors.GREEN}{self.locations[self.current_location]['description']}{Colors.RESET}\n{self.list_actions()}"
-        return output
+        location = COMPILED_WORLD[self.current_location]
+        self.listed = location
+        return location.rendered_here
 
     def play(self):
         # Create a root span for the entire game playthrough
@@ -501,38 +878,8 @@ class AdventureGame:
         print(f"{Colors.GREEN}{self.here()}{Colors.RESET}")
         with self.tracer.start_as_current_span(self.adventurer_name, attributes={"adventurer": self.adventurer_name}) as journey_span:
             while self.game_active:
-                playerInput = input("> ")
-
-                # Try to resolve the command if it's a number
-                try:
-                    action_index = int(playerInput) - 1
-                    if 0 <= action_index < len(self.current_actions):
-                        command = self.current_actions[action_index]
-                    else:
-                        command = playerInput
-                except ValueError:
-                    command = playerInput
-
-                logging.info(f"Action by {self.adventurer_name}: " + command)
-
-                # Create a span for each action taken by the player, with location attribute added
-                with self.tracer.start_as_current_span(
-                    f"action: {command}",
-                    attributes={
-                        "adventurer": self.adventurer_name,
-                        "location": self.current_location  # Adding location attribute to provide more context
-                    }
-                ) as action_span:
-                    response = self.process_command(command)
-                    print(f"{response}")
-                    logging.info(response)
-
-                    # Check if the game has ended, and if so, break out of the loop
-                    if not self.game_active:
-                        journey_span.add_event("Adventure ended")
-                        action_span.add_event(f"{self.adventurer_name} completed the adventure.")
-                        action_span.set_status(Status(StatusCode.OK))
-                        break
+                _, response = self.play_turn(input("> "), journey_span)
+                print(f"{response}")
             
             # Ask if the user wants to restart after the adventure has ended
         restart_command = input("Would you like to restart the adventure? (yes/no): ").strip().lower()
@@ -542,37 +889,54 @@ class AdventureGame:
             print("Thank you for playing!")
             logging.info(f"{self.adventurer_name}'s adventure has ended.")
 
+    def resolve_command(self, player_input):
+        # Resolve the command if it's the number of a listed action
+        if self.listed is None:
+            return player_input
+        return self.listed.aliases.get(player_input.strip(), player_input)
+
+    def play_turn(self, player_input, journey_span=None):
+        """
+        Executa uma jogada (texto ou número de uma ação listada) dentro do span
+        `action: <comando>`, com os mesmos logs do jogo interativo.
+
+        :param journey_span: span da partida, que recebe o evento de fim de aventura
+        :return: (comando resolvido, resposta)
+        """
+        command = self.resolve_command(player_input)
+        logging.info(f"Action by {self.adventurer_name}: " + command)
+
+        # Create a span for each action taken by the player, with location attribute added
+        with self.tracer.start_as_current_span(
+            f"action: {command}",
+            attributes={
+                "adventurer": self.adventurer_name,
+                "location": self.current_location  # Adding location attribute to provide more context
+            }
+        ) as action_span:
+            response = self.process_command(command)
+            logging.info(response)
+
+            # Check if the game has ended
+            if not self.game_active:
+                if journey_span is not None:
+                    journey_span.add_event("Adventure ended")
+                action_span.add_event(f"{self.adventurer_name} completed the adventure.")
+                action_span.set_status(Status(StatusCode.OK))
+        return command, response
+
     def restart_adventure(self):
         # Allow the user to restart the adventure with the same name or a new name
         new_name = input("Enter your name if you'd like to change it, or press Enter to keep the same name: ").strip()
         if new_name:
             self.adventurer_name = new_name
         
-        if self.has_sword:
-            self.sword_counter.add(-1)
-        if self.has_holy_sword:
-            self.holy_sword_counter.add(-1)
-        if self.has_evil_sword:
-            self.evil_sword_counter.add(-1)
-
-
-        # Reset all game state variables
-        self.game_active = True
-        self.current_location = "start"
-        self.is_heating_forge = False
-        self.blacksmith_burned_down = False
-        self.sword_requested = False
-        self.failed_sword_attempts = 0
-        self.has_sword = False
-        self.has_evil_sword = False
-        self.has_holy_sword = False
-        self.quest_accepted = False
-        self.priest_alive = True
-        self.heat = 0  # Reset the forge heat
-        self.has_box = False
-
-    # Restart the heat forge thread
-        self.start_heat_forge_thread()
+        # Reset all game state variables; re-registering updates the aggregates (swords, location, forge)
+        # (sob o lock, para o FORGE_SCHEDULER não queimar a forja do estado já reiniciado)
+        with self.telemetry.lock:
+            self.telemetry.unregister(self)
+            self.state.reset()
+            self.telemetry.register(self)
 
         # Start the game again
         self.play()
@@ -659,6 +1023,8 @@ class AdventureGame:
                     raise error_config['exception'](error_config['message'])
                     
                 except Exception as e:
+                    self.telemetry.record_attempt(self, failed=True)
+
                     # Configurar span com erro
                     span.set_status(Status(StatusCode.ERROR, str(e)))
                     span.add_event("Error occurred", {
@@ -695,7 +1061,233 @@ class AdventureGame:
                         "operation": error_config['operation']
                     }
 
-if __name__ == "__main__":
-    game = AdventureGame()
-    game.play()
+# Ação do mundo compilado: efeito e pré-requisito são funções do AdventureGame
+# (chamadas com a partida); `rendered` é a resposta pronta de ações só com mensagem
+CompiledAction = namedtuple("CompiledAction", ["message", "next_location", "effect", "pre_requisite", "rendered"])
+
+# Local do mundo compilado: ações por comando normalizado, números das ações
+# listadas (aliases) e as listagens já renderizadas
+CompiledLocation = namedtuple(
+    "CompiledLocation", ["name", "actions", "action_names", "aliases", "rendered_actions", "rendered_here"]
+)
 
+# Comandos tratados em process_command antes das ações do local
+UNIVERSAL_COMMANDS = ("quit", "exit", "look around", "here", "list actions")
+
+
+def compile_world(world, game_class):
+    """
+    Compila a definição do mundo em uma tabela de transições e a valida.
+
+    As listagens de ações não dependem do estado da partida (ações
+    indisponíveis aparecem e respondem "You can't do that right now."), então
+    são renderizadas uma vez por local.
+
+    :raises ValueError: next_location inexistente, efeito ou pré-requisito que
+        não é método de `game_class`, comando que nunca casaria (maiúsculas,
+        número ou comando universal), ação sem mensagem nem destino, ou local
+        inalcançável a partir de "start"
+    """
+    def method(location, command, name):
+        function = getattr(game_class, name, None) if name is not None else None
+        if name is not None and not callable(function):
+            raise ValueError(f"{location}/{command}: {name} não é um método de {game_class.__name__}")
+        return function
+
+    compiled = {}
+    for name, definition in world.items():
+        actions = {}
+        for command, action in definition.get("actions", {}).items():
+            if command != command.lower() or command.strip().isdigit() or command in UNIVERSAL_COMMANDS:
+                raise ValueError(f"{name}/{command}: comando inalcançável")
+            next_location = action.get("next_location")
+            if next_location is not None and next_location not in world:
+                raise ValueError(f"{name}/{command}: next_location desconhecido {next_location!r}")
+            message = action.get("message")
+            if next_location is None and message is None:
+                raise ValueError(f"{name}/{command}: ação sem message nem next_location")
+            actions[command] = CompiledAction(
+                message=message,
+                next_location=next_location,
+                effect=method(name, command, action.get("effect")),
+                pre_requisite=method(name, command, action.get("pre_requisite")),
+                rendered=None,
+            )
+        action_names = tuple(actions) + ("look around",)  # Add the universal 'look around' command
+        numbered_actions = [f"{Colors.MAGENTA}{i+1}. {action}{Colors.RESET}" for i, action in enumerate(action_names)]
+        rendered_actions = f"Available actions: {', '.join(numbered_actions)}"
+        for command, action in actions.items():
+            if action.message is not None:
+                actions[command] = action._replace(
+                    rendered=f"{Colors.GREEN}{action.message}{Colors.RESET}\n{rendered_actions}"
+                )
+        compiled[name] = CompiledLocation(
+            name=name,
+            actions=MappingProxyType(actions),
+            action_names=action_names,
+            aliases=MappingProxyType({str(i + 1): action for i, action in enumerate(action_names)}),
+            rendered_actions=rendered_actions,
+            rendered_here=f"{Colors.GREEN}{definition['description']}{Colors.RESET}\n{rendered_actions}",
+        )
+
+    # Locais alcançáveis a partir do início pelas transições do mundo
+    reachable = {"start"}
+    pending = ["start"]
+    while pending:
+        for action in compiled[pending.pop()].actions.values():
+            if action.next_location is not None and action.next_location not in reachable:
+                reachable.add(action.next_location)
+                pending.append(action.next_location)
+    unreachable = sorted(set(compiled) - reachable)
+    if unreachable:
+        raise ValueError(f"Locais inalcançáveis a partir de 'start': {', '.join(unreachable)}")
+    return MappingProxyType(compiled)
+
+
+COMPILED_WORLD = compile_world(WORLD, AdventureGame)
+
+
+# Resultado de uma partida headless
+SessionResult = namedtuple("SessionResult", ["adventurer", "outcome", "transcript"])
+
+
+def random_policy(rng):
+    """Política que escolhe, a cada jogada, uma das ações listadas em list_actions()"""
+    def choose(game):
+        game.list_actions()
+        return rng.choice(game.current_actions)
+    return choose
+
+
+def play_session(adventurer_name, commands=None, policy=None, max_turns=200, think_time=0.0, telemetry=None):
+    """
+    Joga uma partida sem terminal, com os mesmos spans, métricas e logs do
+    jogo interativo: um span de jornada com o nome do aventureiro e um span
+    `action: <comando>` por jogada.
+
+    :param commands: sequência de jogadas (texto ou número de uma ação listada)
+    :param policy: alternativa a `commands`, função (jogo) -> jogada
+    :param max_turns: limite de jogadas; a partida fica "unfinished" se não terminar
+    :param think_time: pausa entre jogadas, em segundos (a forja esquenta em tempo real)
+    :return: SessionResult com o desfecho (victory, defeat, quit ou unfinished) e a
+        transcrição, uma entrada {turn, location, command, response} por jogada
+    """
+    if (commands is None) == (policy is None):
+        raise ValueError("Informe commands ou policy")
+    game = AdventureGame(adventurer_name, telemetry=telemetry)
+    if commands is not None:
+        turns = iter(commands)
+    else:
+        turns = (policy(game) for _ in itertools.repeat(None))
+    transcript = []
+    # What the interactive game shows first; numbered commands refer to this listing
+    game.here()
+    try:
+        with game.tracer.start_as_current_span(adventurer_name, attributes={"adventurer": adventurer_name}) as journey_span:
+            for turn, player_input in enumerate(itertools.islice(turns, max_turns), start=1):
+                location = game.current_location
+                command, response = game.play_turn(player_input, journey_span)
+                transcript.append({"turn": turn, "location": location, "command": command, "response": response})
+                if not game.game_active:
+                    break
+                if think_time:
+                    time.sleep(think_time)
+    finally:
+        active = game.game_active
+        # Descarta a forja agendada e tira a partida dos gauges
+        game.game_active = False
+        game.telemetry.unregister(game)
+
+    if active:
+        outcome = "unfinished"
+    elif transcript and transcript[-1]["command"].lower() in ("quit", "exit"):
+        outcome = "quit"
+    else:
+        outcome = "victory" if game.has_holy_sword else "defeat"
+    return SessionResult(adventurer_name, outcome, transcript)
+
+
+def run_batch(games, concurrency=32, max_turns=200, think_time=0.0, seed=None):
+    """
+    Joga `games` partidas com a política aleatória, `concurrency` por vez, para
+    estressar o pipeline de telemetria com traces de formato realista.
+
+    :return: dicionário com desfechos, jogadas, duração e o pico da fila de spans
+        do exportador (amostrado a cada partida concluída; na capacidade, spans
+        são descartados)
+    """
+    telemetry = GameTelemetry.shared()
+    base_seed = random.randrange(2**32) if seed is None else seed
+
+    def play(index):
+        rng = random.Random(base_seed + index)
+        return play_session(
+            f"adventurer-{index}", policy=random_policy(rng),
+            max_turns=max_turns, think_time=think_time, telemetry=telemetry,
+        )
+
+    outcomes = Counter()
+    turns = 0
+    errors = 0
+    queue_peak, queue_capacity = telemetry.custom_tracer.get_queue_usage()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(play, index) for index in range(games)]:
+            queued, _ = telemetry.custom_tracer.get_queue_usage()
+            queue_peak = max(queue_peak, queued)
+            try:
+                result = future.result()
+            except Exception as e:
+                errors += 1
+                logging.error(f"Headless game failed: {e}")
+                continue
+            outcomes[result.outcome] += 1
+            turns += len(result.transcript)
+    elapsed = time.perf_counter() - started
+    telemetry.flush()
+    return {
+        "games": games,
+        "errors": errors,
+        "outcomes": dict(outcomes),
+        "turns": turns,
+        "elapsed_s": elapsed,
+        "games_per_s": games / elapsed if elapsed else 0.0,
+        "turns_per_s": turns / elapsed if elapsed else 0.0,
+        "span_queue_peak": queue_peak,
+        "span_queue_capacity": queue_capacity,
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aventura de texto instrumentada com OpenTelemetry")
+    parser.add_argument("--batch", type=int, metavar="GAMES",
+                        help="Joga GAMES partidas headless (política aleatória) em vez do modo interativo")
+    parser.add_argument("--concurrency", type=int, default=32, help="Partidas simultâneas no modo --batch")
+    parser.add_argument("--max-turns", type=int, default=200, help="Limite de jogadas por partida no modo --batch")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pausa entre jogadas (s) no modo --batch")
+    parser.add_argument("--seed", type=int, help="Semente das políticas aleatórias (reprodutível)")
+    args = parser.parse_args()
+
+    if args.batch is None:
+        game = AdventureGame()
+        game.play()
+        return
+
+    print(f"🎲 Jogando {args.batch} partidas headless ({args.concurrency} simultâneas)...")
+    summary = run_batch(args.batch, args.concurrency, args.max_turns, args.think_time, args.seed)
+    print(f"✅ {summary['games'] - summary['errors']} partidas, {summary['turns']} jogadas em {summary['elapsed_s']:.1f}s "
+          f"({summary['games_per_s']:.1f} partidas/s, {summary['turns_per_s']:.0f} jogadas/s)")
+    for outcome, count in sorted(summary["outcomes"].items()):
+        print(f"   {outcome}: {count}")
+    if summary["errors"]:
+        print(f"❌ {summary['errors']} partidas falharam")
+    if summary["span_queue_capacity"] and summary["span_queue_peak"] >= summary["span_queue_capacity"]:
+        print(f"⚠️  Fila de spans do exportador cheia ({summary['span_queue_capacity']}): spans foram descartados")
+    else:
+        print(f"📦 Pico da fila de spans: {summary['span_queue_peak']}/{summary['span_queue_capacity']}")
+
+
+if __name__ == "__main__":
+    main()
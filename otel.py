@@ -49,6 +49,7 @@ class CustomTracer:
         else:
             exporter = OTLPSpanExporter()
         span_processor = BatchSpanProcessor(span_exporter=exporter)
+        self.span_processor = span_processor
 
         # Create a singleton TracerProvider if not already configured
         tracer_provider = TracerProvider(
@@ -64,6 +65,15 @@ class CustomTracer:
     def get_trace(self):
         return trace
 
+    def get_queue_usage(self):
+        """
+        Return the number of spans waiting for export and the queue capacity.
+        """
+        queue = getattr(self.span_processor, "queue", None)
+        if queue is None:
+            return 0, 0
+        return len(queue), self.span_processor.max_queue_size
+
 
 class CustomMetrics:
     """
@@ -155,9 +165,8 @@ class CustomLogFW:
 
         # Add a BatchLogRecordProcessor to the logger provider.
         # This processor batches logs before sending them to the backend.
-        self.logger_provider.add_log_record_processor(
-            BatchLogRecordProcessor(exporter=exporter, max_queue_size=5, max_export_batch_size=1)
-        )
+        self.log_processor = BatchLogRecordProcessor(exporter=exporter, max_queue_size=5, max_export_batch_size=1)
+        self.logger_provider.add_log_record_processor(self.log_processor)
 
         # Create a LoggingHandler that integrates OpenTelemetry logging with the Python logging system.
         # Setting log level to NOTSET to capture all log levels.
@@ -168,6 +177,16 @@ class CustomLogFW:
 
         return handler
 
+    def get_queue_usage(self):
+        """
+        Return the number of log records waiting for export and the queue capacity.
+        """
+        processor = getattr(self, "log_processor", None)
+        queue = getattr(processor, "_queue", None)
+        if queue is None:
+            return 0, 0
+        return len(queue), processor._max_queue_size
+
 
 class CustomPyroscope:
     """
@@ -226,10 +245,10 @@ class AutoInstrumentation:
     def __init__(self):
         self.instrumentors = []
     
-    def instrument_flask(self, app):
+    def instrument_flask(self, app, excluded_urls=None):
         """Instrumenta automaticamente uma aplicação Flask"""
         try:
-            FlaskInstrumentor().instrument_app(app)
+            FlaskInstrumentor().instrument_app(app, excluded_urls=excluded_urls)
             self.instrumentors.append("flask")
             print("Flask instrumentado automaticamente com OpenTelemetry")
         except Exception as e:
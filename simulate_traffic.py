@@ -10,11 +10,41 @@ import random
 import threading
 import json
 from datetime import datetime
+from urllib.parse import urlsplit
+
+from load_generator import (
+    LoadAgent, OpenLoopRunner, ReplayRunner, TaskWorkload, load_recording, parse_address,
+    print_report, run_distributed, run_processes, setup_client_tracing
+)
+from soak_monitor import PostgresSampler, ProcessSampler, ReadySampler, SoakMonitor, find_pid
+
+class TracedSession(requests.Session):
+    """Session que cria um span de cliente por requisição e envia o traceparent (W3C)"""
+    def __init__(self, tracing):
+        super().__init__()
+        self.tracing = tracing
+    
+    def request(self, method, url, *args, headers=None, **kwargs):
+        headers = dict(headers or {})
+        path = urlsplit(url).path
+        span = self.tracing.start(path, method, path, headers)
+        status = "error"
+        try:
+            response = super().request(method, url, *args, headers=headers, **kwargs)
+            status = response.status_code
+            return response
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            self.tracing.finish(span, status, {})
 
 class TodoTrafficSimulator:
-    def __init__(self, base_url="http://localhost:5001"):
+    def __init__(self, base_url="http://localhost:5001", trace=False):
         self.base_url = base_url
-        self.session = requests.Session()
+        # Spans de cliente ligados aos spans do servidor via traceparent
+        self.tracing = setup_client_tracing() if trace else None
+        self.session = TracedSession(self.tracing) if trace else requests.Session()
         self.running = False
         
         # Lista de tarefas de exemplo
@@ -263,16 +293,164 @@ class TodoTrafficSimulator:
         
         print("⚡ Teste de rajada concluído!")
     
+    def open_loop_test(self, rate, seconds, ramp_to=None, connections=1000, max_inflight=10000, weights=None,
+                       processes=1, agents=None):
+        """
+        Carga em malha aberta: requisições em taxa fixa (ou rampa), independente
+        do tempo de resposta, com percentis por endpoint.
+        
+        Com `processes` > 1 a carga é dividida entre processos locais; com
+        `agents` ('host:porta' de agentes de carga), entre máquinas.
+        """
+        ramp = f" → {ramp_to}" if ramp_to else ""
+        print(f"\n📈 Carga em malha aberta: {rate}{ramp} req/s por {seconds}s ({connections} conexões)")
+        
+        if not self.check_health():
+            return None
+        
+        if agents or processes > 1:
+            config = {
+                "base_url": self.base_url, "rate": rate, "duration": seconds, "ramp_to": ramp_to,
+                "weights": weights, "connections": connections, "max_inflight": max_inflight,
+                "trace": self.tracing is not None
+            }
+            if agents:
+                print(f"🛰️ Dividindo a carga entre {len(agents)} agentes")
+                stats = run_distributed(config, agents)
+            else:
+                print(f"🧵 Dividindo a carga entre {processes} processos")
+                stats = run_processes(config, processes)
+        else:
+            runner = OpenLoopRunner(
+                self.base_url, rate, seconds,
+                ramp_to=ramp_to,
+                workload=TaskWorkload(weights),
+                connections=connections,
+                max_inflight=max_inflight,
+                tracing=self.tracing
+            )
+            stats = runner.run()
+        print_report(stats)
+        return stats
+    
+    def replay_test(self, recording, speed=1.0, connections=1000, max_inflight=10000):
+        """Reproduz uma gravação de tráfego da aplicação preservando os intervalos entre requisições"""
+        entries = load_recording(recording)
+        if not entries:
+            print(f"❌ Gravação vazia: {recording}")
+            return None
+        
+        original = entries[-1]["ts"] - entries[0]["ts"]
+        print(f"\n⏯️ Replay de {len(entries)} requisições ({original:.1f}s gravados) a {speed}x")
+        
+        if not self.check_health():
+            return None
+        
+        runner = ReplayRunner(
+            self.base_url, entries, speed, connections=connections, max_inflight=max_inflight, tracing=self.tracing
+        )
+        stats = runner.run()
+        print_report(stats)
+        if runner.workload.status_mismatches:
+            print(f"   ⚠️ {runner.workload.status_mismatches} respostas com status diferente do gravado")
+        return stats
+    
+    def soak_test(self, rate, seconds, pid=None, interval=10.0, warmup=300.0, db_stats=False,
+                  report_path="soak-report.json", csv_path="soak-samples.csv", weights=None,
+                  connections=1000, max_inflight=10000):
+        """
+        Teste de longa duração: carga constante em malha aberta enquanto os
+        recursos do servidor são amostrados, com detecção de crescimento
+        monotônico (vazamentos) ao final
+        """
+        print(f"\n🛁 Soak test: {rate} req/s por {seconds / 3600:.1f}h, amostras a cada {interval}s")
+        
+        if not self.check_health():
+            return None
+        
+        samplers = [ReadySampler(self.base_url)]
+        if pid is not None:
+            samplers.append(ProcessSampler(pid))
+            print(f"🔬 Amostrando o processo {pid} (RSS, descritores, threads)")
+        else:
+            print("⚠️ Processo alvo não informado: RSS, descritores e threads não serão amostrados")
+        if db_stats:
+            from todo_db import db_config_from_env
+            samplers.append(PostgresSampler(db_config_from_env()))
+        
+        monitor = SoakMonitor(samplers, interval=interval, warmup=min(warmup, seconds / 2))
+        runner = OpenLoopRunner(
+            self.base_url, rate, seconds,
+            workload=TaskWorkload(weights),
+            connections=connections,
+            max_inflight=max_inflight,
+            tracing=self.tracing
+        )
+        monitor.start()
+        try:
+            stats = runner.run()
+            print_report(stats)
+        finally:
+            # Interrompido ou não, a série coletada até aqui é analisada e salva
+            monitor.stop()
+            analysis = monitor.analyze()
+            monitor.write_csv(csv_path)
+            with open(report_path, "w") as f:
+                json.dump({
+                    "rate": rate,
+                    "seconds": seconds,
+                    "interval": interval,
+                    "warmup": monitor.warmup,
+                    "pid": pid,
+                    "sample_errors": monitor.errors,
+                    "load": runner.stats.summary() if runner.stats.elapsed else None,
+                    "resources": analysis,
+                    "leaks": [name for name, result in analysis.items() if result["verdict"] == "leak"],
+                }, f, indent=2)
+            print_soak_analysis(analysis)
+            print(f"💾 Relatório em {report_path}, série temporal em {csv_path}")
+        return analysis
+    
     def stop(self):
         """Para a simulação"""
+        if self.tracing is not None:
+            self.tracing.flush()
         self.running = False
 
+def print_soak_analysis(analysis):
+    """Imprime a tendência de cada recurso amostrado no soak test"""
+    print("\n🔬 Recursos do servidor (após o aquecimento)")
+    print(f"   {'métrica':<16} {'inicial':>10} {'final':>10} {'/hora':>10} {'p-valor':>9}")
+    for name, result in analysis.items():
+        if result["verdict"] == "insufficient_data":
+            print(f"   {name:<16} {'amostras insuficientes':>41}")
+            continue
+        icon = "❌ vazamento?" if result["verdict"] == "leak" else "✅"
+        print(
+            f"   {name:<16} {result['first']:>10.1f} {result['last']:>10.1f} "
+            f"{result['slope_per_hour']:>+10.2f} {result['p_value']:>9.4f} {icon}"
+        )
+
+def save_results(stats, path):
+    """Salva resumo e histogramas completos de uma execução em JSON"""
+    if stats is None or not path:
+        return
+    with open(path, "w") as f:
+        json.dump({"summary": stats.summary(), "stats": stats.to_dict()}, f)
+    print(f"💾 Resultados salvos em {path}")
+
+def parse_mix(value):
+    """Pesos dos endpoints a partir de "list=50,create=25,..." (None usa o mix padrão)"""
+    if not value:
+        return None
+    return {name: float(weight) for name, weight in (item.split("=") for item in value.split(","))}
+
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description="Simulador de tráfego para To-Do App")
     parser.add_argument("--url", default="http://localhost:5001", help="URL base da aplicação")
-    parser.add_argument("--mode", choices=["normal", "continuous", "burst", "errors"], 
+    parser.add_argument("--mode", choices=["normal", "continuous", "burst", "errors", "open-loop", "replay", "agent", "soak"], 
                        default="normal", help="Modo de operação")
     parser.add_argument("--duration", type=int, default=10, 
                        help="Duração em minutos (para modo continuous)")
@@ -280,10 +458,50 @@ def main():
                        help="Número de rajadas (para modo burst)")
     parser.add_argument("--requests", type=int, default=10, 
                        help="Requests por rajada (para modo burst)")
+    parser.add_argument("--rate", type=float, default=50,
+                       help="Requisições por segundo (para modo open-loop)")
+    parser.add_argument("--ramp-to", type=float,
+                       help="Taxa final de uma rampa linear (para modo open-loop)")
+    parser.add_argument("--seconds", type=float, default=60,
+                       help="Duração em segundos (para modo open-loop)")
+    parser.add_argument("--connections", type=int, default=1000,
+                       help="Conexões simultâneas (para modo open-loop)")
+    parser.add_argument("--max-inflight", type=int, default=10000,
+                       help="Limite de requisições em voo (para modo open-loop)")
+    parser.add_argument("--mix",
+                       help="Pesos dos endpoints (modos open-loop e soak), ex.: list=50,create=25,complete=10,delete=5,search=10")
+    parser.add_argument("--json-out",
+                       help="Salva os resultados (histogramas completos) em JSON")
+    parser.add_argument("--recording",
+                       help="Gravação JSONL do tráfego (para modo replay)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                       help="Velocidade do replay: 1, 10, 100... (para modo replay)")
+    parser.add_argument("--processes", type=int, default=1,
+                       help="Processos geradores de carga (para modos open-loop e agent)")
+    parser.add_argument("--agents",
+                       help="Agentes de carga host:porta,... que dividem a carga (para modo open-loop)")
+    parser.add_argument("--listen", default="127.0.0.1:7070",
+                       help="Endereço de controle do agente (para modo agent)")
+    parser.add_argument("--hours", type=float, default=4,
+                       help="Duração em horas (para modo soak)")
+    parser.add_argument("--pid", type=int,
+                       help="Pid do processo da aplicação (para modo soak; padrão: procura por todo_app.py)")
+    parser.add_argument("--sample-interval", type=float, default=10,
+                       help="Segundos entre amostras de recursos (para modo soak)")
+    parser.add_argument("--warmup", type=float, default=300,
+                       help="Segundos iniciais ignorados na análise de tendência (para modo soak)")
+    parser.add_argument("--db-stats", action="store_true",
+                       help="Amostra as conexões no PostgreSQL com as variáveis DB_* (para modo soak)")
+    parser.add_argument("--report", default="soak-report.json",
+                       help="Relatório JSON (para modo soak)")
+    parser.add_argument("--csv", default="soak-samples.csv",
+                       help="Série temporal em CSV (para modo soak)")
+    parser.add_argument("--trace", action="store_true",
+                       help="Cria spans de cliente (OpenTelemetry) e propaga o traceparent para a aplicação")
     
     args = parser.parse_args()
     
-    simulator = TodoTrafficSimulator(args.url)
+    simulator = TodoTrafficSimulator(args.url, trace=args.trace)
     
     print(f"🎯 Simulador de Tráfego - To-Do App")
     print(f"📡 URL: {args.url}")
@@ -303,6 +521,34 @@ def main():
             
         elif args.mode == "errors":
             simulator.error_simulation_workflow()
+        
+        elif args.mode == "open-loop":
+            weights = parse_mix(args.mix)
+            agents = args.agents.split(",") if args.agents else None
+            stats = simulator.open_loop_test(
+                args.rate, args.seconds, args.ramp_to, args.connections, args.max_inflight, weights,
+                processes=args.processes, agents=agents
+            )
+            save_results(stats, args.json_out)
+        
+        elif args.mode == "replay":
+            if not args.recording:
+                parser.error("--recording é obrigatório no modo replay")
+            stats = simulator.replay_test(args.recording, args.speed, args.connections, args.max_inflight)
+            save_results(stats, args.json_out)
+        
+        elif args.mode == "soak":
+            pid = args.pid if args.pid is not None else find_pid("todo_app.py")
+            simulator.soak_test(
+                args.rate, args.hours * 3600, pid=pid, interval=args.sample_interval, warmup=args.warmup,
+                db_stats=args.db_stats, report_path=args.report, csv_path=args.csv,
+                weights=parse_mix(args.mix), connections=args.connections, max_inflight=args.max_inflight
+            )
+        
+        elif args.mode == "agent":
+            with LoadAgent(parse_address(args.listen), processes=args.processes) as agent:
+                print(f"🛰️ Agente de carga aguardando o coordenador em {args.listen} ({args.processes} processos)")
+                agent.serve_forever()
     
     except KeyboardInterrupt:
         print("\n⏹️ Simulação interrompida pelo usuário")
@@ -0,0 +1,246 @@
+"""
+Monitor de recursos para testes de longa duração (soak) da To-Do App.
+
+Enquanto o simulate_traffic.py mantém uma carga constante por horas, o
+SoakMonitor amostra periodicamente o processo alvo (RSS, descritores de
+arquivo e threads via /proc), as conexões abertas no PostgreSQL e as filas dos
+exportadores do OpenTelemetry (/ready). Ao final, cada série passa por um teste
+de tendência (Mann-Kendall, com inclinação de Theil-Sen): crescimento
+monotônico e significativo depois do aquecimento indica vazamento.
+
+Só depende da biblioteca padrão (psycopg2 é importado apenas pelo amostrador do
+PostgreSQL).
+"""
+import csv
+import json
+import math
+import os
+import statistics
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+
+def find_pid(script):
+    """
+    Pid do primeiro processo que executa `script` (ex.: todo_app.py), isto é,
+    com um argumento cujo nome de arquivo é `script`; ignora shells que apenas
+    mencionam o script em um `-c`.
+    """
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit() or int(entry) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                args = f.read().decode("utf-8", "replace").split("\0")
+        except OSError:
+            continue
+        if any(os.path.basename(arg) == script for arg in args[1:]):
+            return int(entry)
+    return None
+
+
+class ProcessSampler:
+    """RSS (MiB), descritores de arquivo e threads de um processo local, via /proc"""
+    def __init__(self, pid):
+        self.pid = pid
+
+    def sample(self):
+        values = {}
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == "VmRSS":
+                    values["rss_mib"] = int(value.split()[0]) / 1024
+                elif key == "Threads":
+                    values["threads"] = int(value)
+        values["open_fds"] = len(os.listdir(f"/proc/{self.pid}/fd"))
+        return values
+
+
+class PostgresSampler:
+    """Conexões abertas no banco da aplicação (pg_stat_activity), sem contar a do próprio monitor"""
+    def __init__(self, db_config):
+        import psycopg2
+
+        self.conn = psycopg2.connect(**db_config)
+        self.conn.autocommit = True
+
+    def sample(self):
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT count(*) FROM pg_stat_activity
+                WHERE datname = current_database() AND pid <> pg_backend_pid()
+            """)
+            return {"pg_connections": cur.fetchone()[0]}
+
+
+class ReadySampler:
+    """Filas dos exportadores e ocupação do pool, como reportadas pelo /ready da aplicação"""
+    def __init__(self, base_url, timeout=5.0):
+        self.url = f"{base_url.rstrip('/')}/ready"
+        self.timeout = timeout
+
+    def sample(self):
+        try:
+            with urlopen(self.url, timeout=self.timeout) as response:
+                details = json.load(response)
+        except HTTPError as e:
+            # 503 (não pronta) traz o mesmo corpo
+            details = json.load(e)
+        values = {
+            f"{name}_queue": exporter["queued"]
+            for name, exporter in details.get("exporters", {}).items()
+        }
+        pool = details.get("pool", {})
+        if "in_use" in pool:
+            values["pool_in_use"] = pool["in_use"]
+        return values
+
+
+def mann_kendall(values):
+    """
+    Teste de tendência de Mann-Kendall.
+
+    :return: (estatística S, p-valor bicaudal), com correção da variância para
+        valores empatados; S > 0 indica tendência de alta
+    """
+    n = len(values)
+    if n < 3:
+        return 0, 1.0
+    s = 0
+    for i in range(n - 1):
+        current = values[i]
+        for later in values[i + 1:]:
+            s += (later > current) - (later < current)
+    ties = {}
+    for value in values:
+        ties[value] = ties.get(value, 0) + 1
+    variance = (n * (n - 1) * (2 * n + 5) - sum(t * (t - 1) * (2 * t + 5) for t in ties.values())) / 18
+    if variance <= 0:
+        return s, 1.0
+    z = (s - math.copysign(1, s)) / math.sqrt(variance) if s else 0.0
+    return s, 2 * (1 - statistics.NormalDist().cdf(abs(z)))
+
+
+def theil_sen(times, values):
+    """Inclinação de Theil-Sen: mediana das inclinações entre todos os pares (robusta a picos)"""
+    slopes = [
+        (values[j] - values[i]) / (times[j] - times[i])
+        for i in range(len(values) - 1)
+        for j in range(i + 1, len(values))
+        if times[j] != times[i]
+    ]
+    return statistics.median(slopes) if slopes else 0.0
+
+
+def _thin(points, limit):
+    """No máximo `limit` pontos igualmente espaçados (os testes são O(n²))"""
+    if len(points) <= limit:
+        return points
+    step = len(points) / limit
+    return [points[int(i * step)] for i in range(limit)]
+
+
+class SoakMonitor:
+    """
+    Amostra os recursos do alvo em uma thread e analisa a tendência de cada série.
+
+    Uma série é marcada como vazamento quando, após o aquecimento, o teste de
+    Mann-Kendall indica alta com p < `alpha` e o crescimento estimado
+    (Theil-Sen) no período passa de `min_growth` do valor inicial.
+
+    :param samplers: objetos com `sample()` -> {métrica: valor}
+    :param warmup: segundos iniciais ignorados na análise (pools e caches enchendo)
+    """
+    # Pontos usados nos testes de tendência
+    MAX_POINTS = 1000
+
+    def __init__(self, samplers, interval=10.0, warmup=300.0, alpha=0.01, min_growth=0.05):
+        self.samplers = samplers
+        self.interval = interval
+        self.warmup = warmup
+        self.alpha = alpha
+        self.min_growth = min_growth
+        self.samples = []
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="soak-monitor", daemon=True)
+        self._started = None
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def sample_once(self):
+        row = {"elapsed_s": round(time.monotonic() - self._started, 3), "timestamp": time.time()}
+        for sampler in self.samplers:
+            try:
+                row.update(sampler.sample())
+            except Exception:
+                # Falha pontual (ex.: /ready lento): a métrica fica vazia nesta amostra
+                self.errors += 1
+        self.samples.append(row)
+        return row
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample_once()
+            self._stop.wait(self.interval)
+
+    def metrics(self):
+        """Métricas presentes nas amostras, na ordem em que apareceram"""
+        names = {}
+        for row in self.samples:
+            names.update(dict.fromkeys(row))
+        names.pop("elapsed_s", None)
+        names.pop("timestamp", None)
+        return list(names)
+
+    def write_csv(self, path):
+        """Série temporal completa, uma linha por amostra"""
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["elapsed_s", "timestamp"] + self.metrics())
+            writer.writeheader()
+            writer.writerows(self.samples)
+
+    def analyze(self):
+        """Resultado da análise por métrica: valores, inclinação por hora, p-valor e veredito"""
+        report = {}
+        for name in self.metrics():
+            points = [
+                (row["elapsed_s"], row[name]) for row in self.samples
+                if name in row and row["elapsed_s"] >= self.warmup
+            ]
+            if len(points) < 3:
+                report[name] = {"samples": len(points), "verdict": "insufficient_data"}
+                continue
+            points = _thin(points, self.MAX_POINTS)
+            times = [t for t, _ in points]
+            values = [value for _, value in points]
+            s, p_value = mann_kendall(values)
+            slope = theil_sen(times, values)
+            baseline = statistics.median(values[:max(3, len(values) // 10)])
+            growth = slope * (times[-1] - times[0])
+            # Sem valor inicial (ex.: fila vazia) o crescimento relativo não existe: qualquer crescimento conta
+            relative = growth / baseline if baseline else None
+            significant = relative > self.min_growth if relative is not None else growth > 0
+            leaking = s > 0 and p_value < self.alpha and significant
+            report[name] = {
+                "samples": len(points),
+                "first": values[0],
+                "last": values[-1],
+                "max": max(values),
+                "slope_per_hour": slope * 3600,
+                "growth": growth,
+                "growth_relative": relative,
+                "mann_kendall_s": s,
+                "p_value": p_value,
+                "verdict": "leak" if leaking else "stable",
+            }
+        return report
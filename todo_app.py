@@ -1,124 +1,29 @@
-from flask import Flask, request, jsonify, render_template_string
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from flask import Flask, request, jsonify, render_template, g, has_request_context
+from opentelemetry import trace
+from opentelemetry.metrics import Observation
+from opentelemetry.trace import Link
 import os
 import logging
+import threading
 import time
 import random
 from datetime import datetime
-from otel import CustomLogFW, CustomMetrics, CustomTracer, CustomPyroscope
+from otel import CustomLogFW, CustomMetrics, CustomTracer, CustomPyroscope, AutoInstrumentation
+from todo_db import ConnectionPool, StatementRegistry, WriteCoalescer, db_config_from_env, search_terms, TASK_STATEMENTS, encode_task, encode_tasks
+from todo_http import (
+    AdmissionController, Deadline, DeadlineExceeded, PrecompressedPage, RequestMetrics, ResponseCompressor,
+    TrafficRecorder, format_server_timing
+)
+from todo_storage import PostgresTaskStorage, ReplicatedTaskStorage, SQLiteTaskStorage
+from todo_events import ChangeEvent, ChangeFeed, PostgresChangeBridge, format_sse
 
 # Configuração do Flask
 app = Flask(__name__)
 
-# Template HTML simples
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html>
-<head>
-    <title>📝 To-Do App - Observabilidade Demo</title>
-    <style>
-        body { font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; }
-        .container { background: #f5f5f5; padding: 20px; border-radius: 10px; }
-        .task { background: white; margin: 10px 0; padding: 15px; border-radius: 5px; border-left: 4px solid #007bff; }
-        .completed { border-left-color: #28a745; opacity: 0.7; }
-        .error { border-left-color: #dc3545; background: #ffe6e6; }
-        input, button { padding: 10px; margin: 5px; }
-        button { background: #007bff; color: white; border: none; border-radius: 3px; cursor: pointer; }
-        .error-btn { background: #dc3545; }
-        .warning-btn { background: #ffc107; color: black; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>📝 To-Do List - Demo Observabilidade</h1>
-        
-        <h2>Adicionar Nova Tarefa</h2>
-        <input type="text" id="taskTitle" placeholder="Título da tarefa" style="width: 300px;">
-        <button onclick="addTask()">Adicionar</button>
-        
-        <h2>Simulação de Erros</h2>
-        <button class="error-btn" onclick="simulateError('db')">Simular Erro DB</button>
-        <button class="error-btn" onclick="simulateError('timeout')">Simular Timeout</button>
-        <button class="error-btn" onclick="simulateError('500')">Simular 500</button>
-        <button class="warning-btn" onclick="simulateError('slow')">Simular Lentidão</button>
-        
-        <h2>Tarefas</h2>
-        <div id="tasks"></div>
-    </div>
-
-    <script>
-        // Carregar tarefas ao iniciar
-        loadTasks();
-
-        function addTask() {
-            const title = document.getElementById('taskTitle').value;
-            if (!title) return;
-            
-            fetch('/api/tasks', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({title: title})
-            })
-            .then(response => response.json())
-            .then(data => {
-                document.getElementById('taskTitle').value = '';
-                loadTasks();
-            })
-            .catch(error => console.error('Erro:', error));
-        }
 
-        function loadTasks() {
-            fetch('/api/tasks')
-            .then(response => response.json())
-            .then(tasks => {
-                const tasksDiv = document.getElementById('tasks');
-                tasksDiv.innerHTML = tasks.map(task => 
-                    `<div class="task ${task.completed ? 'completed' : ''}">
-                        <strong>${task.title}</strong>
-                        <br><small>ID: ${task.id} | Criado: ${task.created_at}</small>
-                        <br>
-                        ${!task.completed ? 
-                            `<button onclick="completeTask(${task.id})">Completar</button>` : 
-                            '<span style="color: green;">✓ Concluída</span>'
-                        }
-                        <button class="error-btn" onclick="deleteTask(${task.id})">Deletar</button>
-                    </div>`
-                ).join('');
-            })
-            .catch(error => console.error('Erro:', error));
-        }
-
-        function completeTask(id) {
-            fetch(`/api/tasks/${id}/complete`, {method: 'POST'})
-            .then(() => loadTasks())
-            .catch(error => console.error('Erro:', error));
-        }
-
-        function deleteTask(id) {
-            fetch(`/api/tasks/${id}`, {method: 'DELETE'})
-            .then(() => loadTasks())
-            .catch(error => console.error('Erro:', error));
-        }
-
-        function simulateError(type) {
-            fetch(`/api/simulate-error/${type}`, {method: 'POST'})
-            .then(response => response.json())
-            .then(data => {
-                alert(`Erro simulado: ${data.message}`);
-                loadTasks();
-            })
-            .catch(error => {
-                alert(`Erro real capturado: ${error.message}`);
-            });
-        }
-
-        // Auto-refresh a cada 30 segundos
-        setInterval(loadTasks, 30000);
-    </script>
-</body>
-</html>
-"""
+# Regex aplicada pelo FlaskInstrumentor à URL completa (com query string): ancorada no
+# path para que buscas como /api/tasks/search?q=ready continuem com span
+EXCLUDED_URLS = r"^https?://[^/]+/(health|ready|api/tasks/stream)/?(\?|$)"
 
 class TodoApp:
     def __init__(self):
@@ -128,12 +33,23 @@ class TodoApp:
         # Configurar banco de dados
         self.setup_database()
         
+        # Feed de mudanças para o stream SSE
+        self.setup_events()
+        
+        # Verificações de saúde em background (readiness)
+        self.health_monitor = HealthMonitor(
+            self,
+            interval=float(os.environ.get('HEALTH_CHECK_INTERVAL', '5'))
+        )
+        self.health_monitor.start()
+        
     def setup_observability(self):
         """Configura todas as ferramentas de observabilidade"""
         service_name = "todo-app"
         
         # Logs
         logFW = CustomLogFW(service_name=service_name)
+        self.log_service = logFW
         handler = logFW.setup_logging()
         logging.getLogger().addHandler(handler)
         logging.getLogger().setLevel(logging.INFO)
@@ -145,15 +61,27 @@ class TodoApp:
         
         # Traces
         tracer_service = CustomTracer(service_name=service_name)
+        self.tracer_service = tracer_service
         self.trace = tracer_service.get_trace()
         self.tracer = self.trace.get_tracer(service_name)
         
         # Profiling
         self.profiler = CustomPyroscope(service_name=service_name, application_name="todo-app")
         
+        # Span por requisição HTTP (os probes de saúde ficam de fora)
+        self.auto_instrumentation = AutoInstrumentation()
+        # O stream SSE fica de fora: o span duraria a conexão inteira
+        self.auto_instrumentation.instrument_flask(app, excluded_urls=EXCLUDED_URLS)
+        
         # Criar métricas customizadas
         self.setup_metrics()
         
+        # Controle de admissão por rota
+        self.setup_admission_control()
+        
+        # Prazos por requisição
+        self.setup_deadlines()
+        
         self.logger.info("Observabilidade configurada com sucesso")
     
     def setup_metrics(self):
@@ -195,6 +123,45 @@ class TodoApp:
             unit="1"
         )
         
+        # Statements preparados no servidor
+        self.statements_prepared_counter = self.meter.create_counter(
+            name="db_statements_prepared_total",
+            description="Total de PREPAREs executados (um por statement e conexão)"
+        )
+        
+        self.statements_executed_counter = self.meter.create_counter(
+            name="db_statements_executed_total",
+            description="Total de execuções de statements preparados"
+        )
+        
+        # Leituras por destino (primário ou réplica)
+        self.db_reads_counter = self.meter.create_counter(
+            name="db_reads_total",
+            description="Leituras por destino quando há réplicas de leitura"
+        )
+        
+        # Tamanho dos lotes do agrupamento de inserts
+        self.insert_batch_histogram = self.meter.create_histogram(
+            name="db_insert_batch_size",
+            description="Tarefas gravadas por lote no agrupamento de inserts",
+            unit="1"
+        )
+        
+        # Contador e duração por requisição com atributos pré-computados
+        self.request_metrics = RequestMetrics(
+            self.http_requests_counter,
+            self.response_time_histogram,
+            self.logger,
+            slow_threshold=float(os.environ.get('SLOW_REQUEST_MS', '1000')) / 1000
+        )
+        
+        # Decomposição do tempo no servidor (fila, aplicação, banco) para os clientes
+        self.server_timing = os.environ.get('SERVER_TIMING', 'true').lower() == 'true'
+        
+        # Gravação opcional do tráfego para replay (simulate_traffic.py --mode replay)
+        record_path = os.environ.get('TRAFFIC_RECORD_PATH')
+        self.traffic_recorder = TrafficRecorder(record_path) if record_path else None
+        
         # Métrica para duração das operações
         self.operation_duration = self.meter.create_histogram(
             name="operation_duration_seconds",
@@ -202,111 +169,491 @@ class TodoApp:
             unit="s"
         )
     
+    def setup_admission_control(self):
+        """Configura os limites de concorrência adaptativos por rota"""
+        self.admission = AdmissionController(
+            default_limit=int(os.environ.get('ADMISSION_DEFAULT_LIMIT', '16')),
+            max_limit=int(os.environ.get('ADMISSION_MAX_LIMIT', '64')),
+            route_limits=AdmissionController.parse_route_limits(
+                os.environ.get('ADMISSION_ROUTE_LIMITS', 'simulate_error=4')
+            ),
+            exempt={"health_check", "readiness_check", "static", "stream_tasks"},
+            queue_size=int(os.environ.get('ADMISSION_QUEUE_SIZE', '32')),
+            max_wait=float(os.environ.get('ADMISSION_MAX_WAIT_MS', '1000')) / 1000,
+            latency_target=float(os.environ.get('ADMISSION_LATENCY_TARGET_MS', '500')) / 1000
+        )
+        
+        self.shed_requests_counter = self.meter.create_counter(
+            name="http_requests_shed_total",
+            description="Requisições recusadas pelo controle de admissão"
+        )
+        
+        self.admission_wait_histogram = self.meter.create_histogram(
+            name="admission_wait_seconds",
+            description="Tempo de espera na fila do controle de admissão",
+            unit="s"
+        )
+        
+        self.meter.create_observable_gauge(
+            name="admission_limit",
+            description="Limite de concorrência atual por rota",
+            callbacks=[lambda options: self.observe_admission("limit")]
+        )
+        
+        self.meter.create_observable_gauge(
+            name="admission_inflight",
+            description="Requisições em execução por rota",
+            callbacks=[lambda options: self.observe_admission("inflight")]
+        )
+        
+        self.meter.create_observable_gauge(
+            name="admission_queue",
+            description="Requisições aguardando vaga por rota",
+            callbacks=[lambda options: self.observe_admission("waiting")]
+        )
+    
+    def setup_deadlines(self):
+        """Configura o orçamento de tempo padrão e máximo das requisições"""
+        self.deadline_header = "X-Request-Timeout-Ms"
+        self.request_timeout = float(os.environ.get('REQUEST_TIMEOUT_MS', '5000')) / 1000
+        self.request_timeout_max = float(os.environ.get('REQUEST_TIMEOUT_MAX_MS', '30000')) / 1000
+        
+        self.deadline_exceeded_counter = self.meter.create_counter(
+            name="request_deadline_exceeded_total",
+            description="Requisições interrompidas por estourar o prazo"
+        )
+    
+    def observe_admission(self, field):
+        return [
+            Observation(value=stats[field], attributes={"endpoint": route})
+            for route, stats in self.admission.stats().items()
+        ]
+    
     def update_task_metrics(self):
         """Atualiza métricas de tarefas manualmente"""
         try:
-            with self.get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    # Conta total de tarefas
-                    cur.execute("SELECT COUNT(*) FROM tasks")
-                    total_tasks = cur.fetchone()[0]
-                    
-                    # Conta tarefas completadas  
-                    cur.execute("SELECT COUNT(*) FROM tasks WHERE completed = true")
-                    completed_tasks = cur.fetchone()[0]
-                    
-                    self.logger.info(f"Métricas atualizadas - Total: {total_tasks}, Completadas: {completed_tasks}")
+            total_tasks, open_tasks = self.storage.count_tasks()
+            completed_tasks = total_tasks - open_tasks
+            self.logger.info(f"Métricas atualizadas - Total: {total_tasks}, Completadas: {completed_tasks}")
         except Exception as e:
             self.logger.error(f"Erro ao atualizar métricas: {e}")
     
     def setup_database(self):
-        """Configura e inicializa o banco de dados"""
-        self.db_config = {
-            'host': os.environ.get('DB_HOST', 'localhost'),
-            'database': os.environ.get('DB_NAME', 'todoapp'),
-            'user': os.environ.get('DB_USER', 'todouser'),
-            'password': os.environ.get('DB_PASSWORD', 'todopass'),
-            'port': os.environ.get('DB_PORT', '5432')
+        """Configura o backend de armazenamento (STORAGE_BACKEND) e aplica o schema"""
+        backend = os.environ.get('STORAGE_BACKEND', 'postgres').lower()
+        
+        if backend == 'sqlite':
+            # Banco embutido: dispensa o PostgreSQL (testes de carga e benchmarks locais)
+            # Sem réplicas: arquivos SQLite separados não replicam o primário
+            self.primary_storage = SQLiteTaskStorage(os.environ.get('SQLITE_PATH', 'todo.db'), **self.sqlite_pool_options())
+            replicas = []
+        elif backend == 'postgres':
+            db_config = db_config_from_env()
+            
+            # Statements quentes, preparados uma vez por conexão do pool
+            statements = StatementRegistry(
+                TASK_STATEMENTS,
+                prepare_counter=self.statements_prepared_counter,
+                execute_counter=self.statements_executed_counter
+            )
+            
+            # Pool de conexões compartilhado por todas as requisições
+            self.primary_storage = PostgresTaskStorage(self.create_pool(db_config), statements)
+            
+            # Réplicas de leitura: mesmo banco e credenciais, cada uma com seu pool.
+            # minconn=0 para que uma réplica fora do ar não impeça a inicialização.
+            replicas = [
+                PostgresTaskStorage(self.create_pool({**db_config, **parse_replica_host(host)}, minconn=0), statements)
+                for host in filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))
+            ]
+        else:
+            raise ValueError(f"STORAGE_BACKEND desconhecido: {backend}")
+        
+        self.storage = self.primary_storage
+        self.read_your_writes_window = None
+        if replicas:
+            self.storage = ReplicatedTaskStorage(
+                self.primary_storage,
+                replicas,
+                max_lag=float(os.environ.get('DB_REPLICA_MAX_LAG', '5')),
+                on_read=self.record_read_target
+            )
+            self.read_your_writes_window = int(os.environ.get('READ_YOUR_WRITES_SECONDS', '5'))
+        
+        self.storage.observe_queries(self.record_db_time)
+        self.logger.info(f"Backend de armazenamento: {self.storage.name}")
+        
+        # Criar/atualizar tabelas e índices
+        self.migrate_schema()
+        
+        # Agrupamento opcional de inserts concorrentes em lotes
+        self.write_coalescer = None
+        if os.environ.get('WRITE_COALESCING', 'false').lower() == 'true':
+            self.write_coalescer = WriteCoalescer(
+                self.insert_task_batch,
+                max_batch=int(os.environ.get('WRITE_COALESCING_MAX_BATCH', '64')),
+                max_delay=float(os.environ.get('WRITE_COALESCING_MAX_DELAY_MS', '2')) / 1000,
+                on_batch=lambda size: self.insert_batch_histogram.record(size)
+            )
+        
+    def sqlite_pool_options(self):
+        """Limites DB_POOL_MAX/DB_POOL_TIMEOUT aplicados ao pool do SQLite"""
+        return {
+            "max_connections": int(os.environ.get('DB_POOL_MAX', '10')),
+            "acquire_timeout": float(os.environ.get('DB_POOL_TIMEOUT', '5')),
         }
+
+    def create_pool(self, db_config, minconn=None):
+        """Cria um pool de conexões com os limites DB_POOL_*"""
+        return ConnectionPool(
+            minconn=int(os.environ.get('DB_POOL_MIN', '1')) if minconn is None else minconn,
+            maxconn=int(os.environ.get('DB_POOL_MAX', '10')),
+            acquire_timeout=float(os.environ.get('DB_POOL_TIMEOUT', '5')),
+            **db_config
+        )
+    
+    def record_db_time(self, seconds):
+        """Acumula o tempo de banco da requisição atual (Server-Timing)"""
+        if has_request_context():
+            g.db_seconds = g.get('db_seconds', 0.0) + seconds
+    
+    def record_read_target(self, target, reason):
+        """Registra para onde cada leitura foi roteada (réplica ou primário e motivo)"""
+        self.db_reads_counter.add(1, {"target": target, "reason": reason})
+        trace.get_current_span().set_attribute("db.read_target", target)
+    
+    def setup_events(self):
+        """Configura o feed de mudanças das tarefas (e o LISTEN/NOTIFY opcional)"""
+        self.change_feed = ChangeFeed(history=int(os.environ.get('TASK_EVENTS_HISTORY', '1000')))
+        self.sse_heartbeat = float(os.environ.get('TASK_EVENTS_HEARTBEAT', '15'))
+        self.change_publisher = self.change_feed
+        
+        # Com vários workers os eventos passam pelo PostgreSQL para chegar a todos
+        if os.environ.get('TASK_EVENTS_NOTIFY', 'false').lower() == 'true':
+            if self.primary_storage.name != 'postgres':
+                raise ValueError("TASK_EVENTS_NOTIFY requer STORAGE_BACKEND=postgres")
+            bridge = PostgresChangeBridge(self.change_feed, self.primary_storage.pool, db_config_from_env())
+            bridge.start()
+            self.change_publisher = bridge
+        
+        self.task_events_counter = self.meter.create_counter(
+            name="task_events_published_total",
+            description="Eventos de mudança de tarefas publicados"
+        )
         
-        # Criar tabelas se não existirem
-        self.create_tables()
+        self.meter.create_observable_gauge(
+            name="task_events_subscribers",
+            description="Conexões SSE abertas no stream de tarefas",
+            callbacks=[lambda options: [Observation(value=self.change_feed.subscribers)]]
+        )
+    
+    def publish_task_event(self, event_type, data):
+        """Publica uma mudança de tarefa; falhas são logadas sem afetar a escrita"""
+        try:
+            self.change_publisher.publish(event_type, data)
+            self.task_events_counter.add(1, {"type": event_type})
+        except Exception as e:
+            self.logger.error(f"Erro ao publicar evento {event_type}: {e}")
+    
+    def insert_task_batch(self, items, deadline=None):
+        """
+        Grava um lote de tarefas em um único INSERT e retorna as linhas na ordem dos itens.
         
-    def get_db_connection(self):
-        """Obtém conexão com o banco de dados"""
-        return psycopg2.connect(**self.db_config)
+        :param items: lista de (título, contexto do span da requisição)
+        :param deadline: prazo mais curto entre as requisições do lote
+        """
+        links = [Link(span_context) for _, span_context in items]
+        with self.tracer.start_as_current_span("insert_task_batch", links=links) as span:
+            span.set_attribute("batch_size", len(items))
+            rows = self.storage.create_tasks([title for title, _ in items], deadline=deadline)
+            self.db_operations_counter.add(1, {"operation": "insert_batch", "table": "tasks"})
+            return rows
+    
+    def get_exporter_backlog(self):
+        """Retorna a ocupação das filas de exportação de spans e logs"""
+        backlog = {}
+        for name, service in (("traces", self.tracer_service), ("logs", self.log_service)):
+            queued, capacity = service.get_queue_usage()
+            backlog[name] = {
+                "queued": queued,
+                "capacity": capacity,
+                "usage": queued / capacity if capacity else 0.0
+            }
+        return backlog
     
-    def create_tables(self):
-        """Cria as tabelas necessárias"""
-        with self.tracer.start_as_current_span("create_tables") as span:
+    def migrate_schema(self):
+        """Aplica as migrações pendentes do schema (tabelas e índices)"""
+        with self.tracer.start_as_current_span("migrate_schema") as span:
             try:
-                with self.get_db_connection() as conn:
-                    with conn.cursor() as cur:
-                        cur.execute("""
-                            CREATE TABLE IF NOT EXISTS tasks (
-                                id SERIAL PRIMARY KEY,
-                                title VARCHAR(255) NOT NULL,
-                                completed BOOLEAN DEFAULT FALSE,
-                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                            );
-                        """)
-                        conn.commit()
-                        
-                span.set_attribute("operation", "create_tables")
+                applied = self.storage.migrate()
+                
+                span.set_attribute("operation", "migrate_schema")
+                span.set_attribute("storage_backend", self.storage.name)
+                span.set_attribute("migrations_applied", len(applied))
                 span.set_attribute("success", True)
-                self.logger.info("Tabelas criadas/verificadas com sucesso")
+                if applied:
+                    self.logger.info(f"Migrações aplicadas: {applied}")
+                else:
+                    self.logger.info("Schema já está atualizado")
                 
             except Exception as e:
                 span.set_attribute("success", False)
                 span.set_attribute("error", str(e))
-                self.logger.error(f"Erro ao criar tabelas: {e}")
+                self.logger.error(f"Erro ao aplicar migrações: {e}")
                 raise
 
+def parse_replica_host(value):
+    """Converte "host[:porta]" de DB_REPLICA_HOSTS em parâmetros de conexão"""
+    host, _, port = value.strip().rpartition(':')
+    if host and port.isdigit():
+        return {'host': host, 'port': port}
+    return {'host': value.strip()}
+
+class HealthMonitor:
+    """
+    Verifica o banco de dados periodicamente em uma thread de background.
+    
+    Os probes HTTP leem apenas o último resultado guardado em memória, então
+    a frequência de health checks não gera conexões nem queries no PostgreSQL.
+    """
+    def __init__(self, todo_app, interval=5.0):
+        self.todo_app = todo_app
+        self.interval = interval
+        self.max_pool_saturation = float(os.environ.get('READY_MAX_POOL_SATURATION', '0.9'))
+        self.max_exporter_backlog = float(os.environ.get('READY_MAX_EXPORTER_BACKLOG', '0.8'))
+        self.started_at = time.time()
+        self.last_result = {"ok": False, "error": "nenhuma verificação executada", "checked_at": None}
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Executa a primeira verificação e inicia a thread periódica"""
+        self.check_database()
+        self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check_database()
+    
+    def check_database(self):
+        """Executa SELECT 1 no backend de armazenamento e guarda o resultado"""
+        start = time.time()
+        try:
+            self.todo_app.storage.ping(timeout=self.interval)
+            result = {"ok": True, "latency_ms": round((time.time() - start) * 1000, 2)}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        result["checked_at"] = time.time()
+        
+        # Logar apenas mudanças de estado para não gerar um log a cada probe
+        if result["ok"] != self.last_result["ok"]:
+            if result["ok"]:
+                self.todo_app.logger.info("Banco de dados disponível")
+            else:
+                self.todo_app.logger.error(f"Banco de dados indisponível: {result['error']}")
+        self.last_result = result
+    
+    def readiness(self):
+        """Monta o estado de readiness a partir do cache e de contadores em memória"""
+        database = dict(self.last_result)
+        pool = self.todo_app.storage.stats()
+        exporters = self.todo_app.get_exporter_backlog()
+        
+        reasons = []
+        if not database["ok"]:
+            reasons.append("database_unavailable")
+        elif time.time() - database["checked_at"] > self.interval * 3:
+            reasons.append("database_check_stale")
+        if pool["saturation"] >= self.max_pool_saturation:
+            reasons.append("pool_saturated")
+        # A fila de logs tem só 5 posições e descarta registros por design,
+        # então apenas a fila de spans entra na decisão de readiness
+        if exporters["traces"]["usage"] >= self.max_exporter_backlog:
+            reasons.append("traces_exporter_backlog")
+        
+        if database["checked_at"] is not None:
+            database["age_seconds"] = round(time.time() - database.pop("checked_at"), 3)
+        
+        return not reasons, {
+            "database": database,
+            "pool": pool,
+            "exporters": exporters,
+            "reasons": reasons
+        }
+
 # Instância global da aplicação
 todo_app = TodoApp()
 
+# Página principal renderizada e comprimida uma única vez
+with app.app_context():
+    index_page = PrecompressedPage(render_template("index.html").encode("utf-8"))
+
+# Compressão de respostas JSON acima do tamanho mínimo
+response_compressor = ResponseCompressor(
+    min_size=int(os.environ.get('COMPRESS_MIN_BYTES', '1024')),
+    level=int(os.environ.get('COMPRESS_LEVEL', '5'))
+)
+
+# Cookie que marca clientes que escreveram há pouco (leem do primário)
+RECENT_WRITE_COOKIE = "todo_recent_write"
+WRITE_ENDPOINTS = {"create_task", "complete_task", "delete_task"}
+
+# Endpoints que não entram na gravação de tráfego (probes e o stream SSE)
+UNRECORDED_ENDPOINTS = {"health_check", "readiness_check", "stream_tasks", "static"}
+
+def task_reader():
+    """Backend de leitura da requisição: o primário logo após uma escrita do cliente"""
+    return todo_app.storage.reader(after_write=RECENT_WRITE_COOKIE in request.cookies)
+
+def json_response(body, status=200):
+    """Resposta JSON a partir de um corpo já serializado (ex.: encode_tasks)"""
+    return app.response_class(body, status=status, mimetype="application/json")
+
 @app.before_request
 def before_request():
     """Middleware para capturar início das requisições"""
-    request.start_time = time.time()
+    g.request_started_ns = todo_app.request_metrics.start(request.method, request.endpoint)
+
+@app.before_request
+def start_deadline():
+    """Cria o prazo da requisição a partir da configuração ou do header do cliente"""
+    g.deadline = Deadline.from_header(
+        request.headers.get(todo_app.deadline_header),
+        default=todo_app.request_timeout,
+        maximum=todo_app.request_timeout_max
+    )
+    trace.get_current_span().set_attribute("deadline.budget_ms", round(g.deadline.budget * 1000, 3))
+
+@app.before_request
+def admission_control():
+    """Controle de admissão: espera limitada por uma vaga ou 503 imediato"""
+    limiter = todo_app.admission.limiter(request.endpoint)
+    if limiter is None:
+        return None
     
-    # Incrementar contador de requests
-    todo_app.http_requests_counter.add(1, {
-        "method": request.method,
-        "endpoint": request.endpoint or "unknown"
-    })
+    endpoint = request.endpoint
+    rejected, waited = limiter.acquire(timeout=g.deadline.remaining())
+    todo_app.admission_wait_histogram.record(waited, {"endpoint": endpoint})
+    
+    span = trace.get_current_span()
+    span.set_attribute("admission.wait_ms", round(waited * 1000, 3))
+    span.set_attribute("admission.limit", int(limiter.limit))
+    span.set_attribute("admission.rejected", rejected is not None)
+    
+    if rejected is not None:
+        retry_after = limiter.retry_after()
+        span.set_attribute("admission.reason", rejected)
+        todo_app.shed_requests_counter.add(1, {"endpoint": endpoint, "reason": rejected})
+        response = jsonify({"error": "Servidor sobrecarregado, tente novamente", "retry_after": retry_after})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+    
+    g.admission_wait = waited
+    g.admission_limiter = limiter
+    g.admission_started = time.monotonic()
+    return None
+
+@app.teardown_request
+def admission_release(exc):
+    """Libera a vaga do controle de admissão e alimenta o ajuste do limite"""
+    limiter = g.pop('admission_limiter', None)
+    if limiter is not None:
+        # As rotas tratam as próprias exceções e respondem 500/504: o status decide o sucesso
+        status = g.get('response_status')
+        success = exc is None and status is not None and status < 500
+        limiter.release(time.monotonic() - g.admission_started, success=success)
+
+@app.teardown_request
+def finish_deadline(exc):
+    """Registra no span quanto do prazo sobrou"""
+    deadline = g.get('deadline')
+    if deadline is not None:
+        span = trace.get_current_span()
+        span.set_attribute("deadline.remaining_ms", round(deadline.remaining() * 1000, 3))
+        span.set_attribute("deadline.exceeded", deadline.expired())
+
+def is_deadline_error(e):
+    """Prazo estourado: no app, no backend de armazenamento ou na espera de um lote"""
+    return isinstance(e, DeadlineExceeded) or (isinstance(e, TimeoutError) and g.deadline.expired())
+
+def error_response(e, operation):
+    """Resposta de erro das rotas: 504 quando o prazo da requisição acabou, senão 500"""
+    if is_deadline_error(e):
+        todo_app.deadline_exceeded_counter.add(1, {"operation": operation})
+        return jsonify({"error": "Tempo limite da requisição excedido"}), 504
+    return jsonify({"error": "Erro interno do servidor"}), 500
 
 @app.after_request
 def after_request(response):
     """Middleware para capturar fim das requisições"""
-    duration = time.time() - request.start_time
+    g.response_status = response.status_code
+    duration = todo_app.request_metrics.finish(
+        g.request_started_ns, request.method, request.endpoint, response.status_code, request.path
+    )
     
-    # Registrar tempo de resposta
-    todo_app.response_time_histogram.record(duration, {
-        "method": request.method,
-        "status_code": str(response.status_code),
-        "endpoint": request.endpoint or "unknown"
-    })
+    if todo_app.server_timing:
+        queue_time = g.get('admission_wait', 0.0)
+        db_time = g.get('db_seconds', 0.0)
+        response.headers["Server-Timing"] = format_server_timing({
+            "queue": queue_time,
+            "app": max(duration - queue_time - db_time, 0.0),
+            "db": db_time,
+            "total": duration,
+        })
     
-    # Log da requisição
-    todo_app.logger.info(
-        f"{request.method} {request.path} - {response.status_code} - {duration:.3f}s",
-        extra={
+    if todo_app.traffic_recorder is not None and request.endpoint not in UNRECORDED_ENDPOINTS:
+        todo_app.traffic_recorder.record({
+            "ts": time.time() - duration,
             "method": request.method,
-            "path": request.path,
-            "status_code": response.status_code,
-            "duration": duration,
-            "user_agent": request.headers.get('User-Agent', '')
-        }
-    )
-    
+            "path": request.full_path.rstrip('?'),
+            "endpoint": request.endpoint or "unknown",
+            "body": request.get_json(silent=True),
+            "status": response.status_code,
+            "latency_ms": round(duration * 1000, 3),
+            "created_id": g.get('created_task_id')
+        })
+    return response
+
+@app.after_request
+def mark_recent_write(response):
+    """Read-your-writes: após uma escrita o cliente lê do primário por alguns segundos"""
+    if (todo_app.read_your_writes_window and request.endpoint in WRITE_ENDPOINTS
+            and response.status_code < 400):
+        response.set_cookie(
+            RECENT_WRITE_COOKIE, "1",
+            max_age=todo_app.read_your_writes_window, httponly=True, samesite="Lax"
+        )
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Comprime respostas JSON grandes conforme o Accept-Encoding"""
+    response_compressor.apply(response, request.accept_encodings)
     return response
 
 @app.route('/')
 def index():
-    """Página principal"""
-    return render_template_string(HTML_TEMPLATE)
+    """Página principal (servida do buffer pré-renderizado)"""
+    if request.if_none_match.contains_weak(index_page.etag):
+        response = app.response_class(status=304)
+    else:
+        encoding, body = index_page.select(request.accept_encodings)
+        response = app.response_class(body, mimetype=index_page.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+    
+    response.set_etag(index_page.etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
 
 @app.route('/api/tasks', methods=['GET'])
 def get_tasks():
@@ -314,31 +661,83 @@ def get_tasks():
     with todo_app.tracer.start_as_current_span("get_tasks") as span:
         with todo_app.profiler.tag_wrapper({"operation": "list_tasks"}):
             try:
-                with todo_app.get_db_connection() as conn:
-                    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                        cur.execute("SELECT * FROM tasks ORDER BY created_at DESC")
-                        tasks = cur.fetchall()
-                        
-                        # Converter datetime para string
-                        for task in tasks:
-                            if task['created_at']:
-                                task['created_at'] = task['created_at'].isoformat()
-                            if task['updated_at']:
-                                task['updated_at'] = task['updated_at'].isoformat()
+                tasks = task_reader().list_tasks(deadline=g.deadline)
                 
                 todo_app.db_operations_counter.add(1, {"operation": "select", "table": "tasks"})
                 span.set_attribute("tasks_count", len(tasks))
                 span.set_attribute("success", True)
                 
                 todo_app.logger.info(f"Listadas {len(tasks)} tarefas")
-                return jsonify(tasks)
+                return json_response(encode_tasks(tasks))
                 
             except Exception as e:
                 span.set_attribute("success", False)
                 span.set_attribute("error", str(e))
                 todo_app.error_counter.add(1, {"operation": "get_tasks", "error_type": "database"})
                 todo_app.logger.error(f"Erro ao listar tarefas: {e}")
-                return jsonify({"error": "Erro interno do servidor"}), 500
+                return error_response(e, "get_tasks")
+
+@app.route('/api/tasks/search', methods=['GET'])
+def search_tasks():
+    """Buscar tarefas pelo título (full-text, ordenado por relevância)"""
+    with todo_app.tracer.start_as_current_span("search_tasks") as span:
+        with todo_app.profiler.tag_wrapper({"operation": "search_tasks"}):
+            query = request.args.get('q', '')
+            if not search_terms(query):
+                span.set_attribute("success", False)
+                span.set_attribute("error", "missing_query")
+                return jsonify({"error": "Parâmetro q é obrigatório"}), 400
+            
+            limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+            offset = max(request.args.get('offset', 0, type=int), 0)
+            span.set_attribute("search.query", query)
+            span.set_attribute("search.limit", limit)
+            span.set_attribute("search.offset", offset)
+            
+            try:
+                start = time.perf_counter()
+                # Uma linha a mais indica se existe próxima página
+                tasks = task_reader().search_tasks(query, limit + 1, offset, deadline=g.deadline)
+                query_ms = (time.perf_counter() - start) * 1000
+                
+                has_more = len(tasks) > limit
+                tasks = tasks[:limit]
+                todo_app.db_operations_counter.add(1, {"operation": "search", "table": "tasks"})
+                span.set_attribute("search.query_ms", round(query_ms, 3))
+                span.set_attribute("tasks_count", len(tasks))
+                span.set_attribute("success", True)
+                
+                next_offset = offset + limit if has_more else "null"
+                return json_response(
+                    f'{{"tasks":{encode_tasks(tasks)},"limit":{limit},"offset":{offset},"next_offset":{next_offset}}}'
+                )
+                
+            except Exception as e:
+                span.set_attribute("success", False)
+                span.set_attribute("error", str(e))
+                todo_app.error_counter.add(1, {"operation": "search_tasks", "error_type": "database"})
+                todo_app.logger.error(f"Erro ao buscar tarefas: {e}")
+                return error_response(e, "search_tasks")
+
+@app.route('/api/tasks/stream')
+def stream_tasks():
+    """Stream SSE com as mudanças das tarefas (created, completed, deleted e reset)"""
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    feed = todo_app.change_feed
+    cursor = feed.last_id if last_event_id is None else last_event_id
+    
+    def generate():
+        yield "retry: 3000\n\n"
+        if last_event_id is None:
+            # Conexão nova: o cliente carrega a lista e aplica os eventos seguintes
+            yield format_sse(ChangeEvent(cursor, "ready", "{}"))
+        for event in feed.subscribe(cursor, heartbeat=todo_app.sse_heartbeat):
+            yield ": ping\n\n" if event is None else format_sse(event)
+    
+    response = app.response_class(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 @app.route('/api/tasks', methods=['POST'])
 def create_task():
@@ -354,36 +753,39 @@ def create_task():
                     span.set_attribute("error", "missing_title")
                     return jsonify({"error": "Título é obrigatório"}), 400
                 
-                with todo_app.get_db_connection() as conn:
-                    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                        cur.execute(
-                            "INSERT INTO tasks (title) VALUES (%s) RETURNING *",
-                            (title,)
-                        )
-                        task = cur.fetchone()
-                        conn.commit()
+                if todo_app.write_coalescer is not None:
+                    # Entra no próximo lote e espera o commit dele
+                    future = todo_app.write_coalescer.submit((title, span.get_span_context()), g.deadline)
+                    try:
+                        task = future.result(timeout=g.deadline.remaining())
+                    except TimeoutError:
+                        if future.cancel():
+                            raise
+                        # O lote já está gravando com um prazo que não passa do desta
+                        # requisição: espera o desfecho para não responder 504 com a linha gravada
+                        task = future.result()
+                    span.set_attribute("write_coalesced", True)
+                else:
+                    task = todo_app.storage.create_task(title, deadline=g.deadline)
                 
+                task_id = g.created_task_id = task[0]
                 todo_app.db_operations_counter.add(1, {"operation": "insert", "table": "tasks"})
                 todo_app.tasks_counter.add(1, {"operation": "created"})
-                span.set_attribute("task_id", task['id'])
+                span.set_attribute("task_id", task_id)
                 span.set_attribute("success", True)
                 
-                todo_app.logger.info(f"Tarefa criada: {task['id']} - {title}")
+                todo_app.logger.info(f"Tarefa criada: {task_id} - {title}")
                 
-                # Converter datetime para string
-                if task['created_at']:
-                    task['created_at'] = task['created_at'].isoformat()
-                if task['updated_at']:
-                    task['updated_at'] = task['updated_at'].isoformat()
-                
-                return jsonify(task), 201
+                body = encode_task(task)
+                todo_app.publish_task_event("created", body)
+                return json_response(body, 201)
                 
             except Exception as e:
                 span.set_attribute("success", False)
                 span.set_attribute("error", str(e))
                 todo_app.error_counter.add(1, {"operation": "create_task", "error_type": "database"})
                 todo_app.logger.error(f"Erro ao criar tarefa: {e}")
-                return jsonify({"error": "Erro interno do servidor"}), 500
+                return error_response(e, "create_task")
 
 @app.route('/api/tasks/<int:task_id>/complete', methods=['POST'])
 def complete_task(task_id):
@@ -391,19 +793,12 @@ def complete_task(task_id):
     with todo_app.tracer.start_as_current_span("complete_task") as span:
         with todo_app.profiler.tag_wrapper({"operation": "complete_task"}):
             try:
-                with todo_app.get_db_connection() as conn:
-                    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                        cur.execute(
-                            "UPDATE tasks SET completed = true, updated_at = CURRENT_TIMESTAMP WHERE id = %s RETURNING *",
-                            (task_id,)
-                        )
-                        task = cur.fetchone()
-                        conn.commit()
-                        
-                        if not task:
-                            span.set_attribute("success", False)
-                            span.set_attribute("error", "task_not_found")
-                            return jsonify({"error": "Tarefa não encontrada"}), 404
+                task = todo_app.storage.complete_task(task_id, deadline=g.deadline)
+                
+                if not task:
+                    span.set_attribute("success", False)
+                    span.set_attribute("error", "task_not_found")
+                    return jsonify({"error": "Tarefa não encontrada"}), 404
                 
                 todo_app.db_operations_counter.add(1, {"operation": "update", "table": "tasks"})
                 todo_app.completed_tasks_counter.add(1, {"operation": "completed"})
@@ -412,20 +807,16 @@ def complete_task(task_id):
                 
                 todo_app.logger.info(f"Tarefa completada: {task_id}")
                 
-                # Converter datetime para string
-                if task['created_at']:
-                    task['created_at'] = task['created_at'].isoformat()
-                if task['updated_at']:
-                    task['updated_at'] = task['updated_at'].isoformat()
-                
-                return jsonify(task)
+                body = encode_task(task)
+                todo_app.publish_task_event("completed", body)
+                return json_response(body)
                 
             except Exception as e:
                 span.set_attribute("success", False)
                 span.set_attribute("error", str(e))
                 todo_app.error_counter.add(1, {"operation": "complete_task", "error_type": "database"})
                 todo_app.logger.error(f"Erro ao completar tarefa {task_id}: {e}")
-                return jsonify({"error": "Erro interno do servidor"}), 500
+                return error_response(e, "complete_task")
 
 @app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
@@ -433,22 +824,17 @@ def delete_task(task_id):
     with todo_app.tracer.start_as_current_span("delete_task") as span:
         with todo_app.profiler.tag_wrapper({"operation": "delete_task"}):
             try:
-                with todo_app.get_db_connection() as conn:
-                    with conn.cursor() as cur:
-                        cur.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
-                        
-                        if cur.rowcount == 0:
-                            span.set_attribute("success", False)
-                            span.set_attribute("error", "task_not_found")
-                            return jsonify({"error": "Tarefa não encontrada"}), 404
-                        
-                        conn.commit()
+                if not todo_app.storage.delete_task(task_id, deadline=g.deadline):
+                    span.set_attribute("success", False)
+                    span.set_attribute("error", "task_not_found")
+                    return jsonify({"error": "Tarefa não encontrada"}), 404
                 
                 todo_app.db_operations_counter.add(1, {"operation": "delete", "table": "tasks"})
                 span.set_attribute("task_id", task_id)
                 span.set_attribute("success", True)
                 
                 todo_app.logger.info(f"Tarefa deletada: {task_id}")
+                todo_app.publish_task_event("deleted", f'{{"id":{task_id}}}')
                 return jsonify({"message": "Tarefa deletada com sucesso"})
                 
             except Exception as e:
@@ -456,7 +842,7 @@ def delete_task(task_id):
                 span.set_attribute("error", str(e))
                 todo_app.error_counter.add(1, {"operation": "delete_task", "error_type": "database"})
                 todo_app.logger.error(f"Erro ao deletar tarefa {task_id}: {e}")
-                return jsonify({"error": "Erro interno do servidor"}), 500
+                return error_response(e, "delete_task")
 
 @app.route('/api/simulate-error/<error_type>', methods=['POST'])
 def simulate_error(error_type):
@@ -467,13 +853,11 @@ def simulate_error(error_type):
         try:
             if error_type == "db":
                 # Simular erro de banco de dados
-                with todo_app.get_db_connection() as conn:
-                    with conn.cursor() as cur:
-                        cur.execute("SELECT * FROM tabela_inexistente")
+                todo_app.storage.execute("SELECT * FROM tabela_inexistente", deadline=g.deadline)
                         
             elif error_type == "timeout":
-                # Simular timeout
-                time.sleep(10)
+                # Simular timeout (interrompido quando o prazo da requisição acaba)
+                g.deadline.sleep(10)
                 return jsonify({"message": "Não deveria chegar aqui"})
                 
             elif error_type == "500":
@@ -483,7 +867,7 @@ def simulate_error(error_type):
             elif error_type == "slow":
                 # Simular operação lenta
                 with todo_app.profiler.tag_wrapper({"operation": "slow_operation"}):
-                    time.sleep(random.uniform(2, 5))
+                    g.deadline.sleep(random.uniform(2, 5))
                     span.set_attribute("slow_operation", True)
                     span.set_attribute("sleep_time", 3)
                     todo_app.logger.warning("Operação lenta simulada")
@@ -501,29 +885,37 @@ def simulate_error(error_type):
                 "simulated": "true"
             })
             todo_app.logger.error(f"Erro simulado ({error_type}): {e}")
+            if is_deadline_error(e):
+                return error_response(e, "simulate_error")
             return jsonify({"error": f"Erro simulado: {str(e)}"}), 500
 
 @app.route('/health')
 def health_check():
-    """Health check para monitoramento"""
-    try:
-        # Testar conexão com banco
-        with todo_app.get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT 1")
-        
-        return jsonify({
-            "status": "healthy",
-            "timestamp": datetime.now().isoformat(),
-            "service": "todo-app"
-        })
-    except Exception as e:
-        todo_app.logger.error(f"Health check falhou: {e}")
+    """Liveness: responde a partir do estado do processo, sem I/O"""
+    if not todo_app.health_monitor.is_alive():
         return jsonify({
-            "status": "unhealthy", 
-            "error": str(e),
+            "status": "unhealthy",
+            "error": "health monitor parado",
             "timestamp": datetime.now().isoformat()
         }), 503
+    
+    return jsonify({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "service": "todo-app",
+        "uptime_seconds": round(time.time() - todo_app.health_monitor.started_at, 1)
+    })
+
+@app.route('/ready')
+def readiness_check():
+    """Readiness: último resultado do probe em background + saturação do pool e dos exportadores"""
+    ready, details = todo_app.health_monitor.readiness()
+    details.update({
+        "status": "ready" if ready else "not_ready",
+        "timestamp": datetime.now().isoformat(),
+        "service": "todo-app"
+    })
+    return jsonify(details), 200 if ready else 503
 
 if __name__ == '__main__':
     # Configurar nível de log
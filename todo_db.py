@@ -0,0 +1,527 @@
+"""
+Utilitários de acesso ao PostgreSQL usados pela To-Do App.
+
+Este módulo não configura observabilidade nem abre conexões ao ser importado,
+então pode ser usado por scripts de benchmark sem subir a aplicação inteira.
+"""
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from json.encoder import encode_basestring_ascii
+
+from psycopg2 import extensions, pool
+
+
+def db_config_from_env():
+    """Parâmetros de conexão a partir das variáveis de ambiente DB_*"""
+    return {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'database': os.environ.get('DB_NAME', 'todoapp'),
+        'user': os.environ.get('DB_USER', 'todouser'),
+        'password': os.environ.get('DB_PASSWORD', 'todopass'),
+        'port': os.environ.get('DB_PORT', '5432'),
+        'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5'))
+    }
+
+
+# Layout fixo das linhas de tasks: toda query de tarefas retorna tuplas nesta ordem
+TASK_COLUMNS = ("id", "title", "completed", "created_at", "updated_at")
+
+# Lista de colunas para SELECT/RETURNING. Os timestamps já saem formatados pelo
+# PostgreSQL (ISO 8601, como datetime.isoformat()), evitando conversões em Python.
+TASK_SELECT_LIST = (
+    "id, title, completed, "
+    "to_char(created_at, 'YYYY-MM-DD\"T\"HH24:MI:SS.US') AS created_at, "
+    "to_char(updated_at, 'YYYY-MM-DD\"T\"HH24:MI:SS.US') AS updated_at"
+)
+
+# Template JSON de uma tarefa, gerado uma única vez a partir do layout
+_TASK_JSON_TEMPLATE = "{" + ",".join(f'"{column}":%s' for column in TASK_COLUMNS) + "}"
+_JSON_LITERALS = {True: "true", False: "false", None: "null"}
+
+
+def _encode_optional_str(value):
+    return "null" if value is None else encode_basestring_ascii(value)
+
+
+def encode_task(row):
+    """Serializa uma linha de tasks (tupla no layout TASK_COLUMNS) em JSON"""
+    task_id, title, completed, created_at, updated_at = row
+    return _TASK_JSON_TEMPLATE % (
+        task_id,
+        encode_basestring_ascii(title),
+        _JSON_LITERALS[completed],
+        _encode_optional_str(created_at),
+        _encode_optional_str(updated_at),
+    )
+
+
+def encode_tasks(rows):
+    """Serializa uma lista de linhas de tasks em um array JSON"""
+    return "[" + ",".join(map(encode_task, rows)) + "]"
+
+
+# Statements quentes das rotas de tarefas: nome -> (SQL com $n, tipos dos parâmetros).
+# O ORDER BY usa tasks.created_at qualificado porque created_at sozinho se refere
+# ao alias formatado (texto) da lista de colunas, o que impede o uso do índice.
+TASK_STATEMENTS = {
+    "tasks_list": (
+        f"SELECT {TASK_SELECT_LIST} FROM tasks ORDER BY tasks.created_at DESC",
+        (),
+    ),
+    "tasks_insert": (
+        f"INSERT INTO tasks (title) VALUES ($1) RETURNING {TASK_SELECT_LIST}",
+        ("varchar",),
+    ),
+    "tasks_complete": (
+        "UPDATE tasks SET completed = true, updated_at = CURRENT_TIMESTAMP "
+        f"WHERE id = $1 RETURNING {TASK_SELECT_LIST}",
+        ("integer",),
+    ),
+    # Insert em lote: a ordem do array define a ordem dos ids gerados
+    "tasks_insert_batch": (
+        "INSERT INTO tasks (title) "
+        "SELECT title FROM unnest($1::varchar[]) WITH ORDINALITY AS batch(title, position) "
+        f"ORDER BY position RETURNING {TASK_SELECT_LIST}",
+        ("varchar[]",),
+    ),
+    "tasks_delete": (
+        "DELETE FROM tasks WHERE id = $1",
+        ("integer",),
+    ),
+    # Busca textual pelo índice GIN de search_vector; $1 vem de build_search_query
+    "tasks_search": (
+        f"SELECT {TASK_SELECT_LIST} FROM tasks "
+        "WHERE search_vector @@ to_tsquery('simple', $1) "
+        "ORDER BY ts_rank(search_vector, to_tsquery('simple', $1)) DESC, tasks.id DESC "
+        "LIMIT $2 OFFSET $3",
+        ("text", "integer", "integer"),
+    ),
+}
+
+
+def search_terms(text):
+    """Termos de busca do texto digitado: apenas letras e dígitos, em minúsculas"""
+    return re.findall(r"[^\W_]+", text.lower())
+
+
+def build_search_query(text):
+    """
+    Converte o texto digitado em um tsquery de prefixos ("com pag" -> "com:* & pag:*").
+
+    Como só sobram letras e dígitos o resultado é sempre um tsquery válido;
+    retorna None quando não sobra nenhum termo.
+    """
+    return " & ".join(f"{term}:*" for term in search_terms(text)) or None
+
+
+# Chave do advisory lock que serializa migrações entre processos
+MIGRATION_LOCK_ID = 7316001
+
+# Migrações versionadas, aplicadas em ordem e registradas em schema_migrations
+MIGRATIONS = (
+    (1, "create tasks table", """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id SERIAL PRIMARY KEY,
+            title VARCHAR(255) NOT NULL,
+            completed BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """),
+    (2, "index tasks by created_at", """
+        CREATE INDEX IF NOT EXISTS tasks_created_at_idx ON tasks (created_at DESC)
+    """),
+    (3, "partial index on open tasks", """
+        CREATE INDEX IF NOT EXISTS tasks_open_created_at_idx ON tasks (created_at DESC) WHERE NOT completed
+    """),
+    # Coluna gerada: o PostgreSQL mantém o tsvector atualizado em todo INSERT/UPDATE
+    (4, "full-text search on title", """
+        ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple', title)) STORED;
+        CREATE INDEX IF NOT EXISTS tasks_search_idx ON tasks USING GIN (search_vector)
+    """),
+)
+
+# Queries quentes e o índice que cada uma deve usar: nome -> (SQL, índice esperado)
+HOT_QUERY_INDEXES = {
+    "tasks_list": (TASK_STATEMENTS["tasks_list"][0], "tasks_created_at_idx"),
+    "tasks_open": (
+        f"SELECT {TASK_SELECT_LIST} FROM tasks WHERE NOT completed ORDER BY tasks.created_at DESC",
+        "tasks_open_created_at_idx",
+    ),
+    "tasks_open_count": (
+        "SELECT COUNT(*) FROM tasks WHERE NOT completed",
+        "tasks_open_created_at_idx",
+    ),
+    "tasks_search": (
+        TASK_STATEMENTS["tasks_search"][0]
+        .replace("$1", "'tarefa:*'").replace("$2", "20").replace("$3", "0"),
+        "tasks_search_idx",
+    ),
+}
+
+
+def run_migrations(conn):
+    """
+    Aplica as migrações pendentes e retorna as versões aplicadas.
+
+    Quando o schema já está atualizado retorna sem pegar lock nenhum; caso
+    contrário um advisory lock de transação garante que só um processo migra
+    por vez e os demais apenas esperam e encontram tudo aplicado.
+    """
+    latest = MIGRATIONS[-1][0]
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        if cur.fetchone()[0]:
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+            if cur.fetchone()[0] >= latest:
+                conn.commit()
+                return []
+
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in cur.fetchall()}
+
+        applied = []
+        for version, description, sql in MIGRATIONS:
+            if version in done:
+                continue
+            cur.execute(sql)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+            applied.append(version)
+    # O commit libera o advisory lock
+    conn.commit()
+    return applied
+
+
+def _plan_indexes(plan):
+    """Coleta os nomes de índices usados em um plano do EXPLAIN (FORMAT JSON)"""
+    indexes = set()
+    if "Index Name" in plan:
+        indexes.add(plan["Index Name"])
+    for child in plan.get("Plans", ()):
+        indexes |= _plan_indexes(child)
+    return indexes
+
+
+def explain_hot_queries(conn):
+    """
+    Roda EXPLAIN nas queries quentes e verifica se usam o índice esperado.
+
+    Scans sequenciais são desligados na transação para que o resultado não
+    dependa do tamanho atual da tabela: o que se verifica é que o índice
+    existe e é utilizável pela query.
+
+    :return: dict nome -> {"expected", "used", "ok"}
+    """
+    report = {}
+    with conn.cursor() as cur:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for name, (sql, expected) in HOT_QUERY_INDEXES.items():
+            cur.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cur.fetchone()[0][0]["Plan"]
+            used = sorted(_plan_indexes(plan))
+            report[name] = {"expected": expected, "used": used, "ok": expected in used}
+    conn.rollback()
+    return report
+
+
+class PooledConnection(extensions.connection):
+    """Conexão que lembra quais statements já foram preparados nesta sessão."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
+class StatementRegistry:
+    """
+    Registro de statements preparados no servidor (PREPARE/EXECUTE).
+
+    Cada statement é preparado uma única vez por conexão, na primeira vez em
+    que é usado nela, e depois executado pelo nome, evitando que o PostgreSQL
+    refaça parse e planejamento a cada requisição.
+    """
+    def __init__(self, statements=None, prepare_counter=None, execute_counter=None):
+        self.prepare_counter = prepare_counter
+        self.execute_counter = execute_counter
+        self._statements = {}
+        for name, (sql, param_types) in (statements or {}).items():
+            self.register(name, sql, param_types)
+
+    def register(self, name, sql, param_types=()):
+        """
+        Registra um statement.
+
+        :param sql: SQL com parâmetros posicionais $1, $2, ...
+        :param param_types: tipos PostgreSQL dos parâmetros, na ordem
+        """
+        types = f" ({', '.join(param_types)})" if param_types else ""
+        placeholders = f" ({', '.join(['%s'] * len(param_types))})" if param_types else ""
+        self._statements[name] = {
+            "prepare": f"PREPARE {name}{types} AS {sql}",
+            "execute": f"EXECUTE {name}{placeholders}",
+            # Fallback para conexões que não rastreiam statements preparados: cada $n
+            # vira um %s e "order" diz qual parâmetro vai em cada um ($1 pode se repetir)
+            "plain": re.sub(r"\$\d+", "%s", sql.replace("%", "%%")),
+            "order": tuple(int(n) - 1 for n in re.findall(r"\$(\d+)", sql)),
+            "attributes": {"statement": name},
+        }
+
+    def execute(self, cur, name, params=(), timeout_ms=None):
+        """
+        Executa o statement pelo nome, preparando-o na conexão se necessário.
+
+        :param timeout_ms: statement_timeout aplicado na transação atual; vai no
+            mesmo round-trip da execução
+        """
+        statement = self._statements[name]
+        prepared = getattr(cur.connection, "prepared_statements", None)
+
+        if prepared is None:
+            sql = statement["plain"]
+            params = tuple(params[i] for i in statement["order"])
+        else:
+            sql = statement["execute"]
+
+        prefix = ""
+        if timeout_ms is not None:
+            prefix = "SET LOCAL statement_timeout = %s; "
+            params = (int(timeout_ms),) + tuple(params)
+
+        if prepared is None:
+            cur.execute(prefix + sql, params)
+            return
+
+        if name not in prepared:
+            cur.execute(statement["prepare"])
+            prepared.add(name)
+            if self.prepare_counter is not None:
+                self.prepare_counter.add(1, statement["attributes"])
+
+        cur.execute(prefix + sql, params)
+        if self.execute_counter is not None:
+            self.execute_counter.add(1, statement["attributes"])
+
+
+class WriteCoalescer:
+    """
+    Agrupa escritas concorrentes em lotes (group commit).
+
+    Cada requisição entrega seu item e espera um Future; threads de flush juntam
+    os itens que chegam dentro de `max_delay` segundos (até `max_batch`) e os
+    gravam com uma única chamada a `flush`, em uma transação e um commit.
+
+    Cada item pode trazer o Deadline da requisição: itens com prazo esgotado
+    antes do flush falham com DeadlineExceeded e o lote é gravado com o prazo
+    mais curto entre os restantes, então nenhuma requisição espera (nem recebe
+    504 com a linha gravada depois) além do próprio prazo.
+
+    :param flush: função que recebe a lista de itens e o `deadline` do lote e
+        retorna os resultados na mesma ordem
+    :param max_delay: espera máxima adicionada para formar um lote
+    :param on_batch: callback opcional chamado com o tamanho de cada lote
+    """
+    def __init__(self, flush, max_batch=64, max_delay=0.002, workers=2, on_batch=None):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.on_batch = on_batch
+        self._queue = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"write-coalescer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item, deadline=None):
+        """Enfileira um item e retorna o Future com o resultado da gravação"""
+        future = Future()
+        self._queue.put((item, future, deadline))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        window_end = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = window_end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Requisições que desistiram (prazo esgotado) antes do flush ficam de fora
+        live = []
+        for item, future, deadline in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            if deadline is not None and deadline.expired():
+                try:
+                    deadline.check()
+                except Exception as e:
+                    future.set_exception(e)
+                continue
+            live.append((item, future, deadline))
+        return live
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+            if self.on_batch is not None:
+                self.on_batch(len(batch))
+            deadlines = [deadline for _, _, deadline in batch if deadline is not None]
+            deadline = min(deadlines, key=lambda d: d.expires_at) if deadlines else None
+            try:
+                results = self.flush([item for item, _, _ in batch], deadline=deadline)
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Lote de {len(batch)} itens gravou {len(results)} resultados")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão do pool ficou disponível dentro do tempo limite."""
+
+
+class ConnectionPool:
+    """
+    Pool de conexões limitado, seguro para threads.
+
+    O ThreadedConnectionPool do psycopg2 lança PoolError imediatamente quando
+    todas as conexões estão em uso; aqui um semáforo faz a requisição esperar
+    (com tempo limite) por uma conexão livre, e os contadores de uso alimentam
+    o endpoint de readiness.
+    """
+    def __init__(self, minconn, maxconn, acquire_timeout=5.0, **db_config):
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        db_config.setdefault("connection_factory", PooledConnection)
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **db_config)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+
+    def acquire(self, timeout=None):
+        """
+        Retira uma conexão do pool.
+
+        :param timeout: segundos de espera por uma conexão livre (padrão: acquire_timeout)
+        :raises: PoolTimeout se nenhuma conexão ficar livre a tempo
+        """
+        if timeout is None:
+            timeout = self.acquire_timeout
+
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=max(timeout, 0))
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        if not acquired:
+            raise PoolTimeout(f"Nenhuma conexão livre no pool após {timeout:.3f}s")
+
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+        return conn
+
+    def release(self, conn):
+        """Devolve a conexão ao pool, descartando-a se estiver fechada."""
+        try:
+            self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager que empresta uma conexão do pool.
+
+        Mantém a semântica de `with conn:` do psycopg2 (commit ao sair sem erro,
+        rollback em caso de exceção) e sempre devolve a conexão ao pool.
+        """
+        conn = self.acquire(timeout)
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """Retorna o estado atual do pool (sem I/O)."""
+        with self._lock:
+            in_use = self._in_use
+            waiting = self._waiting
+        return {
+            "in_use": in_use,
+            "max": self.maxconn,
+            "waiting": waiting,
+            "saturation": in_use / self.maxconn if self.maxconn else 1.0,
+        }
+
+    def close(self):
+        """Fecha todas as conexões do pool."""
+        self._pool.closeall()
+
+
+def main():
+    import argparse
+    import sys
+
+    import psycopg2
+
+    parser = argparse.ArgumentParser(description="Manutenção do schema da To-Do App")
+    parser.add_argument("command", choices=["migrate", "explain"],
+                        help="migrate: aplica migrações pendentes; explain: verifica índices das queries quentes")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**db_config_from_env())
+    try:
+        if args.command == "migrate":
+            applied = run_migrations(conn)
+            print(f"Migrações aplicadas: {applied or 'nenhuma (schema atualizado)'}")
+        else:
+            report = explain_hot_queries(conn)
+            for name, result in report.items():
+                status = "OK" if result["ok"] else "FALHOU"
+                print(f"{status:>6} {name}: esperado {result['expected']}, usado {result['used'] or 'nenhum índice'}")
+            if not all(result["ok"] for result in report.values()):
+                sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Feed de mudanças das tarefas (created/completed/deleted) para a To-Do App.
+
+As rotas de escrita publicam eventos no ChangeFeed do processo e o endpoint
+/api/tasks/stream os entrega às páginas abertas via Server-Sent Events. Com
+vários workers, o PostgresChangeBridge distribui os eventos por LISTEN/NOTIFY
+para que todos os feeds recebam as mesmas mudanças.
+
+Assim como todo_db.py, não tem efeitos colaterais na importação.
+"""
+import itertools
+import logging
+import select
+import threading
+import time
+from collections import deque, namedtuple
+
+ChangeEvent = namedtuple("ChangeEvent", "id type data")
+
+# Evento enviado quando o cliente perdeu mudanças e precisa recarregar a lista
+RESET_EVENT_TYPE = "reset"
+
+
+def format_sse(event):
+    """Serializa um ChangeEvent no formato text/event-stream"""
+    return f"id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n"
+
+
+class ChangeFeed:
+    """
+    Distribui eventos de mudança para os assinantes do processo.
+
+    Os eventos ficam em um buffer circular com ids sequenciais: cada assinante
+    guarda apenas o id do último evento que recebeu e lê os seguintes direto do
+    buffer, então publicar custa o mesmo com 1 ou 1000 abas abertas. Quem se
+    atrasa mais do que o buffer (ou reconecta com um Last-Event-ID desconhecido)
+    recebe um evento `reset` e recarrega a lista completa.
+
+    :param history: eventos mantidos para retomar conexões (Last-Event-ID)
+    """
+    def __init__(self, history=1000):
+        self._events = deque(maxlen=history)
+        self._last_id = 0
+        self._subscribers = 0
+        self._cond = threading.Condition()
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def publish(self, event_type, data):
+        """
+        Publica um evento e acorda os assinantes.
+
+        :param data: payload já serializado em JSON (uma linha)
+        """
+        with self._cond:
+            self._last_id += 1
+            event = ChangeEvent(self._last_id, event_type, data)
+            self._events.append(event)
+            self._cond.notify_all()
+        return event
+
+    def _since(self, cursor):
+        """Eventos após `cursor`, ou None se o cursor não pode ser retomado"""
+        if cursor > self._last_id:
+            return None
+        if not self._events or cursor == self._last_id:
+            return []
+        first_id = self._events[0].id
+        if cursor < first_id - 1:
+            return None
+        return list(itertools.islice(self._events, cursor - first_id + 1, None))
+
+    def subscribe(self, last_event_id=None, heartbeat=15.0, stop=None):
+        """
+        Gera eventos a partir de `last_event_id` (ou a partir de agora).
+
+        A cada `heartbeat` segundos sem eventos gera None, para que a conexão
+        seja mantida (ou o cliente desconectado seja detectado na escrita).
+
+        :param stop: threading.Event opcional que encerra o gerador
+        """
+        with self._cond:
+            cursor = self._last_id if last_event_id is None else last_event_id
+            self._subscribers += 1
+        try:
+            while stop is None or not stop.is_set():
+                with self._cond:
+                    pending = self._since(cursor)
+                    if pending == []:
+                        self._cond.wait(heartbeat)
+                        pending = self._since(cursor)
+                    last_id = self._last_id
+
+                if pending is None:
+                    cursor = last_id
+                    yield ChangeEvent(last_id, RESET_EVENT_TYPE, "{}")
+                elif not pending:
+                    yield None
+                else:
+                    for event in pending:
+                        cursor = event.id
+                        yield event
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+    def reset(self):
+        """Avisa os assinantes que mudanças podem ter sido perdidas"""
+        return self.publish(RESET_EVENT_TYPE, "{}")
+
+
+class PostgresChangeBridge:
+    """
+    Sincroniza o ChangeFeed de vários workers via LISTEN/NOTIFY.
+
+    `publish` envia o evento com pg_notify (em uma conexão do pool) em vez de
+    publicá-lo localmente; uma thread por processo escuta o canal em uma
+    conexão dedicada e publica no feed local tudo que chega, inclusive os
+    eventos do próprio worker. Se a conexão de escuta cai, o feed recebe um
+    `reset` ao reconectar, já que notificações podem ter sido perdidas.
+
+    Os ids dos eventos são locais a cada processo: um cliente que reconecta em
+    outro worker recebe `reset` em vez de retomar pelo Last-Event-ID.
+    """
+    # O payload de NOTIFY é limitado a 8000 bytes
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, feed, pool, db_config, channel="task_changes", poll_interval=5.0):
+        self.feed = feed
+        self.pool = pool
+        self.db_config = db_config
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger(__name__)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="task-changes-listener", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def publish(self, event_type, data):
+        payload = f"{event_type} {data}"
+        if len(payload.encode("utf-8")) > self.MAX_PAYLOAD:
+            # Grande demais para NOTIFY: os outros workers recarregam a lista
+            payload = f"{RESET_EVENT_TYPE} {{}}"
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+
+    def _listen(self):
+        import psycopg2
+
+        conn = psycopg2.connect(**self.db_config)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN "{self.channel}"')
+            while not self._stop.is_set():
+                if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    event_type, _, data = notify.payload.partition(" ")
+                    self.feed.publish(event_type, data)
+        finally:
+            conn.close()
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self._listen()
+            except Exception as e:
+                self.logger.error(f"Conexão LISTEN de {self.channel} perdida: {e}")
+            if self._stop.is_set():
+                break
+            self.feed.reset()
+            backoff = 1.0 if time.monotonic() - started > 60 else min(backoff * 2, 30.0)
+            self._stop.wait(backoff)
@@ -0,0 +1,400 @@
+"""
+Utilitários HTTP da To-Do App: páginas pré-comprimidas, compressão de respostas,
+controle de admissão, prazos (deadlines), métricas, Server-Timing e gravação de
+tráfego por requisição.
+
+Assim como todo_db.py, não tem efeitos colaterais na importação e pode ser
+usado diretamente pelos benchmarks.
+"""
+import atexit
+import gzip
+import hashlib
+import json
+import math
+import queue
+import threading
+import time
+from types import MappingProxyType
+
+try:
+    import brotli
+except ImportError:
+    # Brotli é opcional: sem o pacote, apenas gzip é oferecido
+    brotli = None
+
+
+def available_encodings():
+    """Codificações suportadas, em ordem de preferência do servidor"""
+    return ("br", "gzip", "identity") if brotli is not None else ("gzip", "identity")
+
+
+def negotiate_encoding(accept_encodings, available=None):
+    """
+    Escolhe a codificação de conteúdo a partir do Accept-Encoding do cliente.
+
+    :param accept_encodings: objeto Accept do Werkzeug (request.accept_encodings)
+    :param available: codificações disponíveis em ordem de preferência
+    """
+    available = available or available_encodings()
+    return accept_encodings.best_match(available, default="identity") or "identity"
+
+
+def compress(body, encoding, level):
+    """
+    Comprime bytes com a codificação indicada.
+
+    :param level: nível de compressão gzip (1-9); para brotli é convertido em quality
+    """
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level)
+    if encoding == "br":
+        return brotli.compress(body, quality=min(level, 11))
+    return body
+
+
+class PrecompressedPage:
+    """
+    Corpo estático renderizado uma única vez, com variantes já comprimidas
+    e um ETag calculado sobre o conteúdo.
+    """
+    def __init__(self, body, mimetype="text/html; charset=utf-8"):
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        # Conteúdo estático: vale pagar a compressão máxima uma única vez
+        self.variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=11)
+
+    def select(self, accept_encodings):
+        """Retorna (codificação, bytes) da melhor variante para o cliente"""
+        encoding = negotiate_encoding(accept_encodings)
+        return encoding, self.variants[encoding]
+
+
+class ResponseCompressor:
+    """
+    Comprime respostas dinâmicas (ex.: JSON) acima de um tamanho mínimo,
+    respeitando o Accept-Encoding do cliente.
+    """
+    def __init__(self, min_size=1024, level=5, mimetypes=("application/json",)):
+        self.min_size = min_size
+        self.level = level
+        self.mimetypes = frozenset(mimetypes)
+
+    def should_compress(self, response):
+        return (
+            response.mimetype in self.mimetypes
+            and 200 <= response.status_code < 300
+            and not response.direct_passthrough
+            and "Content-Encoding" not in response.headers
+            and (response.content_length or 0) >= self.min_size
+        )
+
+    def apply(self, response, accept_encodings):
+        """Comprime a resposta no lugar, se for elegível; retorna a codificação usada"""
+        if not self.should_compress(response):
+            return "identity"
+
+        encoding = negotiate_encoding(accept_encodings)
+        response.vary.add("Accept-Encoding")
+        if encoding == "identity":
+            return encoding
+
+        response.set_data(compress(response.get_data(), encoding, self.level))
+        response.headers["Content-Encoding"] = encoding
+        return encoding
+
+
+class AdaptiveLimiter:
+    """
+    Limite de concorrência adaptativo (AIMD) com fila de espera limitada.
+
+    Cada requisição concluída dentro da latência alvo aumenta o limite em
+    1/limite (cerca de +1 a cada "janela" de requisições); uma requisição lenta
+    ou com erro o multiplica por `backoff`. Quando o limite e a fila estão
+    cheios a requisição é recusada na hora, em vez de ocupar mais uma thread.
+    """
+    def __init__(self, initial_limit, min_limit=1, max_limit=64, queue_size=32,
+                 max_wait=1.0, latency_target=0.5, backoff=0.9):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.inflight = 0
+        self.waiting = 0
+        self.avg_latency = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """
+        Tenta obter uma vaga de execução.
+
+        :param timeout: espera máxima na fila (limitada por max_wait)
+        :return: (motivo da recusa ou None, segundos de espera na fila)
+        """
+        max_wait = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        with self._cond:
+            if self.inflight < int(self.limit) and self.waiting == 0:
+                self.inflight += 1
+                return None, 0.0
+            if self.waiting >= self.queue_size:
+                return "queue_full", 0.0
+
+            start = time.monotonic()
+            deadline = start + max_wait
+            self.waiting += 1
+            try:
+                while self.inflight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return "queue_timeout", time.monotonic() - start
+                    self._cond.wait(remaining)
+                self.inflight += 1
+                return None, time.monotonic() - start
+            finally:
+                self.waiting -= 1
+
+    def release(self, latency, success=True):
+        """Libera a vaga e ajusta o limite a partir da latência observada"""
+        with self._cond:
+            self.inflight -= 1
+            self.avg_latency = latency if not self.avg_latency else 0.9 * self.avg_latency + 0.1 * latency
+            if not success or latency > self.latency_target:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify()
+
+    def retry_after(self):
+        """Sugestão de Retry-After (segundos) para requisições recusadas"""
+        backlog = (self.waiting + 1) / max(int(self.limit), 1)
+        return max(1, math.ceil(self.avg_latency * backlog))
+
+    def stats(self):
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "avg_latency_ms": round(self.avg_latency * 1000, 2),
+        }
+
+
+class AdmissionController:
+    """
+    Mantém um AdaptiveLimiter por rota (endpoint do Flask).
+
+    :param route_limits: limite máximo por endpoint, ex.: {"simulate_error": 2}
+    :param exempt: endpoints que não passam pelo controle (ex.: probes de saúde)
+    """
+    def __init__(self, default_limit=16, max_limit=64, route_limits=None, exempt=(), **limiter_options):
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+        self.route_limits = dict(route_limits or {})
+        self.exempt = frozenset(exempt)
+        self.limiter_options = limiter_options
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_route_limits(value):
+        """Converte "rota=limite,rota=limite" em dict"""
+        limits = {}
+        for item in filter(None, (part.strip() for part in (value or "").split(","))):
+            route, _, limit = item.partition("=")
+            limits[route.strip()] = int(limit)
+        return limits
+
+    def limiter(self, route):
+        """Retorna o limiter da rota, ou None se a rota é isenta"""
+        if route is None or route in self.exempt:
+            return None
+        limiter = self._limiters.get(route)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(route)
+                if limiter is None:
+                    if route in self.route_limits:
+                        limit = max_limit = self.route_limits[route]
+                    else:
+                        limit, max_limit = self.default_limit, self.max_limit
+                    limiter = AdaptiveLimiter(limit, max_limit=max_limit, **self.limiter_options)
+                    self._limiters[route] = limiter
+        return limiter
+
+    def stats(self):
+        return {route: limiter.stats() for route, limiter in list(self._limiters.items())}
+
+
+class DeadlineExceeded(Exception):
+    """O orçamento de tempo da requisição se esgotou."""
+
+
+class Deadline:
+    """
+    Orçamento de tempo de uma requisição, medido com relógio monotônico.
+
+    É criado no início da requisição e consultado por quem pode bloquear:
+    fila de admissão, pool de conexões, statement_timeout das queries e
+    esperas simuladas.
+    """
+    def __init__(self, budget):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    @classmethod
+    def from_header(cls, value, default, maximum):
+        """
+        Cria o deadline a partir do header do cliente (em milissegundos).
+
+        Valores ausentes, inválidos ou não finitos usam `default`; o cliente pode pedir um
+        prazo menor, mas nunca maior que `maximum` (ambos em segundos).
+        """
+        try:
+            budget = float(value) / 1000 if value else default
+        except ValueError:
+            budget = default
+        if not math.isfinite(budget):
+            # "nan" e "inf" passam pelo float(), mas não são prazos
+            budget = default
+        return cls(min(max(budget, 0.0), maximum))
+
+    def remaining(self):
+        """Segundos restantes (nunca negativo)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self):
+        """Lança DeadlineExceeded se o prazo já passou"""
+        if self.expired():
+            raise DeadlineExceeded(f"Prazo de {self.budget * 1000:.0f}ms excedido")
+
+    def statement_timeout_ms(self):
+        """Tempo restante em ms para usar como statement_timeout (mínimo 1ms)"""
+        self.check()
+        return max(1, int(self.remaining() * 1000))
+
+    def sleep(self, seconds):
+        """Dorme `seconds`, ou até o fim do prazo e então lança DeadlineExceeded"""
+        remaining = self.remaining()
+        if seconds >= remaining:
+            time.sleep(remaining)
+            raise DeadlineExceeded(f"Prazo de {self.budget * 1000:.0f}ms excedido")
+        time.sleep(seconds)
+
+
+class AttributeSets:
+    """
+    Conjuntos de atributos de métricas imutáveis, criados uma única vez por
+    combinação de valores e reutilizados nas requisições seguintes.
+
+    :param keys: nomes dos atributos; os valores são convertidos para str
+    """
+    def __init__(self, *keys):
+        self.keys = keys
+        self._cache = {}
+
+    def get(self, *values):
+        attributes = self._cache.get(values)
+        if attributes is None:
+            attributes = MappingProxyType(dict(zip(self.keys, map(str, values))))
+            attributes = self._cache.setdefault(values, attributes)
+        return attributes
+
+
+class RequestMetrics:
+    """
+    Contador e histograma de duração por requisição, medidos com relógio
+    monotônico em nanossegundos.
+
+    Método, rota e status já vão para o span do FlaskInstrumentor, então só
+    requisições lentas ou com erro 5xx geram log.
+
+    :param slow_threshold: duração (s) a partir da qual a requisição é logada
+    """
+    def __init__(self, counter, histogram, logger, slow_threshold=1.0):
+        self.counter = counter
+        self.histogram = histogram
+        self.logger = logger
+        self.slow_threshold_ns = int(slow_threshold * 1e9)
+        self.request_attributes = AttributeSets("method", "endpoint")
+        self.response_attributes = AttributeSets("method", "status_code", "endpoint")
+
+    def start(self, method, endpoint):
+        """Conta a requisição e retorna o instante de início (perf_counter_ns)"""
+        self.counter.add(1, self.request_attributes.get(method, endpoint or "unknown"))
+        return time.perf_counter_ns()
+
+    def finish(self, started_ns, method, endpoint, status_code, path):
+        """Registra a duração e loga a requisição se for lenta ou 5xx"""
+        elapsed_ns = time.perf_counter_ns() - started_ns
+        duration = elapsed_ns / 1e9
+        self.histogram.record(duration, self.response_attributes.get(method, status_code, endpoint or "unknown"))
+
+        if status_code >= 500 or elapsed_ns >= self.slow_threshold_ns:
+            self.logger.warning(
+                "%s %s - %d - %.3fs", method, path, status_code, duration,
+                extra={"method": method, "path": path, "status_code": status_code, "duration": duration}
+            )
+        return duration
+
+
+def format_server_timing(phases):
+    """
+    Header Server-Timing a partir de {fase: segundos}, com durações em ms.
+
+    Permite que o cliente separe o tempo de rede do tempo no servidor (fila de
+    admissão, aplicação e banco) sem acesso aos traces.
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in phases.items())
+
+
+class TrafficRecorder:
+    """
+    Grava as requisições atendidas em JSONL para replay no simulate_traffic.py.
+
+    Cada linha tem: ts (epoch), method, path (com query string), endpoint, body
+    (JSON da requisição), status, latency_ms e, para criações, created_id (usado
+    no replay para remapear os ids das tarefas). A escrita acontece em uma
+    thread de background; com a fila cheia o registro é descartado e contado em
+    `dropped`, sem atrasar a requisição.
+    """
+    def __init__(self, path, max_queue=10000):
+        self.path = path
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="traffic-recorder", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, entry):
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                entry = self._queue.get()
+                if entry is None:
+                    break
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                # Escreve em lote o que já está na fila antes do flush
+                while not self._queue.empty():
+                    entry = self._queue.get_nowait()
+                    if entry is None:
+                        f.flush()
+                        return
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+
+    def close(self):
+        """Grava o que restou na fila e encerra a thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
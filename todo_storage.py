@@ -0,0 +1,651 @@
+"""
+Backends de armazenamento das tarefas da To-Do App.
+
+A aplicação fala apenas com a interface TaskStorage; PostgresTaskStorage usa o
+pool e os statements preparados de todo_db, e SQLiteTaskStorage usa um arquivo
+SQLite embutido, o que permite subir a stack HTTP + telemetria (e rodar os
+benchmarks) sem docker-compose. ReplicatedTaskStorage combina um primário com
+réplicas de leitura de qualquer um dos dois.
+
+Todos os métodos retornam linhas no layout TASK_COLUMNS, prontas para
+encode_task/encode_tasks, e aceitam o Deadline da requisição: quando o prazo
+acaba durante a operação é lançado DeadlineExceeded.
+"""
+import itertools
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from psycopg2.errors import QueryCanceled
+
+from todo_db import TASK_COLUMNS, PoolTimeout, build_search_query, run_migrations, search_terms
+from todo_http import DeadlineExceeded
+
+
+class TaskStorage(ABC):
+    """Interface dos backends de armazenamento de tarefas."""
+    name = None
+
+    # Callback opcional (segundos) chamado ao fim de cada uso de conexão,
+    # incluindo a espera por ela; alimenta o Server-Timing das respostas
+    on_query = None
+
+    def observe_queries(self, callback):
+        """Registra o callback de tempo de banco (veja `on_query`)"""
+        self.on_query = callback
+
+    @abstractmethod
+    def migrate(self):
+        """Cria/atualiza o schema e retorna as versões aplicadas"""
+
+    @abstractmethod
+    def list_tasks(self, deadline=None):
+        """Todas as tarefas, das mais novas para as mais antigas"""
+
+    @abstractmethod
+    def search_tasks(self, text, limit, offset=0, deadline=None):
+        """Tarefas cujo título contém os termos (por prefixo), por relevância"""
+
+    @abstractmethod
+    def create_task(self, title, deadline=None):
+        """Cria uma tarefa e retorna a linha criada"""
+
+    @abstractmethod
+    def create_tasks(self, titles, deadline=None):
+        """Cria várias tarefas em uma transação; retorna as linhas na ordem de `titles`"""
+
+    @abstractmethod
+    def complete_task(self, task_id, deadline=None):
+        """Marca a tarefa como completada; retorna a linha ou None se não existe"""
+
+    @abstractmethod
+    def delete_task(self, task_id, deadline=None):
+        """Remove a tarefa; retorna False se ela não existe"""
+
+    @abstractmethod
+    def count_tasks(self):
+        """Retorna (total de tarefas, tarefas abertas)"""
+
+    @abstractmethod
+    def execute(self, sql, deadline=None):
+        """Executa SQL arbitrário sem parâmetros (usado pela simulação de erros)"""
+
+    @abstractmethod
+    def ping(self, timeout=None):
+        """Verificação de saúde: lança exceção se o banco não responde"""
+
+    def replication_lag(self):
+        """Atraso de replicação em segundos (0 quando o banco não é réplica)"""
+        return 0.0
+
+    def reader(self, after_write=False):
+        """
+        Backend para leituras da requisição atual.
+
+        :param after_write: o cliente escreveu há pouco e precisa ler as próprias escritas
+        """
+        return self
+
+    @abstractmethod
+    def stats(self):
+        """Estado das conexões, sem I/O (formato de ConnectionPool.stats())"""
+
+    @abstractmethod
+    def close(self):
+        """Fecha as conexões do backend"""
+
+
+class PostgresTaskStorage(TaskStorage):
+    """
+    Backend PostgreSQL: conexões do ConnectionPool e statements preparados.
+
+    O prazo da requisição limita a espera por uma conexão e vira o
+    statement_timeout de cada query.
+    """
+    name = "postgres"
+
+    def __init__(self, pool, statements):
+        self.pool = pool
+        self.statements = statements
+
+    @contextmanager
+    def _cursor(self, deadline=None, timeout=None):
+        if deadline is not None:
+            deadline.check()
+            timeout = deadline.remaining()
+        started = time.perf_counter()
+        try:
+            with self.pool.connection(timeout) as conn:
+                with conn.cursor() as cur:
+                    yield cur
+        except (PoolTimeout, QueryCanceled) as e:
+            if deadline is not None and (isinstance(e, QueryCanceled) or deadline.expired()):
+                raise DeadlineExceeded(str(e)) from e
+            raise
+        finally:
+            if self.on_query is not None:
+                self.on_query(time.perf_counter() - started)
+
+    def _execute(self, cur, name, params=(), deadline=None):
+        timeout_ms = deadline.statement_timeout_ms() if deadline is not None else None
+        self.statements.execute(cur, name, params, timeout_ms=timeout_ms)
+
+    def migrate(self):
+        with self.pool.connection() as conn:
+            return run_migrations(conn)
+
+    def list_tasks(self, deadline=None):
+        with self._cursor(deadline) as cur:
+            self._execute(cur, "tasks_list", deadline=deadline)
+            return cur.fetchall()
+
+    def search_tasks(self, text, limit, offset=0, deadline=None):
+        query = build_search_query(text)
+        if query is None:
+            return []
+        with self._cursor(deadline) as cur:
+            self._execute(cur, "tasks_search", (query, limit, offset), deadline)
+            return cur.fetchall()
+
+    def create_task(self, title, deadline=None):
+        with self._cursor(deadline) as cur:
+            self._execute(cur, "tasks_insert", (title,), deadline)
+            return cur.fetchone()
+
+    def create_tasks(self, titles, deadline=None):
+        with self._cursor(deadline) as cur:
+            self._execute(cur, "tasks_insert_batch", (list(titles),), deadline)
+            rows = cur.fetchall()
+        # Os ids são gerados na ordem do array
+        rows.sort(key=lambda row: row[0])
+        return rows
+
+    def complete_task(self, task_id, deadline=None):
+        with self._cursor(deadline) as cur:
+            self._execute(cur, "tasks_complete", (task_id,), deadline)
+            return cur.fetchone()
+
+    def delete_task(self, task_id, deadline=None):
+        with self._cursor(deadline) as cur:
+            self._execute(cur, "tasks_delete", (task_id,), deadline)
+            return cur.rowcount > 0
+
+    def count_tasks(self):
+        with self._cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM tasks")
+            total = cur.fetchone()[0]
+            # Tarefas abertas usam o índice parcial
+            cur.execute("SELECT COUNT(*) FROM tasks WHERE NOT completed")
+            return total, cur.fetchone()[0]
+
+    def execute(self, sql, deadline=None):
+        with self._cursor(deadline) as cur:
+            cur.execute(sql)
+
+    def ping(self, timeout=None):
+        with self._cursor(timeout=timeout) as cur:
+            cur.execute("SELECT 1")
+
+    def replication_lag(self):
+        # Réplica com tudo que recebeu já aplicado não tem atraso, mesmo que a
+        # última transação replicada seja antiga (primário ocioso)
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                END
+            """)
+            return float(cur.fetchone()[0])
+
+    def stats(self):
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.close()
+
+
+# Mesmo layout do PostgreSQL; os timestamps são gravados já em ISO 8601 com microssegundos
+_SQLITE_COLUMNS = ", ".join(TASK_COLUMNS)
+_SQLITE_QUALIFIED_COLUMNS = ", ".join(f"tasks.{column}" for column in TASK_COLUMNS)
+
+# Migrações do SQLite, com a mesma numeração das do PostgreSQL; a versão
+# aplicada fica em PRAGMA user_version
+SQLITE_MIGRATIONS = (
+    (1, "create tasks table", """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """),
+    (2, "index tasks by created_at", """
+        CREATE INDEX IF NOT EXISTS tasks_created_at_idx ON tasks (created_at DESC)
+    """),
+    (3, "partial index on open tasks", """
+        CREATE INDEX IF NOT EXISTS tasks_open_created_at_idx ON tasks (created_at DESC) WHERE NOT completed
+    """),
+    # Índice FTS5 mantido por triggers (equivalente à coluna gerada + GIN)
+    (4, "full-text search on title", """
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, content='tasks', content_rowid='id', tokenize='unicode61 remove_diacritics 0'
+        );
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title) VALUES (new.id, new.title);
+        END;
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        END;
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title) VALUES ('delete', old.id, old.title);
+            INSERT INTO tasks_fts (rowid, title) VALUES (new.id, new.title);
+        END;
+        INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')
+    """),
+)
+
+# Pragmas aplicados em cada conexão
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    # Com WAL, NORMAL só sincroniza no checkpoint: seguro contra corrupção,
+    # podendo perder as últimas transações em queda de energia
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+)
+
+
+def _split_statements(sql):
+    """Separa um script em statements completos (respeitando corpos de triggers)"""
+    statement = ""
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ""
+    if statement.strip():
+        yield statement.strip()
+
+
+def _now():
+    return datetime.now().isoformat(timespec="microseconds")
+
+
+def _task_row(row):
+    task_id, title, completed, created_at, updated_at = row
+    return task_id, title, bool(completed), created_at, updated_at
+
+
+class SQLiteTaskStorage(TaskStorage):
+    """
+    Backend SQLite embutido (WAL), com um pool limitado de conexões.
+
+    Como no ConnectionPool do PostgreSQL, um semáforo limita as conexões abertas
+    e faz a requisição esperar (até o prazo ou `acquire_timeout`) por uma livre;
+    conexões ociosas são reaproveitadas, então threads de requisição de vida
+    curta (servidor threaded do Werkzeug) não acumulam conexões.
+
+    Leituras rodam em paralelo com a escrita graças ao WAL; escritas usam
+    BEGIN IMMEDIATE para pegar o lock de escrita logo no início da transação.
+    O prazo da requisição é verificado por um progress handler, que
+    interrompe a query quando ele acaba.
+
+    :param path: arquivo do banco (criado se não existir)
+    :param max_connections: conexões abertas ao mesmo tempo
+    :param acquire_timeout: espera máxima por uma conexão livre, sem prazo da requisição
+    """
+    name = "sqlite"
+
+    # Instruções da VM do SQLite entre verificações do prazo
+    PROGRESS_INTERVAL = 1000
+
+    def __init__(self, path, max_connections=10, acquire_timeout=5.0):
+        self.path = path
+        self.max_connections = max_connections
+        self.acquire_timeout = acquire_timeout
+        self._idle = []  # Conexões livres (LIFO: a mais recente está quente)
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+
+    def _connect(self):
+        # isolation_level=None: as transações são abertas explicitamente
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self, timeout=None):
+        """
+        Empresta uma conexão do pool.
+
+        :raises: PoolTimeout se nenhuma conexão ficar livre a tempo
+        """
+        if timeout is None:
+            timeout = self.acquire_timeout
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=max(timeout, 0))
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            raise PoolTimeout(f"Nenhuma conexão SQLite livre após {timeout:.3f}s")
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            self._in_use += 1
+        if conn is None:
+            try:
+                conn = self._connect()
+            except BaseException:
+                with self._lock:
+                    self._in_use -= 1
+                self._slots.release()
+                raise
+        return conn
+
+    def _release(self, conn):
+        with self._lock:
+            self._in_use -= 1
+            self._idle.append(conn)
+        self._slots.release()
+
+    @contextmanager
+    def _cursor(self, deadline=None, write=False, timeout=None):
+        if deadline is not None:
+            deadline.check()
+            timeout = deadline.remaining()
+        started = time.perf_counter()
+        try:
+            conn = self._acquire(timeout)
+        except PoolTimeout as e:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(str(e)) from e
+            raise
+        if deadline is not None:
+            conn.set_progress_handler(deadline.expired, self.PROGRESS_INTERVAL)
+        cur = conn.cursor()
+        try:
+            if write:
+                cur.execute("BEGIN IMMEDIATE")
+            try:
+                yield cur
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            if conn.in_transaction:
+                conn.commit()
+        except sqlite3.OperationalError as e:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(str(e)) from e
+            raise
+        finally:
+            cur.close()
+            if deadline is not None:
+                conn.set_progress_handler(None, 0)
+            self._release(conn)
+            if self.on_query is not None:
+                self.on_query(time.perf_counter() - started)
+
+    def migrate(self):
+        applied = []
+        with self._cursor(write=True) as cur:
+            current = cur.execute("PRAGMA user_version").fetchone()[0]
+            for version, description, sql in SQLITE_MIGRATIONS:
+                if version <= current:
+                    continue
+                for statement in _split_statements(sql):
+                    cur.execute(statement)
+                applied.append(version)
+            if applied:
+                cur.execute(f"PRAGMA user_version = {applied[-1]}")
+        return applied
+
+    def list_tasks(self, deadline=None):
+        with self._cursor(deadline) as cur:
+            cur.execute(f"SELECT {_SQLITE_COLUMNS} FROM tasks ORDER BY created_at DESC")
+            return [_task_row(row) for row in cur.fetchall()]
+
+    def search_tasks(self, text, limit, offset=0, deadline=None):
+        terms = search_terms(text)
+        if not terms:
+            return []
+        # Termos entre aspas (sintaxe FTS5) com busca por prefixo
+        query = " ".join(f'"{term}"*' for term in terms)
+        with self._cursor(deadline) as cur:
+            cur.execute(f"""
+                SELECT {_SQLITE_QUALIFIED_COLUMNS}
+                FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid
+                WHERE tasks_fts MATCH ?
+                ORDER BY tasks_fts.rank, tasks.id DESC
+                LIMIT ? OFFSET ?
+            """, (query, limit, offset))
+            return [_task_row(row) for row in cur.fetchall()]
+
+    def create_task(self, title, deadline=None):
+        return self._insert([title], deadline)[0]
+
+    def create_tasks(self, titles, deadline=None):
+        return self._insert(titles, deadline)
+
+    def _insert(self, titles, deadline=None):
+        now = _now()
+        with self._cursor(deadline, write=True) as cur:
+            return [
+                _task_row(cur.execute(
+                    f"INSERT INTO tasks (title, created_at, updated_at) VALUES (?, ?, ?) RETURNING {_SQLITE_COLUMNS}",
+                    (title, now, now)
+                ).fetchone())
+                for title in titles
+            ]
+
+    def complete_task(self, task_id, deadline=None):
+        with self._cursor(deadline, write=True) as cur:
+            row = cur.execute(
+                f"UPDATE tasks SET completed = 1, updated_at = ? WHERE id = ? RETURNING {_SQLITE_COLUMNS}",
+                (_now(), task_id)
+            ).fetchone()
+        return _task_row(row) if row else None
+
+    def delete_task(self, task_id, deadline=None):
+        with self._cursor(deadline, write=True) as cur:
+            cur.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            return cur.rowcount > 0
+
+    def count_tasks(self):
+        with self._cursor() as cur:
+            total = cur.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            return total, cur.execute("SELECT COUNT(*) FROM tasks WHERE NOT completed").fetchone()[0]
+
+    def execute(self, sql, deadline=None):
+        with self._cursor(deadline) as cur:
+            cur.execute(sql)
+
+    def ping(self, timeout=None):
+        with self._cursor(timeout=timeout) as cur:
+            cur.execute("SELECT 1")
+
+    def stats(self):
+        with self._lock:
+            in_use = self._in_use
+            waiting = self._waiting
+        return {
+            "in_use": in_use,
+            "max": self.max_connections,
+            "waiting": waiting,
+            "saturation": in_use / self.max_connections if self.max_connections else 1.0,
+        }
+
+    def close(self):
+        # Fecha as conexões livres; as emprestadas voltam ao pool e são fechadas aqui na próxima chamada
+        with self._lock:
+            connections, self._idle = self._idle, []
+        for conn in connections:
+            conn.close()
+
+
+class Replica:
+    """Estado de uma réplica de leitura, atualizado pelas verificações de saúde"""
+    def __init__(self, name, storage):
+        self.name = name
+        self.storage = storage
+        # Só recebe leituras depois da primeira verificação bem-sucedida
+        self.healthy = False
+        self.lag = None
+        self.error = "nenhuma verificação executada"
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "error": self.error,
+            **self.storage.stats(),
+        }
+
+
+class ReplicatedTaskStorage(TaskStorage):
+    """
+    Divide leituras e escritas entre um primário e réplicas de leitura.
+
+    Escritas (e migrações) vão sempre para o primário. Leituras vão para as
+    réplicas saudáveis em round-robin, cada uma com seu próprio pool; se não há
+    réplica saudável, se a leitura na réplica falha ou se o cliente escreveu há
+    pouco (`reader(after_write=True)`), a leitura vai para o primário.
+
+    Cada `ping` (chamado pelo HealthMonitor) verifica também as réplicas: uma
+    réplica que não responde ou com atraso acima de `max_lag` sai da rotação
+    até a próxima verificação bem-sucedida.
+
+    :param on_read: callback opcional (destino, motivo) chamado a cada leitura
+    """
+    name = "replicated"
+
+    def __init__(self, primary, replicas, max_lag=5.0, on_read=None):
+        self.primary = primary
+        self.replicas = [Replica(f"replica-{i}", storage) for i, storage in enumerate(replicas)]
+        self.max_lag = max_lag
+        self.on_read = on_read
+        self._next = itertools.count()
+        self.name = f"{primary.name}+replicas"
+
+    def _pick_replica(self):
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def _read(self, method, after_write, *args, **kwargs):
+        if after_write:
+            reason = "read_your_writes"
+        else:
+            replica = self._pick_replica()
+            if replica is None:
+                reason = "no_healthy_replica"
+            else:
+                try:
+                    result = getattr(replica.storage, method)(*args, **kwargs)
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    # Tira a réplica da rotação e repete a leitura no primário
+                    replica.healthy = False
+                    replica.error = str(e)
+                    reason = "replica_error"
+                else:
+                    if self.on_read is not None:
+                        self.on_read(replica.name, "replica")
+                    return result
+
+        if self.on_read is not None:
+            self.on_read("primary", reason)
+        return getattr(self.primary, method)(*args, **kwargs)
+
+    def reader(self, after_write=False):
+        return _ReplicaReader(self, after_write)
+
+    def list_tasks(self, deadline=None):
+        return self._read("list_tasks", False, deadline=deadline)
+
+    def search_tasks(self, text, limit, offset=0, deadline=None):
+        return self._read("search_tasks", False, text, limit, offset, deadline=deadline)
+
+    def count_tasks(self):
+        return self._read("count_tasks", False)
+
+    def migrate(self):
+        return self.primary.migrate()
+
+    def create_task(self, title, deadline=None):
+        return self.primary.create_task(title, deadline=deadline)
+
+    def create_tasks(self, titles, deadline=None):
+        return self.primary.create_tasks(titles, deadline=deadline)
+
+    def complete_task(self, task_id, deadline=None):
+        return self.primary.complete_task(task_id, deadline=deadline)
+
+    def delete_task(self, task_id, deadline=None):
+        return self.primary.delete_task(task_id, deadline=deadline)
+
+    def execute(self, sql, deadline=None):
+        return self.primary.execute(sql, deadline=deadline)
+
+    def check_replicas(self, timeout=None):
+        """Atualiza saúde e atraso de cada réplica"""
+        for replica in self.replicas:
+            try:
+                replica.storage.ping(timeout=timeout)
+                replica.lag = round(replica.storage.replication_lag(), 3)
+            except Exception as e:
+                replica.healthy = False
+                replica.lag = None
+                replica.error = str(e)
+                continue
+            replica.healthy = replica.lag <= self.max_lag
+            replica.error = None if replica.healthy else f"atraso de {replica.lag}s acima de {self.max_lag}s"
+
+    def observe_queries(self, callback):
+        self.primary.observe_queries(callback)
+        for replica in self.replicas:
+            replica.storage.observe_queries(callback)
+
+    def ping(self, timeout=None):
+        # Réplicas indisponíveis não afetam a readiness: as leituras caem no primário
+        self.check_replicas(timeout)
+        self.primary.ping(timeout=timeout)
+
+    def stats(self):
+        return {**self.primary.stats(), "replicas": [replica.stats() for replica in self.replicas]}
+
+    def close(self):
+        self.primary.close()
+        for replica in self.replicas:
+            replica.storage.close()
+
+
+class _ReplicaReader:
+    """Leituras de um ReplicatedTaskStorage com a consistência pedida pela requisição"""
+    def __init__(self, storage, after_write):
+        self._storage = storage
+        self._after_write = after_write
+
+    def list_tasks(self, deadline=None):
+        return self._storage._read("list_tasks", self._after_write, deadline=deadline)
+
+    def search_tasks(self, text, limit, offset=0, deadline=None):
+        return self._storage._read("search_tasks", self._after_write, text, limit, offset, deadline=deadline)
+
+    def count_tasks(self):
+        return self._storage._read("count_tasks", self._after_write)